@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
+import json
 from datetime import datetime
+from pathlib import Path
 
 # Set page config
 st.set_page_config(
@@ -100,7 +102,11 @@ loc_data = {
 }
 
 # Performance Data (QPS - Queries Per Second)
-performance_data = {
+# Measured figures come from python_examples/benchmark.py; the reference table
+# below is only shown until a results file has been generated.
+BENCHMARK_RESULTS_PATH = Path(__file__).parent / "benchmark_results.json"
+
+reference_performance_data = {
     "Scenario": [
         "Basic Chat",
         "Function Calls",
@@ -115,6 +121,34 @@ performance_data = {
     "Java (Spring AI)": [1420, 860, 350, 2100, 550, 450]
 }
 
+
+def load_benchmark_results(path=BENCHMARK_RESULTS_PATH):
+    """Return the benchmark results document, or None if nothing was measured yet."""
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def results_to_performance_data(results):
+    """Pivot per-scenario benchmark rows into the Scenario x Framework QPS table."""
+    rows = results.get("scenarios", [])
+    scenarios = list(dict.fromkeys(row["scenario"] for row in rows))
+    frameworks = list(dict.fromkeys(row["framework"] for row in rows))
+    data = {"Scenario": scenarios}
+    for framework in frameworks:
+        qps = {row["scenario"]: row["qps"] for row in rows if row["framework"] == framework}
+        data[framework] = [qps.get(scenario) for scenario in scenarios]
+    return data
+
+
+benchmark_results = load_benchmark_results()
+if benchmark_results and benchmark_results.get("scenarios"):
+    performance_data = results_to_performance_data(benchmark_results)
+else:
+    benchmark_results = None
+    performance_data = reference_performance_data
+
 # Token Cost Estimates (per 1M tokens)
 token_cost_data = {
     "Model": ["GPT-4 Turbo", "GPT-4o", "Claude 3.5 Sonnet", "Gemini 2.0 Flash", "DeepSeek R1"],
@@ -454,13 +488,24 @@ elif page == "Performance Metrics":
     your specific performance requirements.
     """)
     
+    if benchmark_results:
+        st.success(
+            f"Measured with python_examples/benchmark.py on {benchmark_results.get('generated_at', 'unknown date')} "
+            f"against {benchmark_results.get('base_url', 'an OpenAI-compatible endpoint')}."
+        )
+    else:
+        st.warning(
+            "No benchmark_results.json found - showing reference figures. "
+            "Run `python python_examples/benchmark.py` to measure them."
+        )
+    
     # Create DataFrame
     df_perf = pd.DataFrame(performance_data)
     
     # Create line chart
     fig = go.Figure()
     
-    frameworks = ["Python (LangChain)", "Python (LangGraph)", "Java (LangChain4j)", "Java (Spring AI)"]
+    frameworks = [column for column in df_perf.columns if column != "Scenario"]
     colors = ["#1f77b4", "#2ca02c", "#d62728", "#ff7f0e"]
     
     for i, framework in enumerate(frameworks):
@@ -469,7 +514,7 @@ elif page == "Performance Metrics":
             y=df_perf[framework],
             mode='lines+markers',
             name=framework,
-            line=dict(color=colors[i], width=3),
+            line=dict(color=colors[i % len(colors)], width=3),
             marker=dict(size=8)
         ))
     
@@ -490,9 +535,57 @@ elif page == "Performance Metrics":
     st.markdown("### 📊 Detailed Breakdown")
     st.dataframe(df_perf.set_index("Scenario"), use_container_width=True)
     
+    if benchmark_results:
+        st.markdown("### ⏱️ Latency Percentiles")
+        df_latency = pd.DataFrame(benchmark_results["scenarios"])
+        latency_columns = ["scenario", "framework", "concurrency", "requests", "errors",
+                           "qps", "p50_ms", "p95_ms", "p99_ms"]
+        df_latency = df_latency[[c for c in latency_columns if c in df_latency.columns]]
+        
+        fig_latency = go.Figure()
+        for pct, color in zip(["p50_ms", "p95_ms", "p99_ms"], colors):
+            fig_latency.add_trace(go.Bar(
+                x=df_latency["scenario"],
+                y=df_latency[pct],
+                name=pct.replace("_ms", ""),
+                marker_color=color
+            ))
+        fig_latency.update_layout(
+            title="Latency Percentiles by Scenario (ms)",
+            xaxis_title="Scenario",
+            yaxis_title="Latency (ms)",
+            barmode="group",
+            height=400,
+            template="plotly_white"
+        )
+        st.plotly_chart(fig_latency, use_container_width=True)
+        st.dataframe(df_latency.set_index("scenario"), use_container_width=True)
+        
+        streaming_rows = [row for row in benchmark_results["scenarios"] if "ttft_p50_ms" in row]
+        if streaming_rows:
+            st.markdown("### 🌊 Streaming Response: Time to First Token")
+            st.markdown("""
+            For chat UX, perceived latency is the time until the first token appears, not the
+            time to the full answer. Inter-token latency (ITL) is the gap between streamed tokens.
+            """)
+            df_stream = pd.DataFrame(streaming_rows)
+            stream_columns = ["scenario", "framework", "ttft_p50_ms", "ttft_p95_ms", "ttft_p99_ms",
+                              "itl_p50_ms", "itl_p95_ms", "p50_ms", "p99_ms"]
+            df_stream = df_stream[[c for c in stream_columns if c in df_stream.columns]]
+            
+            col1, col2, col3 = st.columns(3)
+            first = streaming_rows[0]
+            with col1:
+                st.metric("TTFT p50", f"{first['ttft_p50_ms']:.0f} ms")
+            with col2:
+                st.metric("TTFT p99", f"{first['ttft_p99_ms']:.0f} ms")
+            with col3:
+                st.metric("Total time p50", f"{first['p50_ms']:.0f} ms")
+            st.dataframe(df_stream.set_index("scenario"), use_container_width=True)
+    
     st.markdown("---")
     
-    st.markdown("### 💡 Performance Analysis")
+    st.markdown("### 💡 Performance Analysis (Reference Figures)")
     col1, col2 = st.columns(2)
     
     with col1:
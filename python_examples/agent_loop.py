@@ -0,0 +1,153 @@
+"""
+Tool-Execution Agent Loop with Parallel Dispatch
+Author: Optimum AI Lab
+Description: Runs a tool-calling model to a final answer. The model is
+called, and every tool call in its reply runs concurrently. Each result goes
+back as a ToolMessage and the model is called again, until it answers
+without tool calls or the step limit is reached. I/O-bound tools run on the
+event loop (async tools natively, sync ones in a thread). Tools marked
+@cpu_bound run in a process pool, so the GIL does not serialize them. Results
+of tools marked @cacheable are memoized in a shared cache (see tool_cache.py).
+Each step records the model latency, the wall time of its tool batch and
+every tool's own latency, so sum(tool ms) > batch ms shows the overlap.
+
+Used by mcp_tool_call.py.
+"""
+
+import asyncio
+import importlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from streaming import astream_with_timing
+from tool_cache import tool_cache
+
+
+def _ms(seconds):
+    return round(seconds * 1000.0, 2)
+
+
+def cpu_bound(tool):
+    """Mark a tool to run in the process pool (stack above @tool)."""
+    tool.metadata = dict(tool.metadata or {}, cpu_bound=True)
+    return tool
+
+
+def _run_in_worker(module, name, args):
+    """Process-pool entry point: tools are looked up by module and name, not pickled."""
+    return getattr(importlib.import_module(module), name).invoke(args)
+
+
+class ToolExecutor:
+    """Runs one model turn's tool calls concurrently and returns their ToolMessages."""
+
+    def __init__(self, tools, max_workers=None, cache=tool_cache):
+        self.tools = {tool.name: tool for tool in tools}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache = cache
+        self._pool = None
+
+    def _process_pool(self):
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and HTTP pools is unsafe
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _call(self, tool, args):
+        if (tool.metadata or {}).get("cpu_bound"):
+            return await asyncio.get_running_loop().run_in_executor(
+                self._process_pool(), _run_in_worker, tool.func.__module__, tool.name, args)
+        return await tool.ainvoke(args)
+
+    async def run_one(self, call):
+        """(ToolMessage, timing) for one tool call; failures go back to the model as errors."""
+        started = time.perf_counter()
+        tool = self.tools.get(call["name"])
+        status, cached = "success", False
+        try:
+            if tool is None:
+                raise KeyError(f"unknown tool {call['name']!r}")
+            if self.cache is None:
+                content = await self._call(tool, call["args"])
+            else:
+                content, cached = await self.cache.call(tool, call["args"], lambda: self._call(tool, call["args"]))
+        except Exception as exc:
+            content, status = f"Error: {exc!r}", "error"
+        message = ToolMessage(content=str(content), tool_call_id=call["id"], name=call["name"], status=status)
+        return message, {"name": call["name"], "ms": _ms(time.perf_counter() - started), "status": status,
+                         "cached": cached}
+
+    async def run(self, tool_calls):
+        """ToolMessages (in call order) and per-call timings for one turn."""
+        results = await asyncio.gather(*(self.run_one(call) for call in tool_calls))
+        return [message for message, _ in results], [timing for _, timing in results]
+
+    def warm_up(self):
+        """Start the process pool's workers now rather than on the first CPU-bound call."""
+        if any((tool.metadata or {}).get("cpu_bound") for tool in self.tools.values()):
+            pool = self._process_pool()
+            for future in [pool.submit(os.getpid) for _ in range(self.max_workers)]:
+                future.result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+async def run_agent(llm_with_tools, executor, query, max_steps=5, on_token=None):
+    """Loop model -> tools -> model until a final answer or `max_steps` model calls.
+
+    With `on_token`, every model call is streamed and its TTFT recorded.
+    Returns {"answer", "messages", "steps", "stopped", "total_ms"}; "stopped"
+    is "max_steps" if the limit cut the loop short, else None.
+    """
+    started = time.perf_counter()
+    messages = [HumanMessage(query)]
+    steps = []
+    answer = None
+    for number in range(1, max_steps + 1):
+        step = {"step": number}
+        model_started = time.perf_counter()
+        if on_token is None:
+            reply = await llm_with_tools.ainvoke(messages)
+        else:
+            reply, timing = await astream_with_timing(llm_with_tools, messages, on_token=on_token)
+            step["ttft_ms"] = timing["ttft_ms"]
+        step["model_ms"] = _ms(time.perf_counter() - model_started)
+        messages.append(reply)
+        steps.append(step)
+        if not reply.tool_calls:
+            answer = reply.content
+            break
+        tools_started = time.perf_counter()
+        tool_messages, step["tools"] = await executor.run(reply.tool_calls)
+        step["tools_ms"] = _ms(time.perf_counter() - tools_started)
+        messages.extend(tool_messages)
+    return {
+        "answer": answer,
+        "messages": messages,
+        "steps": steps,
+        "stopped": None if answer is not None else "max_steps",
+        "total_ms": _ms(time.perf_counter() - started),
+    }
+
+
+def print_steps(result):
+    for step in result["steps"]:
+        if step.get("fast_path"):
+            line = f"  step {step['step']}: fast path (no model call)"
+        else:
+            line = f"  step {step['step']}: model {step['model_ms']:.1f} ms"
+        if step.get("ttft_ms") is not None:
+            line += f" (TTFT {step['ttft_ms']:.1f} ms)"
+        if "tools" in step:
+            calls = ", ".join(f"{t['name']} {t['ms']:.1f} ms" + ("" if t["status"] == "success" else " (error)")
+                              + (" (cached)" if t.get("cached") else "") for t in step["tools"])
+            line += f", {len(step['tools'])} tools in {step['tools_ms']:.1f} ms ({calls})"
+        print(line)
+    print(f"  total {result['total_ms']:.1f} ms" + (" (stopped at the step limit)" if result["stopped"] else ""))
@@ -0,0 +1,296 @@
+"""
+Approximate Nearest-Neighbour Index Types for the RAG Retriever
+Author: Optimum AI Lab
+Description: Lets the rag_query.py vector store use an approximate FAISS
+index instead of the default brute-force flat index. Index types are chosen
+with a short spec string:
+
+    flat                             exact search (FAISS.from_texts default)
+    ivf:nlist=1024,nprobe=16         inverted file, probe nprobe of nlist cells
+    hnsw:M=32,efSearch=64            HNSW graph (efConstruction also accepted)
+    pq:nlist=1024,m=16,nprobe=16     inverted file with product-quantized codes
+    fp16 / int8                      exact search over float16 / 8-bit scalar-quantized vectors
+
+It also includes a recall@k vs latency benchmark against exact search, over
+a synthetic clustered corpus or the vectors of a saved index. Search-time
+parameters can be swept by separating values with "|":
+
+    python ann_index.py bench --docs 200000 --specs flat "ivf:nlist=1024,nprobe=1|4|16|64" \\
+        "hnsw:M=32,efSearch=16|64|256" "pq:nlist=1024,m=16,nprobe=16"
+    python ann_index.py convert --index-dir faiss_index --spec hnsw:M=32,efSearch=64
+"""
+
+import argparse
+import itertools
+import time
+import uuid
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+INDEX_KINDS = ("flat", "ivf", "hnsw", "pq", "fp16", "int8")
+# Kinds whose reconstruct() returns only an approximation of the added vectors
+QUANTIZED_KINDS = ("pq", "fp16", "int8")
+SEARCH_PARAMS = ("nprobe", "efSearch")
+DEFAULTS = {"nlist": 1024, "nprobe": 16, "M": 32, "efConstruction": 40, "efSearch": 64,
+            "m": 16, "nbits": 8}
+# FAISS's k-means wants at least this many training points per IVF cell
+MIN_POINTS_PER_CELL = 39
+
+
+def parse_index_spec(spec):
+    """"ivf:nlist=1024,nprobe=16" -> ("ivf", {"nlist": 1024, "nprobe": 16})."""
+    kind, _, rest = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index type {kind!r}; expected one of {', '.join(INDEX_KINDS)}")
+    params = {}
+    for item in filter(None, (part.strip() for part in rest.split(","))):
+        key, _, value = item.partition("=")
+        params[key.strip()] = value.strip() if "|" in value else int(value)
+    return kind, params
+
+
+def make_index(dim, kind="flat", **params):
+    """Create an untrained, empty FAISS index of the given type (L2 metric)."""
+    p = dict(DEFAULTS, **params)
+    if kind == "flat":
+        return faiss.IndexFlatL2(dim)
+    if kind == "ivf":
+        return faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, p["nlist"])
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, p["M"])
+        index.hnsw.efConstruction = p["efConstruction"]
+        return index
+    if kind == "pq":
+        if dim % p["m"]:
+            raise ValueError(f"pq: m={p['m']} must divide the embedding dimension {dim}")
+        return faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, p["nlist"], p["m"], p["nbits"])
+    if kind == "fp16":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    if kind == "int8":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    raise ValueError(f"Unknown index type {kind!r}")
+
+
+def supported_search_params(index):
+    """The search-time parameters `index` accepts: nprobe for IVF/PQ, efSearch for HNSW."""
+    supported = set()
+    try:
+        faiss.extract_index_ivf(index)
+        supported.add("nprobe")
+    except RuntimeError:
+        pass
+    if isinstance(index, faiss.IndexHNSW):
+        supported.add("efSearch")
+    return supported
+
+
+def set_search_params(index, **params):
+    """Apply the search-time parameters (nprobe, efSearch) `index` supports.
+
+    Returns the names it ignored, e.g. nprobe for a flat or HNSW index.
+    """
+    supported = supported_search_params(index)
+    space = faiss.ParameterSpace()
+    for key, value in params.items():
+        if key in supported:
+            space.set_index_parameter(index, key, int(value))
+    return sorted(set(params) - supported)
+
+
+def search_parameters(index, selector):
+    """SearchParameters that restrict a search to `selector`, keeping the index's own
+    nprobe/efSearch (IVF and HNSW indexes reject the generic parameter type)."""
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def fit_to_training_set(kind, params, n_train):
+    """Clamp nlist to what `n_train` vectors can train; reject a PQ codebook they cannot.
+
+    A small corpus gets fewer IVF cells (down to one) rather than failing in
+    FAISS's k-means. PQ needs 2**nbits training vectors for its codebooks.
+    """
+    if kind not in ("ivf", "pq"):
+        return params
+    nbits = params.get("nbits", DEFAULTS["nbits"])
+    if kind == "pq" and n_train < 2 ** nbits:
+        raise ValueError(f"pq: training needs at least {2 ** nbits} vectors (2**nbits, nbits={nbits}), "
+                         f"got {n_train}; use flat, hnsw or ivf for a corpus this small")
+    nlist = min(params.get("nlist", DEFAULTS["nlist"]), max(1, n_train // MIN_POINTS_PER_CELL))
+    return dict(params, nlist=nlist)
+
+
+def build_index(vectors, spec="flat", train_size=None):
+    """Train (if needed) and fill an index of type `spec` with `vectors`.
+
+    nlist is clamped to the training set size (see fit_to_training_set).
+    """
+    kind, params = parse_index_spec(spec) if isinstance(spec, str) else spec
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    sample = vectors
+    if train_size and len(vectors) > train_size:
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), train_size, replace=False)]
+    params = fit_to_training_set(kind, params, len(sample))
+    index = make_index(vectors.shape[1], kind, **params)
+    if not index.is_trained:
+        index.train(sample)
+    index.add(vectors)
+    set_search_params(index, **{k: v for k, v in params.items() if k in SEARCH_PARAMS})
+    return index
+
+
+def vectorstore_from_vectors(texts, vectors, embeddings, spec="flat", metadatas=None):
+    """Build a LangChain FAISS store over pre-computed vectors with the given index type."""
+    index = build_index(vectors, spec)
+    ids = [str(uuid.uuid4()) for _ in texts]
+    metadatas = metadatas or [{} for _ in texts]
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+
+
+def reconstruct_all(index):
+    """Recover the stored vectors of a flat (or other reconstructible) index."""
+    return index.reconstruct_n(0, index.ntotal)
+
+
+# ============================================================================
+# RECALL@K vs LATENCY BENCHMARK
+# ============================================================================
+
+def synthetic_vectors(n, dim, clusters=256, seed=0):
+    """Gaussian clusters on the unit sphere; closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def expand_sweeps(params):
+    """{"nprobe": "1|4"} -> [{"nprobe": 1}, {"nprobe": 4}] (cartesian over swept keys)."""
+    fixed = {k: v for k, v in params.items() if not isinstance(v, str)}
+    swept = {k: [int(x) for x in v.split("|")] for k, v in params.items() if isinstance(v, str)}
+    for values in itertools.product(*swept.values()):
+        yield dict(fixed, **dict(zip(swept, values)))
+
+
+def benchmark(base, queries, specs, k=10):
+    """Yield one result row per (spec, search parameter) operating point."""
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    for spec in specs:
+        kind, params = parse_index_spec(spec)
+        build_params = {key: value for key, value in params.items() if key not in SEARCH_PARAMS}
+        started = time.perf_counter()
+        index = build_index(base, (kind, build_params), train_size=256 * build_params.get("nlist", 256))
+        build_s = time.perf_counter() - started
+
+        for point in expand_sweeps(params):
+            set_search_params(index, **point)
+            # Single-query latency is what one RAG request sees
+            latencies = []
+            for query in queries:
+                t = time.perf_counter()
+                index.search(query[None, :], k)
+                latencies.append(time.perf_counter() - t)
+            started = time.perf_counter()
+            _, found = index.search(queries, k)
+            batch_s = time.perf_counter() - started
+            latencies.sort()
+            yield {
+                "spec": kind + (":" + ",".join(f"{key}={value}" for key, value in point.items()) if point else ""),
+                "recall_at_k": round(recall_at_k(found, truth), 4),
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000.0, 4),
+                "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000.0, 4),
+                "batch_qps": round(len(queries) / batch_s, 1),
+                "build_s": round(build_s, 2),
+                "bytes": faiss.serialize_index(index).nbytes,
+            }
+
+
+def run_bench(args):
+    if args.index_dir:
+        base = reconstruct_all(faiss.read_index(str(Path(args.index_dir) / "index.faiss")))
+    else:
+        base = synthetic_vectors(args.docs, args.dim)
+    rng = np.random.default_rng(1)
+    # Queries are perturbed corpus vectors, like questions that paraphrase a chunk
+    picks = base[rng.choice(len(base), args.queries, replace=False)]
+    queries = picks + 0.05 * rng.standard_normal(picks.shape).astype(np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    print(f"{len(base)} vectors x {base.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+    print(f"{'index':<36} {'recall@k':>9} {'p50 ms':>9} {'p99 ms':>9} {'batch qps':>11} "
+          f"{'build s':>8} {'MB':>8}")
+    print("-" * 96)
+    for row in benchmark(base, queries, args.specs, args.k):
+        print(f"{row['spec']:<36} {row['recall_at_k']:>9.4f} {row['p50_ms']:>9.4f} "
+              f"{row['p99_ms']:>9.4f} {row['batch_qps']:>11.1f} {row['build_s']:>8.2f} "
+              f"{row['bytes'] / 2**20:>8.1f}")
+
+
+def run_convert(args):
+    """Rebuild a saved flat vector store with another index type, reusing its vectors.
+
+    Works for both the FAISS.save_local layout and compact_store.py's (which
+    maps rows by position, and the row order is kept), as long as the index
+    holds exact float32 vectors.
+    """
+    import compact_store
+
+    index_dir = Path(args.index_dir)
+    flat = faiss.read_index(str(index_dir / "index.faiss"))
+    if type(flat) not in (faiss.IndexFlat, faiss.IndexFlatL2):
+        layout = " (compact layout)" if compact_store.is_compact(index_dir) else ""
+        raise ValueError(
+            f"{index_dir}{layout} holds a {type(flat).__name__}, not a flat float32 index; its vectors cannot "
+            "be recovered exactly. Rebuild it with `rag_query.py --build --index-spec SPEC` instead.")
+    index = build_index(reconstruct_all(flat), args.spec)
+    faiss.write_index(index, str(index_dir / "index.faiss"))
+    print(f"Rewrote {index_dir / 'index.faiss'} as {args.spec} ({index.ntotal} vectors)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ANN index types for the RAG retriever")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser("bench", help="recall@k vs latency against exact search")
+    bench.add_argument("--specs", nargs="+", default=[
+        "flat", "ivf:nlist=1024,nprobe=1|4|16|64", "hnsw:M=32,efSearch=16|64|256",
+        "pq:nlist=1024,m=16,nprobe=4|16|64",
+    ])
+    bench.add_argument("--docs", type=int, default=100000, help="synthetic corpus size")
+    bench.add_argument("--dim", type=int, default=256, help="synthetic embedding dimension")
+    bench.add_argument("--index-dir", help="benchmark on the vectors of a saved index instead")
+    bench.add_argument("--queries", type=int, default=1000)
+    bench.add_argument("-k", type=int, default=10)
+
+    convert = commands.add_parser("convert", help="rebuild a saved index with another index type")
+    convert.add_argument("--index-dir", required=True)
+    convert.add_argument("--spec", required=True)
+
+    args = parser.parse_args()
+    if args.command == "bench":
+        run_bench(args)
+    else:
+        run_convert(args)
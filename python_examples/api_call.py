@@ -3,18 +3,81 @@ Simple API Call using LangChain
 Author: Optimum AI Lab
 Description: This example demonstrates the simplest way to call an LLM
 using LangChain to generate a response to a prompt.
+
+Pass --stream to print tokens as they arrive and report time to first token.
+Pass --batch prompts.jsonl to run many prompts concurrently (see bulk_runner.py).
 """
 
+import argparse
+import asyncio
+import sys
+
 from langchain_openai import ChatOpenAI
 
-# 1. Initialize the LLM model
-llm = ChatOpenAI(model="gpt-4-turbo-preview")
+from bulk_runner import run_file
+from model_router import ModelRouter
+from rate_limiter import hedger, http_async_client, http_client
+from response_cache import response_cache
+from streaming import print_timing, print_token, stream_with_timing
+
+# 1. Initialize the LLM model (or, with LLM_ROUTER set, pick one per prompt)
+router = ModelRouter.from_env(
+    http_client=http_client, http_async_client=http_async_client, cache=response_cache)
+llm = router.as_runnable() if router is not None else ChatOpenAI(
+    model="gpt-4-turbo-preview",
+    http_client=http_client,
+    http_async_client=http_async_client,
+    cache=response_cache,
+)
+
+
+async def call_prompt(record):
+    """One bulk-mode record -> result fields for the output JSONL."""
+    message = await llm.ainvoke(record["prompt"])
+    return {"response": message.content, "usage": message.usage_metadata}
+
 
 # 2. Invoke the model with a prompt
 if __name__ == "__main__":
-    prompt = "Explain why the sky is blue in one sentence."
-    print(f"Prompt: {prompt}")
-    print("-" * 50)
-    
-    result = llm.invoke(prompt)
-    print(f"Response: {result.content}")
+    parser = argparse.ArgumentParser(description="Simple LLM API call")
+    parser.add_argument("--prompt", default="Explain why the sky is blue in one sentence.")
+    parser.add_argument("--stream", action="store_true", help="stream tokens and report TTFT")
+    parser.add_argument("--batch", metavar="JSONL",
+                        help="run prompts from a JSONL file ('-' for stdin), one result per line")
+    parser.add_argument("--output", help="results JSONL for --batch (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=8, help="prompts in flight in --batch mode")
+    parser.add_argument("--order", choices=("completion", "input"), default="completion",
+                        help="write results as they finish or in input order")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip prompts that already have a result in --output")
+    args = parser.parse_args()
+
+    if args.batch:
+        if args.resume and not args.output:
+            parser.error("--resume needs --output")
+        source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+        try:
+            with source:
+                asyncio.run(run_file(source, call_prompt, args.output, args.concurrency,
+                                     ordered=args.order == "input", resume=args.resume))
+        except KeyboardInterrupt:
+            print("Interrupted; rerun with --resume to continue", file=sys.stderr)
+            sys.exit(130)
+    else:
+        prompt = args.prompt
+        print(f"Prompt: {prompt}")
+        print("-" * 50)
+
+        if args.stream:
+            print("Response: ", end="")
+            _, timing = stream_with_timing(llm, prompt, on_token=print_token)
+            print_timing(timing)
+        else:
+            result = llm.invoke(prompt)
+            print(f"Response: {result.content}")
+    if response_cache is not None:
+        print(f"Response cache: {response_cache.stats()}", file=sys.stderr)
+    if hedger is not None:
+        print(f"Hedging: {hedger.stats()}", file=sys.stderr)
+    if router is not None:
+        print(f"Router: {router.stats()}", file=sys.stderr)
@@ -0,0 +1,194 @@
+"""
+Load-Generation Benchmark for the Python Examples
+Author: Optimum AI Lab
+Description: Drives api_call.py, mcp_tool_call.py and rag_query.py at a
+configurable concurrency against a local OpenAI-compatible stand-in (see
+stub_server.py) and records throughput plus p50/p95/p99 latency per scenario.
+A "Function Calls" request is a whole tool-calling turn (agent_loop.py): the
+model picks the tools, they run, and the model is called again to answer.
+The "Streaming Response" scenario streams api_call.py and additionally records
+time to first token and inter-token latency. The results file is what the
+dashboard's "Performance Metrics" page plots.
+
+Usage:
+    python benchmark.py --concurrency 16 --requests 500
+    python benchmark.py --base-url http://127.0.0.1:8000/v1 --scenarios "RAG Query"
+"""
+
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import platform
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from stats import percentile, run_load, summarize_latencies
+
+DEFAULT_RESULTS_PATH = Path(__file__).resolve().parent.parent / "benchmark_results.json"
+FRAMEWORK = "Python (LangChain)"
+
+
+# ============================================================================
+# SCENARIOS
+# ============================================================================
+# Each scenario imports its example module lazily (the examples build their
+# clients at import time) and returns a callable that performs one request.
+
+def basic_chat_scenario():
+    api_call = importlib.import_module("api_call")
+    prompt = "Explain why the sky is blue in one sentence."
+    return lambda: api_call.llm.invoke(prompt)
+
+
+def function_calls_scenario():
+    """One full tool-calling turn: model, tools, then the model again for the answer."""
+    mcp_tool_call = importlib.import_module("mcp_tool_call")
+    agent_loop = importlib.import_module("agent_loop")
+    queries = itertools.cycle(["What is 15 * 8?", "Calculate 100 + 50", "What is 144 divided by 12?"])
+    lock = threading.Lock()
+    # The async HTTP client belongs to one event loop, so every worker thread submits to it
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="function-calls-loop", daemon=True).start()
+    # No tool cache: every request runs its tools, as a first-time query would
+    executor = agent_loop.ToolExecutor(mcp_tool_call.tools, cache=None)
+    executor.warm_up()
+
+    def call():
+        with lock:
+            query = next(queries)
+        result = asyncio.run_coroutine_threadsafe(
+            agent_loop.run_agent(mcp_tool_call.llm_with_tools, executor, query), loop).result()
+        if result["stopped"]:
+            raise RuntimeError(f"no answer within the step limit for {query!r}")
+        return result["answer"]
+    return call
+
+
+def streaming_scenario():
+    api_call = importlib.import_module("api_call")
+    streaming = importlib.import_module("streaming")
+    prompt = "Explain why the sky is blue in one sentence."
+    return lambda: streaming.stream_with_timing(api_call.llm, prompt)[1]
+
+
+def rag_query_scenario():
+    rag_query = importlib.import_module("rag_query")
+    question = "What does Optimum AI Lab do?"
+    return lambda: rag_query.chain.invoke(question)
+
+
+SCENARIOS = {
+    "Basic Chat": ("api_call.py", basic_chat_scenario),
+    "Function Calls": ("mcp_tool_call.py", function_calls_scenario),
+    "Streaming Response": ("api_call.py --stream", streaming_scenario),
+    "RAG Query": ("rag_query.py", rag_query_scenario),
+}
+
+
+# ============================================================================
+# LOAD GENERATION
+# ============================================================================
+
+def summarize_streaming(timings):
+    """TTFT and inter-token latency percentiles across streamed requests."""
+    ttft = sorted(t["ttft_ms"] for t in timings if t.get("ttft_ms") is not None)
+    # Pooled over every inter-token gap of every request, not per-request means
+    itl = sorted(gap for t in timings for gap in t.get("itl_gaps_ms", ()))
+    summary = {f"ttft_p{p}_ms": round(percentile(ttft, p), 2) for p in (50, 95, 99)}
+    summary.update({f"itl_p{p}_ms": round(percentile(itl, p), 2) for p in (50, 95)})
+    return summary
+
+
+def run_scenario(name, concurrency, total_requests, warmup):
+    example, factory = SCENARIOS[name]
+    call = factory()
+    latencies, errors, wall, timings = run_load(call, concurrency, total_requests, warmup)
+    result = {
+        "scenario": name,
+        "example": example,
+        "framework": FRAMEWORK,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "duration_s": round(wall, 3),
+        "qps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+    }
+    result.update(summarize_latencies(latencies))
+    if timings:
+        result.update(summarize_streaming(timings))
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def merge_results(path, new_results, metadata):
+    """Write results, replacing earlier entries for the same scenario/framework."""
+    existing = load_results(path)
+    keep = [
+        r for r in existing.get("scenarios", [])
+        if (r["scenario"], r.get("framework")) not in {(n["scenario"], n["framework"]) for n in new_results}
+    ]
+    document = dict(existing, **metadata)
+    document["scenarios"] = keep + new_results
+    path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+    return document
+
+
+def load_results(path=DEFAULT_RESULTS_PATH):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the Python LangChain examples")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per scenario")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible endpoint; starts a local stand-in when omitted")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stand-in response latency")
+    parser.add_argument("--output", type=Path, default=DEFAULT_RESULTS_PATH)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+    base_url = args.base_url
+    if base_url is None:
+        from stub_server import StubConfig, serve_in_background
+        server = serve_in_background(config=StubConfig(latency_ms=args.latency_ms, seed=0))
+        base_url = server.base_url
+        print(f"Started local stand-in at {base_url}")
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    results = []
+    for name in args.scenarios:
+        print(f"\nScenario: {name} (concurrency={args.concurrency}, requests={args.requests})")
+        print("-" * 50)
+        result = run_scenario(name, args.concurrency, args.requests, args.warmup)
+        results.append(result)
+        print(f"QPS: {result['qps']}  p50: {result['p50_ms']} ms  "
+              f"p95: {result['p95_ms']} ms  p99: {result['p99_ms']} ms  errors: {result['errors']}")
+        if "ttft_p50_ms" in result:
+            print(f"TTFT p50: {result['ttft_p50_ms']} ms  p95: {result['ttft_p95_ms']} ms  "
+                  f"p99: {result['ttft_p99_ms']} ms  ITL p50: {result['itl_p50_ms']} ms")
+
+    metadata = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "base_url": base_url,
+        "python": platform.python_version(),
+        "host": platform.node(),
+    }
+    merge_results(args.output, results, metadata)
+    print(f"\nResults written to {args.output}")
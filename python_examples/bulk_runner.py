@@ -0,0 +1,161 @@
+"""
+Bulk Prompt Runner
+Author: Optimum AI Lab
+Description: Runs a large JSONL file of prompts through an async LLM call
+with bounded concurrency. Records are read lazily, at most `concurrency`
+calls are in flight (an asyncio semaphore), and results are appended to the
+output JSONL as they finish, either in completion order or in input order
+(through a bounded reorder window). The output file doubles as the
+checkpoint: with resume, records whose id already has a successful result
+are skipped, and failed ones are retried.
+
+Used by api_call.py --batch.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def iter_records(lines, field="prompt"):
+    """Yield {"id", field} records from JSONL lines (or bare text lines)."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = line
+        if not isinstance(record, dict):
+            record = {field: str(record)}
+        record.setdefault("id", number)
+        yield record
+
+
+def load_checkpoint(path):
+    """Ids already answered in `path`; failed results are dropped from the file for retry.
+
+    Lines that are not a result with an "id" cannot be matched to a record;
+    they are dropped as well and counted in a warning.
+    """
+    path = Path(path)
+    if not path.exists():
+        return set()
+    done, kept, unmatched = set(), [], 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by the interruption
+            if not isinstance(result, dict) or result.get("id") is None:
+                unmatched += 1
+                continue
+            if "error" not in result and result["id"] not in done:
+                done.add(result["id"])
+                kept.append(line if line.endswith("\n") else line + "\n")
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text("".join(kept), encoding="utf-8")
+    os.replace(tmp, path)
+    if unmatched:
+        print(f"Dropped {unmatched} lines without an id from {path}", file=sys.stderr)
+    return done
+
+
+async def run_bulk(records, call, concurrency=8, ordered=False, window=None):
+    """Run `await call(record)` over records, yielding result dicts as they are ready.
+
+    With `ordered`, results come out in input order; at most `window` records
+    (default 4 x concurrency) are started ahead of the oldest unfinished one, so
+    a slow record cannot make the reorder buffer grow without bound.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    window = asyncio.Semaphore(window or concurrency * 4)
+    finished = asyncio.Queue()
+    tasks = set()
+
+    async def run(position, record):
+        start = time.perf_counter()
+        result = {"id": record.get("id")}
+        try:
+            result.update(await call(record))
+        except Exception as exc:
+            result["error"] = repr(exc)
+        finally:
+            slots.release()
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+        await finished.put((position, result))
+
+    async def feed():
+        # The input (a file or stdin) is read on a worker thread, so a slow
+        # source never blocks the event loop while calls are in flight
+        source = iter(records)
+        scheduled = 0
+        try:
+            for position in itertools.count():
+                record = await asyncio.to_thread(next, source, None)
+                if record is None:
+                    break
+                await window.acquire()
+                await slots.acquire()
+                task = asyncio.create_task(run(position, record))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                scheduled += 1
+        finally:
+            await finished.put((None, scheduled))
+
+    feeder = asyncio.create_task(feed())
+    buffered, next_position, emitted, total = {}, 0, 0, None
+    while total is None or emitted < total:
+        position, result = await finished.get()
+        if position is None:
+            total = result
+            continue
+        if not ordered:
+            emitted += 1
+            window.release()
+            yield result
+            continue
+        buffered[position] = result
+        while next_position in buffered:
+            emitted += 1
+            next_position += 1
+            window.release()
+            yield buffered.pop(next_position - 1)
+    await feeder  # re-raise input errors
+
+
+async def run_file(lines, call, output=None, concurrency=8, ordered=False, resume=False,
+                   report_every=1000):
+    """Run JSONL prompt lines to `output` (a path, or stdout when None)."""
+    records = iter_records(lines)
+    skipped = 0
+    if resume:
+        done = load_checkpoint(output)
+        records = (r for r in records if r.get("id") not in done)
+        skipped = len(done)
+    out = open(output, "a" if resume else "w", encoding="utf-8") if output else sys.stdout
+
+    started = time.perf_counter()
+    count = errors = 0
+    try:
+        async for result in run_bulk(records, call, concurrency, ordered):
+            out.write(json.dumps(result) + "\n")
+            out.flush()  # every line written is checkpointed
+            count += 1
+            errors += "error" in result
+            if report_every and count % report_every == 0:
+                elapsed = time.perf_counter() - started
+                print(f"{count} done ({count / elapsed:.1f}/s, {errors} errors)", file=sys.stderr)
+    finally:
+        if output:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"Ran {count} prompts in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.1f}/s, "
+          f"concurrency={concurrency}, {errors} errors, {skipped} already done)", file=sys.stderr)
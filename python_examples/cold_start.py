@@ -0,0 +1,129 @@
+"""
+RAG Cold-Start Benchmark
+Author: Optimum AI Lab
+Description: Compares process cold start for rag_query.py when the vector
+store is rebuilt at start-up (embed everything, then answer) against loading
+the persisted, memory-mapped index. Each measurement runs in a fresh Python
+process against the local OpenAI-compatible stand-in and reports time to the
+first answer and peak RSS, for a range of synthetic corpus sizes. Every run
+uses its own embedding cache in a temporary directory, and the rebuild starts
+from an empty one, so it pays for embedding the whole corpus. Peak RSS needs
+the `resource` module, or psutil on Windows.
+
+Usage:
+    python cold_start.py --sizes 1000 10000 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+WORDS = (
+    "agent enterprise framework python java latency throughput vector index "
+    "retrieval embedding prompt model token cost memory cache query answer "
+    "document pipeline service cluster replica shard benchmark"
+).split()
+
+# Runs inside the child process; prints one JSON line with its measurements
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import rag_query
+mode, corpus = sys.argv[1], sys.argv[2]
+if mode == "rebuild":
+    rag_query._vectorstore = rag_query.build_vectorstore(rag_query.read_corpus(corpus))
+answer = rag_query.chain.invoke("What does Optimum AI Lab do?")
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        rss *= 1024  # Linux reports kilobytes
+except ImportError:  # Windows: peak working set, if psutil is installed
+    try:
+        import psutil
+        rss = psutil.Process().memory_info().peak_wset
+    except ImportError:
+        rss = None
+print(json.dumps({"seconds_to_first_answer": elapsed, "peak_rss_bytes": rss}))
+"""
+
+
+def synthetic_corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(24)) for _ in range(n)]
+
+
+def run_child(mode, corpus_path, env):
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, mode, str(corpus_path)],
+        cwd=HERE, env=env, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - started
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_wall_seconds"] = wall
+    return result
+
+
+def measure(size, workdir, base_env):
+    corpus_path = workdir / f"corpus_{size}.txt"
+    corpus_path.write_text("\n".join(synthetic_corpus(size)) + "\n", encoding="utf-8")
+    index_dir = workdir / f"index_{size}"
+    env = dict(base_env, RAG_INDEX_DIR=str(index_dir),
+               RAG_EMBEDDING_CACHE=str(workdir / f"embeddings_{size}.sqlite3"))
+
+    subprocess.run(
+        [sys.executable, "rag_query.py", "--build", "--corpus", str(corpus_path)],
+        cwd=HERE, env=env, capture_output=True, check=True,
+    )
+    # An empty embedding cache, so the rebuild embeds the whole corpus again
+    rebuild_env = dict(env, RAG_EMBEDDING_CACHE=str(workdir / f"embeddings_{size}_rebuild.sqlite3"))
+    return {
+        "documents": size,
+        "rebuild": run_child("rebuild", corpus_path, rebuild_env),
+        "mmap": run_child("mmap", corpus_path, env),
+    }
+
+
+def _mb(rss):
+    return "n/a" if rss is None else f"{rss / 2**20:.1f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start: rebuild vs memory-mapped index")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 50000])
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible endpoint; starts a local stand-in when omitted")
+    parser.add_argument("--output", type=Path, default=None, help="optional JSON results file")
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    if base_url is None:
+        from stub_server import StubConfig, serve_in_background
+        base_url = serve_in_background(config=StubConfig(latency_ms=5.0, jitter_ms=0.0)).base_url
+    env = dict(os.environ, OPENAI_BASE_URL=base_url)
+    env.setdefault("OPENAI_API_KEY", "stub")
+
+    results = []
+    print(f"{'docs':>8} | {'rebuild s':>10} {'rebuild MB':>11} | {'mmap s':>8} {'mmap MB':>8}")
+    print("-" * 56)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            row = measure(size, Path(tmp), env)
+            results.append(row)
+            rebuild, mmap = row["rebuild"], row["mmap"]
+            print(f"{size:>8} | {rebuild['process_wall_seconds']:>10.2f} "
+                  f"{_mb(rebuild['peak_rss_bytes']):>11} | "
+                  f"{mmap['process_wall_seconds']:>8.2f} {_mb(mmap['peak_rss_bytes']):>8}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
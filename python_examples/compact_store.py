@@ -0,0 +1,271 @@
+"""
+Compact Vector Store Storage
+Author: Optimum AI Lab
+Description: A memory-lean storage layout for the rag_query.py vector store.
+Vectors are kept as float16 or 8-bit scalar-quantized codes (FAISS
+IndexScalarQuantizer) instead of float32, and document text lives in one
+contiguous UTF-8 buffer addressed by an offsets array instead of one Python
+Document object per chunk. Both files are memory-mapped on load, so replicas
+on the same node share the pages through the OS page cache.
+
+Layout of a compact index directory:
+    index.faiss                    fp16 / int8 FAISS index
+    docstore/texts.bin             concatenated UTF-8 document texts
+    docstore/text_offsets.npy      int64 offsets, len = n_docs + 1
+    docstore/metadata.bin          concatenated JSON metadata
+    docstore/metadata_offsets.npy  int64 offsets, len = n_docs + 1
+
+Only a flat float32 index is re-encoded as fp16 / int8. An IVF, HNSW or PQ
+index (see ann_index.py) keeps its own structure: convert it with
+--vectors keep, which rewrites only the docstore.
+
+Usage:
+    python compact_store.py convert --index-dir faiss_index --vectors fp16
+    python compact_store.py convert --index-dir faiss_index --vectors keep
+    python compact_store.py bench --docs 100000 --dim 1536
+"""
+
+import argparse
+import json
+import pickle
+import tempfile
+import tracemalloc
+from collections.abc import Mapping
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+import ann_index
+
+VECTOR_FORMATS = ("fp32", "fp16", "int8")
+# "keep": leave the index file as it is and compact only the docstore
+CONVERT_FORMATS = VECTOR_FORMATS + ("keep",)
+
+# read_index flags that memory-map the index file instead of reading it onto the
+# heap. Older FAISS builds lack IO_FLAG_MMAP_IFC (mmap for flat indexes) and
+# simply ignore it.
+MMAP_FLAGS = (
+    getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    | faiss.IO_FLAG_MMAP
+    | faiss.IO_FLAG_READ_ONLY
+)
+
+
+def write_buffer(path, items):
+    """Write byte strings back to back; return their int64 offsets array."""
+    offsets = [0]
+    with open(path, "wb") as f:
+        for item in items:
+            f.write(item)
+            offsets.append(offsets[-1] + len(item))
+    return np.asarray(offsets, dtype=np.int64)
+
+
+def read_buffer(path):
+    # np.memmap cannot map an empty file
+    if Path(path).stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+class PositionIds(Mapping):
+    """index_to_docstore_id for a compact store: row i has id str(i), no dict needed."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __getitem__(self, position):
+        if not 0 <= int(position) < self.size:
+            raise KeyError(position)
+        return str(position)
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def __len__(self):
+        return self.size
+
+
+class CompactDocstore:
+    """Read-only docstore over contiguous text and metadata buffers.
+
+    Documents are decoded on demand in `search`; nothing is materialized per
+    document up front. Only the read side of LangChain's Docstore interface
+    is implemented, so adding to or deleting from a store loaded this way
+    fails; rebuild (convert) the store to change its contents.
+    """
+
+    def __init__(self, texts, text_offsets, metadata, metadata_offsets):
+        self.texts = texts
+        self.text_offsets = text_offsets
+        self.metadata = metadata
+        self.metadata_offsets = metadata_offsets
+
+    def __len__(self):
+        return len(self.text_offsets) - 1
+
+    @staticmethod
+    def save(directory, documents):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        documents = list(documents)
+        np.save(directory / "text_offsets.npy", write_buffer(
+            directory / "texts.bin", (d.page_content.encode("utf-8") for d in documents)))
+        np.save(directory / "metadata_offsets.npy", write_buffer(
+            directory / "metadata.bin", (json.dumps(d.metadata).encode("utf-8") for d in documents)))
+
+    @classmethod
+    def load(cls, directory):
+        directory = Path(directory)
+        return cls(
+            read_buffer(directory / "texts.bin"),
+            np.load(directory / "text_offsets.npy", mmap_mode="r"),
+            read_buffer(directory / "metadata.bin"),
+            np.load(directory / "metadata_offsets.npy", mmap_mode="r"),
+        )
+
+    def search(self, search):
+        try:
+            i = int(search)
+        except ValueError:
+            return f"ID {search} not found."
+        if not 0 <= i < len(self):
+            return f"ID {search} not found."
+        text = bytes(self.texts[self.text_offsets[i]:self.text_offsets[i + 1]]).decode("utf-8")
+        metadata = json.loads(bytes(self.metadata[self.metadata_offsets[i]:self.metadata_offsets[i + 1]]))
+        return Document(id=str(i), page_content=text, metadata=metadata)
+
+
+def is_compact(index_dir):
+    # convert() removes index.pkl, so a pickle means save_local wrote the directory last
+    index_dir = Path(index_dir)
+    return (index_dir / "docstore" / "text_offsets.npy").exists() and not (index_dir / "index.pkl").exists()
+
+
+def load_compact(index_dir, mmap_flags=0):
+    """Return (faiss index, docstore, index_to_docstore_id) for a compact directory."""
+    index_dir = Path(index_dir)
+    index = faiss.read_index(str(index_dir / "index.faiss"), mmap_flags)
+    docstore = CompactDocstore.load(index_dir / "docstore")
+    return index, docstore, PositionIds(len(docstore))
+
+
+def save_compact(index_dir, vectors, documents, vector_format="fp16"):
+    """Write vectors (in row order) and their documents in the compact layout."""
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    spec = "flat" if vector_format == "fp32" else vector_format
+    faiss.write_index(ann_index.build_index(vectors, spec), str(index_dir / "index.faiss"))
+    CompactDocstore.save(index_dir / "docstore", documents)
+
+
+def convert(index_dir, vector_format="fp16"):
+    """Rewrite a FAISS.save_local directory (index.faiss + index.pkl) in compact form.
+
+    With `vector_format` "keep" the index file is left untouched. Otherwise
+    the index must be flat float32: re-encoding an IVF/HNSW/PQ or already
+    quantized index would drop its structure or quantize decoded vectors again.
+    """
+    index_dir = Path(index_dir)
+    index = faiss.read_index(str(index_dir / "index.faiss"))
+    if vector_format != "keep" and type(index) not in (faiss.IndexFlat, faiss.IndexFlatL2):
+        raise ValueError(
+            f"{index_dir} holds a {type(index).__name__}, not a flat float32 index; re-encoding it as "
+            f"{vector_format} would discard its structure. Use vector format 'keep' to compact only the docstore.")
+    with open(index_dir / "index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    documents = (docstore.search(index_to_docstore_id[i]) for i in range(index.ntotal))
+    if vector_format == "keep":
+        CompactDocstore.save(index_dir / "docstore", documents)
+    else:
+        save_compact(index_dir, ann_index.reconstruct_all(index), documents, vector_format)
+    (index_dir / "index.pkl").unlink()
+
+
+# ============================================================================
+# BYTES PER DOCUMENT / RECALL BENCHMARK
+# ============================================================================
+
+def synthetic_documents(n, words_per_doc=120, seed=0):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"term{i}" for i in range(5000)])
+    for i in range(n):
+        text = " ".join(rng.choice(vocabulary, words_per_doc))
+        yield Document(page_content=text, metadata={"source": f"doc{i // 10}.txt", "chunk": i % 10})
+
+
+def python_docstore_bytes(documents):
+    """Heap bytes of the default InMemoryDocstore + index_to_docstore_id dict."""
+    # Serialize first so every string and dict is allocated while tracing
+    raw = [(d.page_content.encode("utf-8"), json.dumps(d.metadata)) for d in documents]
+    tracemalloc.start()
+    ids = [str(i) for i in range(len(raw))]
+    docstore = InMemoryDocstore({
+        doc_id: Document(id=doc_id, page_content=text.decode("utf-8"), metadata=json.loads(metadata))
+        for doc_id, (text, metadata) in zip(ids, raw)
+    })
+    mapping = dict(enumerate(ids))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del docstore, mapping
+    return size
+
+
+def run_bench(args):
+    vectors = ann_index.synthetic_vectors(args.docs, args.dim)
+    documents = list(synthetic_documents(args.docs))
+    rng = np.random.default_rng(1)
+    picks = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = np.ascontiguousarray(picks + 0.05 * rng.standard_normal(picks.shape), dtype=np.float32)
+    exact = ann_index.build_index(vectors, "flat")
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{args.docs} documents, {args.dim}-dim vectors, recall@{args.k} vs float32\n")
+    print(f"{'vectors':<10} {'bytes/doc':>10} {'recall':>8}")
+    print("-" * 30)
+    for vector_format in VECTOR_FORMATS:
+        spec = "flat" if vector_format == "fp32" else vector_format
+        index = ann_index.build_index(vectors, spec)
+        _, found = index.search(queries, args.k)
+        per_doc = faiss.serialize_index(index).nbytes / args.docs
+        print(f"{vector_format:<10} {per_doc:>10.1f} {ann_index.recall_at_k(found, truth):>8.4f}")
+
+    python_bytes = python_docstore_bytes(documents)
+    with tempfile.TemporaryDirectory() as tmp:
+        CompactDocstore.save(tmp, documents)
+        compact_bytes = sum(p.stat().st_size for p in Path(tmp).iterdir())
+    text_bytes = sum(len(d.page_content.encode("utf-8")) for d in documents)
+    print(f"\n{'docstore':<10} {'bytes/doc':>10}")
+    print("-" * 21)
+    print(f"{'raw text':<10} {text_bytes / args.docs:>10.1f}")
+    print(f"{'python':<10} {python_bytes / args.docs:>10.1f}")
+    print(f"{'compact':<10} {compact_bytes / args.docs:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact storage for the RAG vector store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    conv = commands.add_parser("convert", help="rewrite a saved index directory in compact form")
+    conv.add_argument("--index-dir", required=True)
+    conv.add_argument("--vectors", choices=CONVERT_FORMATS, default="fp16",
+                      help="re-encode a flat index, or 'keep' the index and compact only the docstore")
+
+    bench = commands.add_parser("bench", help="bytes per document and recall impact")
+    bench.add_argument("--docs", type=int, default=50000)
+    bench.add_argument("--dim", type=int, default=1536)
+    bench.add_argument("--queries", type=int, default=500)
+    bench.add_argument("-k", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        try:
+            convert(args.index_dir, args.vectors)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(f"Converted {args.index_dir} to compact storage ({args.vectors} vectors)")
+    else:
+        run_bench(args)
@@ -0,0 +1,135 @@
+"""
+Token-Budgeted Context Packing for RAG Prompts
+Author: Optimum AI Lab
+Description: Sits between the retriever and the prompt in rag_query.py.
+Retrieved chunks are deduplicated (exact and near-duplicate), the overlap
+that chunking leaves between neighbouring chunks is trimmed, and the
+remaining chunks are packed best-first until a token budget is reached.
+Token counts use the model's tiktoken encoding when it is available (the
+encoding and per-chunk counts are cached) and a 4-characters-per-token
+estimate otherwise. Tokens saved per query are tracked in stats().
+"""
+
+import hashlib
+import re
+import threading
+from functools import lru_cache
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model="gpt-4-turbo-preview"):
+    """tiktoken encoding for `model`, or None if tiktoken/its data is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def count_tokens(text, model="gpt-4-turbo-preview"):
+    encoding = get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def shingles(text, size=3):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def strip_overlap(previous, text, min_chars=20, max_chars=500):
+    """Drop the head of `text` that repeats the tail of `previous` (chunk overlap)."""
+    limit = min(len(previous), len(text), max_chars)
+    for size in range(limit, min_chars - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip()
+    return text
+
+
+class ContextPacker:
+    """Turns a best-first list of retrieved Documents into a budgeted context string."""
+
+    def __init__(self, budget_tokens=2000, near_duplicate=0.8, model="gpt-4-turbo-preview",
+                 separator="\n\n"):
+        self.budget_tokens = budget_tokens
+        self.near_duplicate = near_duplicate
+        self.model = model
+        self.separator = separator
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.tokens_retrieved = 0
+        self.tokens_packed = 0
+        self.last = {}
+
+    def _dedupe(self, texts):
+        kept, kept_shingles, seen = [], [], set()
+        for text in texts:
+            digest = hashlib.sha1(" ".join(text.split()).lower().encode("utf-8")).digest()
+            if digest in seen:
+                continue
+            current = shingles(text)
+            if any(jaccard(current, other) >= self.near_duplicate for other in kept_shingles):
+                continue
+            seen.add(digest)
+            kept.append(text)
+            kept_shingles.append(current)
+        return kept
+
+    def _trim_overlap(self, texts):
+        trimmed = []
+        for text in texts:
+            for previous in trimmed:
+                text = strip_overlap(previous, text)
+            if text:
+                trimmed.append(text)
+        return trimmed
+
+    def pack(self, documents):
+        texts = [getattr(d, "page_content", d) for d in documents]
+        separator_tokens = count_tokens(self.separator, self.model)
+        # Baseline: every retrieved chunk joined as-is
+        retrieved = sum(count_tokens(t, self.model) for t in texts) + separator_tokens * max(len(texts) - 1, 0)
+        candidates = self._trim_overlap(self._dedupe(texts))
+
+        packed, used = [], 0
+        for text in candidates:
+            cost = count_tokens(text, self.model) + (separator_tokens if packed else 0)
+            # Skip chunks that do not fit; a later, shorter one still might
+            if used + cost <= self.budget_tokens:
+                packed.append(text)
+                used += cost
+
+        with self._lock:
+            self.queries += 1
+            self.tokens_retrieved += retrieved
+            self.tokens_packed += used
+            self.last = {
+                "chunks_retrieved": len(texts),
+                "chunks_packed": len(packed),
+                "tokens_retrieved": retrieved,
+                "tokens_packed": used,
+                "tokens_saved": retrieved - used,
+            }
+        return self.separator.join(packed)
+
+    def stats(self):
+        return {
+            "budget_tokens": self.budget_tokens,
+            "tokenizer": "tiktoken" if get_encoding(self.model) else "estimate",
+            "queries": self.queries,
+            "tokens_retrieved": self.tokens_retrieved,
+            "tokens_packed": self.tokens_packed,
+            "tokens_saved": self.tokens_retrieved - self.tokens_packed,
+            "tokens_saved_per_query": round((self.tokens_retrieved - self.tokens_packed) / self.queries, 1)
+            if self.queries else 0.0,
+        }
@@ -0,0 +1,140 @@
+"""
+Persistent Embedding Cache
+Author: Optimum AI Lab
+Description: A content-addressed cache for document embeddings, stored in a
+local SQLite file. Entries are keyed by (model name and output dimensions,
+SHA-256 of the text), so re-ingesting a mostly unchanged corpus only sends new
+or changed chunks to the embedding API. The cache is capped at a maximum number of entries (and
+optionally bytes) and evicts the least recently used ones (sqlite_lru);
+hit/miss/eviction counters are kept per process.
+
+Usage:
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(), "embedding_cache.sqlite3")
+    FAISS.from_texts(texts, embedding=embeddings)
+    print(embeddings.stats())
+"""
+
+import asyncio
+import hashlib
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from sqlite_lru import SQLiteLRU
+
+# SQLite's default limit on host parameters per statement is 999
+_LOOKUP_CHUNK = 500
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector):
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob):
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache(SQLiteLRU):
+    """SQLite-backed (model, text hash) -> vector store with LRU eviction."""
+
+    def __init__(self, path, max_entries=1_000_000, max_bytes=None):
+        super().__init__(path, "embeddings",
+                         ["model TEXT NOT NULL", "text_hash TEXT NOT NULL", "vector BLOB NOT NULL"],
+                         ["model", "text_hash"], max_entries=max_entries, max_bytes=max_bytes)
+
+    def get_many(self, model, hashes):
+        """Return {hash: vector} for the cached subset of `hashes`."""
+        found = {}
+        with self._lock, self._conn:
+            for i in range(0, len(hashes), _LOOKUP_CHUNK):
+                chunk = hashes[i:i + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = _unpack(blob)
+            if found:
+                self._touch([(model, h) for h in found])
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model, items):
+        """Store (hash, vector) pairs, then evict down to the bounds."""
+        rows = []
+        for h, v in items:
+            blob = _pack(v)
+            rows.append(((model, h, blob), len(blob)))
+        with self._lock, self._conn:
+            self._store(rows)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends uncached texts to the underlying model.
+
+    Query embeddings are passed straight through unless `cache_queries` is set,
+    since queries rarely repeat verbatim and are not part of ingestion. The
+    model name includes the requested `dimensions`, so shortened and full-size
+    vectors of one model are kept apart. The async methods run the SQLite work
+    in a thread, off the event loop.
+    """
+
+    def __init__(self, underlying, path="embedding_cache.sqlite3", max_entries=1_000_000,
+                 model_name=None, cache_queries=False):
+        self.underlying = underlying
+        self.cache = path if isinstance(path, EmbeddingCache) else EmbeddingCache(path, max_entries)
+        self.model_name = model_name or getattr(underlying, "model", type(underlying).__name__)
+        dimensions = getattr(underlying, "dimensions", None)
+        if dimensions:
+            self.model_name = f"{self.model_name}@{dimensions}"
+        self.cache_queries = cache_queries
+
+    def _split(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        # Look each distinct text up once, even if it repeats within the batch
+        unique = list(dict.fromkeys(hashes))
+        cached = self.cache.get_many(self.model_name, unique)
+        missing = {}
+        for t, h in zip(texts, hashes):
+            if h not in cached and h not in missing:
+                missing[h] = t
+        return hashes, cached, missing
+
+    def _merge(self, hashes, cached, missing, vectors):
+        fresh = dict(zip(missing, vectors))
+        if fresh:
+            self.cache.put_many(self.model_name, fresh.items())
+        cached.update(fresh)
+        return [cached[h] for h in hashes]
+
+    def embed_documents(self, texts):
+        hashes, cached, missing = self._split(texts)
+        vectors = self.underlying.embed_documents(list(missing.values())) if missing else []
+        return self._merge(hashes, cached, missing, vectors)
+
+    async def aembed_documents(self, texts):
+        hashes, cached, missing = await asyncio.to_thread(self._split, texts)
+        vectors = await self.underlying.aembed_documents(list(missing.values())) if missing else []
+        return await asyncio.to_thread(self._merge, hashes, cached, missing, vectors)
+
+    def embed_query(self, text):
+        if self.cache_queries:
+            return self.embed_documents([text])[0]
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text):
+        if self.cache_queries:
+            return (await self.aembed_documents([text]))[0]
+        return await self.underlying.aembed_query(text)
+
+    def stats(self):
+        return dict(self.cache.stats(), model=self.model_name)
@@ -0,0 +1,63 @@
+"""
+Example Tools for the Tool-Calling Examples
+Author: Optimum AI Lab
+Description: The tools mcp_tool_call.py binds to the model. They live in their
+own module so the MCP server (mcp_server.py) and the process-pool workers
+(agent_loop.py) can import them without building an LLM client.
+"""
+
+import asyncio
+import math
+
+from langchain_core.tools import tool
+
+from agent_loop import cpu_bound
+from tool_cache import cacheable
+
+# Exchange rates per US dollar served by the (simulated) rates API
+EXCHANGE_RATES = {"USD": 1.0, "EUR": 0.92, "GBP": 0.79, "JPY": 151.6, "INR": 83.3}
+
+@cacheable()
+@tool
+def multiply(a: int, b: int) -> int:
+    """Multiplies two integers together."""
+    return a * b
+
+@cacheable()
+@tool
+def add(a: int, b: int) -> int:
+    """Adds two integers together."""
+    return a + b
+
+@cacheable()
+@tool
+def divide(a: float, b: float) -> float:
+    """Divides the first number by the second number."""
+    if b == 0:
+        return "Cannot divide by zero"
+    return a / b
+
+@cacheable()
+@cpu_bound
+@tool
+def count_primes(limit: int) -> int:
+    """Counts the prime numbers below the given limit."""
+    if limit < 3:
+        return 0
+    sieve = bytearray([1]) * limit
+    sieve[:2] = b"\0\0"
+    for i in range(2, math.isqrt(limit - 1) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, limit, i)))
+    return sum(sieve)
+
+# Rates move, so a cached rate is only reused for a minute
+@cacheable(ttl=60)
+@tool
+async def get_exchange_rate(base: str, quote: str) -> float:
+    """Returns how many units of the quote currency one unit of the base currency buys (ISO codes)."""
+    await asyncio.sleep(0.2)  # stands in for a call to a rates API
+    return round(EXCHANGE_RATES[quote.upper()] / EXCHANGE_RATES[base.upper()], 4)
+
+
+tools = [multiply, add, divide, count_primes, get_exchange_rate]
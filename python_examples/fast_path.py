@@ -0,0 +1,245 @@
+"""
+Deterministic Fast Path for Structured Tool Queries
+Author: Optimum AI Lab
+Description: A pre-router in front of the tool-calling model. Queries like
+"What is 15 * 8?" need no model to pick the tool. The query is split into
+clauses (on "and", commas and semicolons). Each clause must fully match one
+of a small set of compiled patterns: arithmetic, prime counts and exchange
+rates. The arguments a match extracts must also validate against the tool's
+own schema. Only then are the tools run directly (concurrently, through
+agent_loop.ToolExecutor) and the answer filled in from templates, provided
+each result passes the rule's check (a number, for the default rules; "Cannot
+divide by zero" is not one). Anything less falls back to the LLM. A hit saves
+the model round trips of the normal loop, usually one to choose the tools and
+one to phrase the answer. Latency and model calls are recorded for the
+LLM-path runs that used tools, and the time and calls saved are estimated
+from those observed runs rather than assumed.
+
+Usage:
+    python fast_path.py bench --latency-ms 300
+"""
+
+import argparse
+import asyncio
+import re
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+NUMBER = r"(-?\d+(?:\.\d+)?)"
+# Optional lead-in words of a question clause
+LEAD = r"(?:(?:what\s+is|what's|calculate|compute|evaluate|how\s+much\s+is)\s+)?(?:the\s+)?"
+OPERATORS = [
+    (r"\*|x|×|times|multiplied\s+by", "multiply", "*"),
+    (r"\+|plus", "add", "+"),
+    (r"/|÷|divided\s+by|over", "divide", "/"),
+]
+CLAUSE_SEPARATOR = re.compile(r"\s*(?:,|;|\band\b)\s*", re.IGNORECASE)
+
+
+def _number(text):
+    return float(text) if "." in text else int(text)
+
+
+def is_number(result):
+    """Result check for rules whose templates need a numeric tool result."""
+    try:
+        float(result)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _arithmetic_rules():
+    for operator, tool, symbol in OPERATORS:
+        yield (
+            re.compile(rf"{LEAD}{NUMBER}\s*(?:{operator})\s*{NUMBER}", re.IGNORECASE),
+            tool,
+            lambda m: {"a": _number(m[1]), "b": _number(m[2])},
+            lambda m, result, symbol=symbol: f"{m[1]} {symbol} {m[2]} = {result}",
+            is_number,
+        )
+
+
+# (clause pattern, tool name, arguments from the match, answer from the match and result, result check)
+DEFAULT_RULES = [
+    *_arithmetic_rules(),
+    (
+        re.compile(rf"{LEAD}(?:how\s+many\s+)?prime(?:\s+number)?s?\s+(?:are\s+(?:there\s+)?)?"
+                   r"(?:below|under|less\s+than)\s+(\d+)", re.IGNORECASE),
+        "count_primes",
+        lambda m: {"limit": int(m[1])},
+        lambda m, result: f"There are {result} primes below {m[1]}",
+        is_number,
+    ),
+    (
+        # Currency codes must be upper case, so ordinary words never match
+        re.compile(rf"{LEAD}(?-i:([A-Z]{{3}}))\s+to\s+(?-i:([A-Z]{{3}}))\s+(?:exchange\s+)?rate", re.IGNORECASE),
+        "get_exchange_rate",
+        lambda m: {"base": m[1], "quote": m[2]},
+        lambda m, result: f"1 {m[1]} = {result} {m[2]}",
+        is_number,
+    ),
+]
+
+
+class PreRouter:
+    """Answers fully matching queries with direct tool calls; returns None for the rest."""
+
+    def __init__(self, tools, rules=DEFAULT_RULES):
+        self.tools = {tool.name: tool for tool in tools}
+        self.rules = [rule for rule in rules if rule[1] in self.tools]
+        self.hits = 0
+        self.misses = 0
+        self.fast_s = 0.0
+        self.llm_runs = 0
+        self.llm_calls = 0
+        self.llm_s = 0.0
+
+    def _match_clause(self, clause):
+        for pattern, name, arguments, answer, check in self.rules:
+            match = pattern.fullmatch(clause)
+            if match is None:
+                continue
+            args = arguments(match)
+            schema = self.tools[name].args_schema
+            try:
+                if hasattr(schema, "model_validate"):
+                    schema.model_validate(args)
+            except ValueError:
+                return None  # e.g. 1.5 for an int parameter: let the model decide
+            return name, args, match, answer, check
+        return None
+
+    def match(self, query):
+        """[(tool, args, match, answer template, result check)] if every clause matches, else None."""
+        clauses = [c for c in CLAUSE_SEPARATOR.split(query.strip().rstrip("?.! ")) if c]
+        matches = [self._match_clause(clause) for clause in clauses]
+        if not matches or any(m is None for m in matches):
+            return None
+        return matches
+
+    async def run(self, query, executor):
+        """A run_agent-shaped result answered without the model, or None to fall back."""
+        started = time.perf_counter()
+        matches = self.match(query)
+        if matches is None:
+            self.misses += 1
+            return None
+        calls = [{"name": name, "args": args, "id": f"fast_{i}", "type": "tool_call"}
+                 for i, (name, args, _, _, _) in enumerate(matches)]
+        tool_messages, timings = await executor.run(calls)
+        if any(message.status == "error" or not check(message.content)
+               for (_, _, _, _, check), message in zip(matches, tool_messages)):
+            self.misses += 1
+            return None  # an error or unexpected result; the model can explain or retry
+        answer = "; ".join(template(match, message.content)
+                           for (_, _, match, template, _), message in zip(matches, tool_messages)) + "."
+        elapsed = time.perf_counter() - started
+        self.hits += 1
+        self.fast_s += elapsed
+        messages = [HumanMessage(query), AIMessage(content="", tool_calls=calls), *tool_messages,
+                    AIMessage(content=answer)]
+        return {
+            "answer": answer,
+            "messages": messages,
+            "steps": [{"step": 1, "model_ms": 0.0, "tools": timings, "tools_ms": round(elapsed * 1000.0, 2),
+                       "fast_path": True}],
+            "stopped": None,
+            "total_ms": round(elapsed * 1000.0, 2),
+        }
+
+    def observe(self, result):
+        """Record an LLM-path result that used tools, as the baseline for the time and calls saved."""
+        if len(result["steps"]) > 1:
+            self.llm_runs += 1
+            self.llm_calls += len(result["steps"])  # one step per model call
+            self.llm_s += result["total_ms"] / 1000.0
+
+    def stats(self):
+        queries = self.hits + self.misses
+        fast_ms = self.fast_s / self.hits * 1000.0 if self.hits else None
+        llm_ms = self.llm_s / self.llm_runs * 1000.0 if self.llm_runs else None
+        llm_calls = self.llm_calls / self.llm_runs if self.llm_runs else None
+        return {
+            "queries": queries,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / queries, 4) if queries else 0.0,
+            "llm_calls_mean": round(llm_calls, 2) if llm_calls is not None else None,
+            "est_model_calls_avoided": round(self.hits * llm_calls, 1) if llm_calls is not None else None,
+            "fast_ms_mean": round(fast_ms, 2) if fast_ms is not None else None,
+            "llm_ms_mean": round(llm_ms, 2) if llm_ms is not None else None,
+            "est_saved_ms": round(self.hits * (llm_ms - fast_ms), 1) if fast_ms and llm_ms else None,
+        }
+
+
+# ============================================================================
+# BENCHMARK AGAINST THE STAND-IN MODEL
+# ============================================================================
+
+BENCH_QUERIES = [
+    "What is 15 * 8?",
+    "Calculate 100 + 50",
+    "What is 144 divided by 12?",
+    "What is 5 / 0?",  # divide's answer is not a number, so the model explains it
+    "What is 15 * 8 and 100 + 50?",
+    "How many primes are below 100000?",
+    "What is the USD to JPY exchange rate?",
+    # Free-form phrasings the patterns do not fully match fall back to the model
+    "Could you multiply 12 by 12 for me?",
+    "Roughly how much is 144 divided by 12, in words?",
+    "If I add 7 to 35, what do I get?",
+    "What's the exchange rate between GBP and EUR today?",
+]
+
+
+async def run_bench(args):
+    from langchain_openai import ChatOpenAI
+
+    from agent_loop import ToolExecutor, run_agent
+    from stats import summarize_latencies
+    from example_tools import tools
+    from rate_limiter import http_clients
+    from stub_server import StubConfig, serve_in_background
+
+    server = serve_in_background(config=StubConfig(latency_ms=args.latency_ms, seed=0))
+    client, async_client = http_clients()
+    llm_with_tools = ChatOpenAI(model="gpt-4-turbo-preview", base_url=server.base_url, api_key="stub",
+                                http_client=client, http_async_client=async_client).bind_tools(tools)
+    # No tool cache, so both passes execute every tool call
+    executor = ToolExecutor(tools, cache=None)
+    executor.warm_up()
+    queries = [BENCH_QUERIES[i % len(BENCH_QUERIES)] for i in range(args.queries)]
+    print(f"{args.queries} queries ({len(BENCH_QUERIES)}-query mix), stand-in model latency "
+          f"{args.latency_ms:.0f} ms\n")
+    print(f"{'mode':<10} {'hit rate':>9} {'model calls':>12} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8}")
+    print("-" * 60)
+    for label, pre_router in (("llm only", None), ("fast path", PreRouter(tools))):
+        latencies = []
+        calls_before = server.config.request_count
+        started = time.perf_counter()
+        for query in queries:
+            result = await pre_router.run(query, executor) if pre_router else None
+            if result is None:
+                result = await run_agent(llm_with_tools, executor, query)
+                if pre_router:
+                    pre_router.observe(result)
+            latencies.append(result["total_ms"] / 1000.0)
+        summary = summarize_latencies(latencies)
+        hit_rate = f"{pre_router.stats()['hit_rate']:.0%}" if pre_router else "-"
+        print(f"{label:<10} {hit_rate:>9} {server.config.request_count - calls_before:>12} "
+              f"{summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} {time.perf_counter() - started:>8.2f}")
+    print(f"\nFast path: {pre_router.stats()}")
+    executor.close()
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic fast path for structured tool queries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("bench", help="agent loop with and without the fast path")
+    bench.add_argument("--latency-ms", type=float, default=300.0, help="stand-in model latency")
+    bench.add_argument("--queries", type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(run_bench(args))
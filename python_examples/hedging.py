@@ -0,0 +1,275 @@
+"""
+Hedged Requests for LLM Calls
+Author: Optimum AI Lab
+Description: Tail latency on LLM calls is often caused by a few slow upstream
+responses rather than by slow calls in general. A hedged call sends a
+duplicate request when the first one has not answered within a percentile
+(p95 by default) of recent latencies for the same endpoint and model (embedding
+and chat calls keep separate windows). The first response to arrive wins, and
+the other request is cancelled and its connection dropped. The hedge rate is
+capped by a budget: every call earns `budget` credits and a hedge costs one,
+so at most about `budget` x 100% extra requests are sent, whatever the
+latency.
+
+This is a transport layer inside the shared HTTP clients (see
+rate_limiter.py), so hedges are rate limited like any other request. Latency
+is measured around the whole attempt, rate-limiter wait included, so hedging
+backs off on its own while the limiter is queueing. The window records how
+long the first request took (or had been running when a hedge beat it), never
+the hedge's own shorter time, so winning hedges do not pull the trigger down.
+Streaming requests are never hedged. Synchronous calls (ChatOpenAI.invoke)
+run on a background event loop, so the loser is cancelled for them too.
+Enable it with LLM_HEDGE=<percentile>, e.g.:
+    LLM_HEDGE=95 LLM_HEDGE_BUDGET=0.1 python api_call.py
+
+Usage:
+    python hedging.py bench --spike-rate 0.02 --spike-ms 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+
+
+def hedgeable(request):
+    """Only complete-response POSTs are hedged; streams pass straight through."""
+    if request.method != "POST":
+        return False
+    try:
+        return not json.loads(request.content or b"{}").get("stream")
+    except (ValueError, AttributeError):
+        return False
+
+
+def request_key(request):
+    """Latency class of a request: endpoint path plus model."""
+    try:
+        model = json.loads(request.content or b"{}").get("model", "")
+    except (ValueError, AttributeError):
+        model = ""
+    return f"{request.url.path}:{model}"
+
+
+async def _fetch(send, request):
+    """One attempt, with its body read in full so the loser can be cancelled at any point."""
+    response = await send(request)
+    try:
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    return httpx.Response(response.status_code, headers=response.headers, stream=httpx.ByteStream(raw),
+                          extensions=response.extensions, request=request)
+
+
+class Hedger:
+    """Hedge delay from rolling latency windows (one per request_key), plus the extra-request budget."""
+
+    def __init__(self, percentile=95.0, budget=0.1, window=1000, min_samples=20, max_credit=2.0):
+        self.percentile = percentile
+        self.budget = budget
+        self.window = window
+        self.min_samples = min_samples
+        self.max_credit = max_credit
+        self._lock = threading.Lock()
+        self._latencies = {}  # request key -> deque of recent latencies
+        self.credit = 0.0
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    @classmethod
+    def from_env(cls):
+        """Hedger for $LLM_HEDGE (percentile, "95" or "p95") and $LLM_HEDGE_BUDGET, or None if unset."""
+        percentile = os.environ.get("LLM_HEDGE")
+        if not percentile:
+            return None
+        budget = os.environ.get("LLM_HEDGE_BUDGET")
+        return cls(percentile=float(percentile.lstrip("pP")), budget=float(budget) if budget else 0.1)
+
+    def delay(self, key=""):
+        """Seconds to wait before hedging a `key` request, or None until there are enough samples."""
+        with self._lock:
+            latencies = self._latencies.get(key, ())
+            if len(latencies) < self.min_samples:
+                return None
+            ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))]
+
+    def _start(self):
+        with self._lock:
+            self.requests += 1
+            self.credit = min(self.max_credit, self.credit + self.budget)
+
+    def _spend(self):
+        with self._lock:
+            if self.credit < 1.0:
+                self.denied += 1
+                return False
+            self.credit -= 1.0
+            self.hedged += 1
+            return True
+
+    def _finish(self, key, latency_s, hedge_won):
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(latency_s)
+            self.hedge_wins += hedge_won
+
+    async def send(self, request, send):
+        """Send `request` through `send` (an async transport call), hedging if it is slow."""
+        self._start()
+        key = request_key(request)
+        delay = self.delay(key)
+        sent = time.perf_counter()
+        primary = asyncio.ensure_future(_fetch(send, request))
+        attempts = {primary}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and self._spend():
+                attempts.add(asyncio.ensure_future(_fetch(send, request)))
+            while not done:
+                done, _ = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                # A failed attempt does not win while another is still running
+                failed = {task for task in done if task.exception() is not None}
+                if failed and len(failed) < len(attempts):
+                    attempts -= failed
+                    done = set()
+            winner = min(done, key=lambda task: task.exception() is not None)
+            response = winner.result()
+            # Time since the first send: the primary's latency, or a lower bound on
+            # it when the hedge won. The hedge's own time would bias the window down.
+            self._finish(key, time.perf_counter() - sent, winner is not primary)
+            return response
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def stats(self):
+        with self._lock:
+            keys = list(self._latencies)
+        delays = {key: self.delay(key) for key in keys}
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_denied": self.denied,
+            "hedge_rate": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "hedge_delay_ms": {key: round(delay * 1000.0, 2) if delay is not None else None
+                               for key, delay in delays.items()},
+        }
+
+
+class AsyncHedgingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, hedger, transport):
+        self.hedger = hedger
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        if not hedgeable(request):
+            return await self.transport.handle_async_request(request)
+        return await self.hedger.send(request, self.transport.handle_async_request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class HedgingTransport(httpx.BaseTransport):
+    """Sync transport that runs hedged requests on a private event loop thread.
+
+    `async_transport` must not be shared with an AsyncClient: its connections
+    belong to this transport's loop. Streams go through the sync `transport`.
+    """
+
+    def __init__(self, hedger, async_transport, transport):
+        self.hedger = hedger
+        self.async_transport = async_transport
+        self.transport = transport
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="hedging-loop", daemon=True).start()
+            return self._loop
+
+    def handle_request(self, request):
+        if not hedgeable(request):
+            return self.transport.handle_request(request)
+        future = asyncio.run_coroutine_threadsafe(
+            self.hedger.send(request, self.async_transport.handle_async_request), self._event_loop())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self):
+        self.transport.close()
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.async_transport.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+# ============================================================================
+# BENCHMARK AGAINST A STAND-IN WITH LATENCY SPIKES
+# ============================================================================
+
+def run_bench(args):
+    from langchain_openai import ChatOpenAI
+
+    from stats import run_load, summarize_latencies
+    from rate_limiter import http_clients
+    from stub_server import StubConfig, serve_in_background
+
+    print(f"Stand-in: {args.latency_ms:.0f} ms base latency, {args.spike_rate:.1%} of requests "
+          f"+{args.spike_ms:.0f} ms; api_call.py scenario (llm.invoke), {args.requests} requests "
+          f"from {args.concurrency} threads\n")
+    print(f"{'client':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'upstream':>9} {'extra':>7}")
+    print("-" * 64)
+    prompt = "Explain why the sky is blue in one sentence."
+    for label, hedger in (
+        ("plain", None),
+        ("hedged", Hedger(percentile=args.percentile, budget=args.budget)),
+    ):
+        server = serve_in_background(config=StubConfig(
+            latency_ms=args.latency_ms, seed=0, spike_rate=args.spike_rate, spike_ms=args.spike_ms))
+        client, async_client = http_clients(hedger=hedger)
+        llm = ChatOpenAI(model="gpt-4-turbo-preview", base_url=server.base_url, api_key="stub",
+                         http_client=client, http_async_client=async_client)
+        latencies, errors, _, _ = run_load(lambda: llm.invoke(prompt), args.concurrency, args.requests,
+                                           warmup=args.warmup)
+        summary = summarize_latencies(latencies)
+        upstream = server.config.request_count
+        calls = args.requests + args.warmup
+        print(f"{label:<10} {summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} {summary['p99_ms']:>8.1f} "
+              f"{max(latencies) * 1000.0:>8.1f} {upstream:>9} {(upstream - calls) / calls:>7.1%}")
+        if errors:
+            print(f"  {len(errors)} errors, e.g. {errors[0]!r}")
+        if hedger:
+            print(f"\nHedging: {hedger.stats()}")
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hedged requests for LLM calls")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("bench", help="p50/p99 with and without hedging against a spiky stand-in")
+    bench.add_argument("--latency-ms", type=float, default=50.0)
+    bench.add_argument("--spike-rate", type=float, default=0.02, help="fraction of requests that stall")
+    bench.add_argument("--spike-ms", type=float, default=1000.0, help="extra latency of a stalled request")
+    bench.add_argument("--percentile", type=float, default=95.0, help="hedge after this latency percentile")
+    bench.add_argument("--budget", type=float, default=0.1, help="max extra requests per call")
+    bench.add_argument("--concurrency", type=int, default=4)
+    bench.add_argument("--requests", type=int, default=500)
+    bench.add_argument("--warmup", type=int, default=20)
+    args = parser.parse_args()
+    run_bench(args)
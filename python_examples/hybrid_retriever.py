@@ -0,0 +1,211 @@
+"""
+Hybrid BM25 + Vector Retrieval
+Author: Optimum AI Lab
+Description: A retriever for rag_query.py that combines a compact in-process
+BM25 inverted index with the FAISS vector store using reciprocal rank fusion.
+Postings are stored as flat numpy arrays (CSR layout: one offsets array into
+concatenated doc-id and term-frequency arrays) rather than dicts of lists, so
+the index is small, fast to score with vectorized numpy, and can be saved as
+.npy files and memory-mapped back in. When the lexical result is confident
+(e.g. an exact product code), the query-embedding call is skipped entirely;
+rag_query.py checks this before its answer cache embeds the question.
+
+Document ids in the BM25 index are FAISS row positions, so both sides refer
+to the same documents through vectorstore.index_to_docstore_id.
+"""
+
+import json
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+
+# Keeps codes such as "SKU-1234" or "v2.5" as single tokens
+TOKEN_PATTERN = re.compile(r"\w+(?:[-_.]\w+)*")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Array-backed BM25 inverted index over documents numbered 0..n-1."""
+
+    def __init__(self, terms, offsets, doc_ids, tfs, doc_lengths, k1=1.5, b=0.75):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if self.n_docs else 0.0
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts, **params):
+        vocab = {}
+        term_ids, doc_ids, tfs, doc_lengths = array("i"), array("i"), array("I"), array("I")
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+        return cls(
+            list(vocab),
+            offsets,
+            np.frombuffer(doc_ids, dtype=np.int32)[order],
+            np.frombuffer(tfs, dtype=np.uint32)[order].astype(np.float32),
+            np.frombuffer(doc_lengths, dtype=np.uint32).astype(np.float32),
+            **params,
+        )
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, **params):
+        """Index the docstore of a LangChain FAISS store in FAISS row order."""
+        mapping = vectorstore.index_to_docstore_id
+        texts = (vectorstore.docstore.search(mapping[i]).page_content for i in range(len(mapping)))
+        return cls.build(texts, **params)
+
+    def save(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ("offsets", "doc_ids", "tfs", "doc_lengths"):
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        (directory / "terms.json").write_text(json.dumps(self.terms), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory, mmap=True, **params):
+        directory = Path(directory)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mode)
+                  for name in ("offsets", "doc_ids", "tfs", "doc_lengths")}
+        terms = json.loads((directory / "terms.json").read_text(encoding="utf-8"))
+        return cls(terms, **arrays, **params)
+
+    def max_score(self, query):
+        """The highest score any document could get for `query`: every known term, tf -> infinity."""
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        return float(self.idf[term_ids].sum()) * (self.k1 + 1.0)
+
+    def search(self, query, k=10):
+        """Return (doc_ids, scores) of the top-k documents, best first."""
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        docs, weights = [], []
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            postings = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[postings] / self.avg_length)
+            docs.append(postings)
+            weights.append(self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + norm))
+        # Only documents that contain a query term are ever touched
+        unique_docs, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        top = min(k, len(unique_docs))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return unique_docs[best], scores[best]
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """Fuse several best-first lists of doc ids into one best-first list."""
+    fused = Counter()
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[int(doc_id)] += 1.0 / (rrf_k + rank + 1)
+    return [doc_id for doc_id, _ in fused.most_common()]
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + dense retrieval fused with RRF, with a lexical-only fast path.
+
+    The fast path is taken when the best BM25 score is at least
+    `lexical_min_share` of the query's maximum possible score (so the
+    threshold means the same on any corpus size) and beats the runner-up by
+    `lexical_min_margin` times, which is typical for rare exact terms such as
+    product codes. A document of average length that contains every query
+    term once scores 0.4 of the maximum.
+    """
+
+    vectorstore: object
+    bm25: object
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    lexical_min_share: float = 0.3
+    lexical_min_margin: float = 1.5
+    lexical_only: int = 0
+    hybrid: int = 0
+
+    def _documents(self, doc_ids):
+        mapping = self.vectorstore.index_to_docstore_id
+        return [self.vectorstore.docstore.search(mapping[int(i)]) for i in doc_ids[:self.k]]
+
+    def _lexical(self, query):
+        doc_ids, scores = self.bm25.search(query, self.fetch_k)
+        confident = (
+            len(scores) > 0
+            and scores[0] >= self.lexical_min_share * self.bm25.max_score(query)
+            and (len(scores) == 1 or scores[0] >= self.lexical_min_margin * scores[1])
+        )
+        return doc_ids, confident
+
+    def lexical_confident(self, query):
+        """True if `query` is answered from BM25 alone, without embedding it."""
+        return self._lexical(query)[1]
+
+    def _dense(self, vector):
+        query = np.asarray([vector], dtype=np.float32)
+        _, positions = self.vectorstore.index.search(query, self.fetch_k)
+        return [p for p in positions[0] if p >= 0]
+
+    def _fuse(self, lexical_ids, vector):
+        self.hybrid += 1
+        return self._documents(reciprocal_rank_fusion([lexical_ids, self._dense(vector)], self.rrf_k))
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        lexical_ids, confident = self._lexical(query)
+        if confident:
+            self.lexical_only += 1
+            return self._documents(lexical_ids)
+        return self._fuse(lexical_ids, self.vectorstore.embeddings.embed_query(query))
+
+    def search_by_vector(self, query, vector):
+        """Retrieve with `vector`, the query embedding computed elsewhere."""
+        lexical_ids, confident = self._lexical(query)
+        if confident:
+            self.lexical_only += 1
+            return self._documents(lexical_ids)
+        return self._fuse(lexical_ids, vector)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        lexical_ids, confident = self._lexical(query)
+        if confident:
+            self.lexical_only += 1
+            return self._documents(lexical_ids)
+        return self._fuse(lexical_ids, await self.vectorstore.embeddings.aembed_query(query))
+
+    def stats(self):
+        total = self.lexical_only + self.hybrid
+        return {
+            "queries": total,
+            "lexical_only": self.lexical_only,
+            "hybrid": self.hybrid,
+            "embedding_calls_skipped_rate": round(self.lexical_only / total, 4) if total else 0.0,
+        }
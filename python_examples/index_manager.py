@@ -0,0 +1,467 @@
+"""
+Incremental Index Manager for the RAG Vector Store
+Author: Optimum AI Lab
+Description: Keeps the rag_query.py index up to date document by document
+instead of rebuilding it with FAISS.from_texts. Documents have stable ids:
+an upsert appends the new version and tombstones the old row, and a delete
+only tombstones. Searches skip tombstoned rows with a FAISS ID selector.
+Once the share of tombstoned rows crosses a threshold, a background thread
+rebuilds a clean index from the live vectors while queries continue to be
+served from the old one; the swap itself is a short exclusive section. For
+quantized index types (pq, fp16, int8) the original vectors are kept beside
+the index, so compaction re-encodes them rather than lossy reconstructions.
+A process serving queries from a saved index watches its directory and
+reloads when the apply CLI saves a newer version. Every save is written to a
+new generation directory and published by swapping a CURRENT pointer, so a
+reload never mixes the index of one save with the rows of another.
+
+Usage:
+    python index_manager.py import --from faiss_index --to faiss_index/managed
+    python index_manager.py apply changes.jsonl --index-dir faiss_index/managed
+    RAG_RETRIEVER=managed python rag_query.py --question "..."
+
+Each line of changes.jsonl is {"id": ..., "text": ..., "metadata": {...}} to
+upsert, or {"id": ..., "delete": true} to delete.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import ann_index
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class IndexManager:
+    """FAISS index + row table supporting upsert/delete by stable document id."""
+
+    def __init__(self, embeddings, spec="flat", compact_threshold=0.2, min_dead=100,
+                 index=None, rows=None, dead=None, vectors=None):
+        self.embeddings = embeddings
+        self.spec = spec
+        self.compact_threshold = compact_threshold
+        self.min_dead = min_dead
+        self.quantized = ann_index.parse_index_spec(spec)[0] in ann_index.QUANTIZED_KINDS
+        self.version = 0
+        self.compactions = 0
+        self.last_compaction_s = None
+        self.reloads = 0
+        self.reload_interval_s = 1.0
+        self._lock = ReadWriteLock()
+        self._compacting = threading.Lock()
+        self._reloading = threading.Lock()
+        self._watched = None
+        self._stamp = None
+        self._next_check = 0.0
+        self._set_state(index, rows, dead, vectors)
+
+    # -- internals (callers hold the write lock) ----------------------------
+
+    def _set_state(self, index, rows, dead, vectors):
+        self.index = index
+        self.rows = rows or []  # row position -> (doc_id, Document)
+        self.dead = set(dead or ())
+        self.live = {doc_id: row for row, (doc_id, _) in enumerate(self.rows) if row not in self.dead}
+        # Original vectors of every row, in blocks, for quantized indexes (None: reconstruct instead)
+        if not self.quantized:
+            self._originals = None
+        elif vectors is not None:
+            self._originals = [np.asarray(vectors, dtype=np.float32)]
+        else:
+            self._originals = [] if not self.rows else None
+        self._refresh_selector()
+
+    def _refresh_selector(self):
+        if self.dead:
+            batch = faiss.IDSelectorBatch(np.fromiter(self.dead, dtype=np.int64, count=len(self.dead)))
+            # Keep the inner selector referenced; IDSelectorNot only stores a pointer
+            self._selector = (batch, faiss.IDSelectorNot(batch))
+        else:
+            self._selector = None
+
+    def _build(self, vectors):
+        index = ann_index.build_index(vectors, self.spec)
+        if isinstance(index, faiss.IndexIVF):
+            index.make_direct_map()  # needed to reconstruct vectors when compacting
+        return index
+
+    def _vectors(self, rows):
+        """Vectors of `rows` to rebuild from: the originals if kept, else reconstructed."""
+        if self._originals is not None:
+            return np.concatenate(self._originals)[rows]
+        return self.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+    def _append(self, items, vectors):
+        if self.index is None:
+            self.index = self._build(vectors)
+        else:
+            self.index.add(vectors)
+        if self._originals is not None:
+            self._originals.append(vectors)
+        for doc_id, text, metadata in items:
+            previous = self.live.get(doc_id)
+            if previous is not None:
+                self.dead.add(previous)
+            self.live[doc_id] = len(self.rows)
+            self.rows.append((doc_id, Document(id=doc_id, page_content=text, metadata=metadata or {})))
+        self._refresh_selector()
+        self.version += 1
+
+    # -- public API ---------------------------------------------------------
+
+    def upsert(self, items):
+        """Insert or replace (doc_id, text, metadata) items."""
+        items = list(items)
+        if not items:
+            return
+        # Embedding is the slow part and needs no lock
+        vectors = np.asarray(self.embeddings.embed_documents([text for _, text, _ in items]), dtype=np.float32)
+        with self._lock.write():
+            self._append(items, vectors)
+        self._maybe_compact()
+
+    def delete(self, doc_ids):
+        """Tombstone documents by id; returns how many were live."""
+        removed = 0
+        with self._lock.write():
+            for doc_id in doc_ids:
+                row = self.live.pop(doc_id, None)
+                if row is not None:
+                    self.dead.add(row)
+                    removed += 1
+            if removed:
+                self._refresh_selector()
+                self.version += 1
+        self._maybe_compact()
+        return removed
+
+    def search(self, vector, k=4):
+        self.maybe_reload()
+        query = np.asarray([vector], dtype=np.float32)
+        with self._lock.read():
+            if self.index is None or not self.live:
+                return []
+            params = None
+            if self._selector is not None:
+                params = ann_index.search_parameters(self.index, self._selector[1])
+            _, positions = self.index.search(query, k, params=params)
+            return [self.rows[p][1] for p in positions[0] if p >= 0]
+
+    def dead_ratio(self):
+        return len(self.dead) / len(self.rows) if self.rows else 0.0
+
+    def _maybe_compact(self):
+        if (self.dead_ratio() >= self.compact_threshold and len(self.dead) >= self.min_dead
+                and self._compacting.acquire(blocking=False)):
+            threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self._compact()
+        finally:
+            self._compacting.release()
+
+    def compact(self):
+        """Rebuild without tombstoned rows (blocks until done)."""
+        with self._compacting:
+            self._compact()
+
+    def wait_for_compaction(self):
+        with self._compacting:
+            pass
+
+    def _compact(self):
+        started = time.perf_counter()
+        # 1. Snapshot live rows and their vectors; readers keep running
+        with self._lock.read():
+            high_water = len(self.rows)
+            kept = sorted(self.live.values())
+            vectors = self._vectors(kept) if kept else None
+        # 2. Build the replacement index without holding any lock
+        new_index = self._build(vectors) if kept else None
+        # 3. Catch up on changes made meanwhile, then swap
+        with self._lock.write():
+            appended = list(range(high_water, len(self.rows)))
+            if appended:
+                extra = self._vectors(appended)
+                if new_index is None:
+                    new_index = self._build(extra)
+                else:
+                    new_index.add(extra)
+            order = kept + appended
+            remap = {old: new for new, old in enumerate(order)}
+            self.rows = [self.rows[old] for old in order]
+            self.live = {doc_id: remap[row] for doc_id, row in self.live.items()}
+            self.dead = {remap[old] for old in order if old in self.dead}
+            if self._originals is not None:
+                self._originals = [np.concatenate(self._originals)[order]] if order else []
+            self.index = new_index
+            self._refresh_selector()
+            self.version += 1
+            self.compactions += 1
+        self.last_compaction_s = round(time.perf_counter() - started, 3)
+
+    def stats(self):
+        return {
+            "spec": self.spec,
+            "live": len(self.live),
+            "tombstones": len(self.dead),
+            "dead_ratio": round(self.dead_ratio(), 4),
+            "compactions": self.compactions,
+            "last_compaction_s": self.last_compaction_s,
+            "reloads": self.reloads,
+            "version": self.version,
+        }
+
+    # -- persistence --------------------------------------------------------
+
+    def save(self, directory):
+        """Write a new generation of the index and switch CURRENT to it.
+
+        Each save goes into its own gen-<id> directory (index.faiss, rows.pkl
+        and, for quantized indexes, vectors.npy), and the CURRENT pointer file
+        is replaced atomically once all of them are written. A watching process
+        therefore always reads files from one save. The previous generation is
+        kept for readers still loading it; older ones are removed.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        previous = current_generation(directory)
+        generation = f"gen-{uuid.uuid4().hex}"
+        target = directory / generation
+        target.mkdir()
+        with self._lock.read():
+            if self.index is not None:
+                faiss.write_index(self.index, str(target / "index.faiss"))
+            if self._originals:
+                np.save(target / "vectors.npy", np.concatenate(self._originals))
+            with open(target / "rows.pkl", "wb") as f:
+                pickle.dump({"spec": self.spec, "rows": self.rows, "dead": self.dead}, f)
+        (directory / "CURRENT.tmp").write_text(generation, encoding="utf-8")
+        os.replace(directory / "CURRENT.tmp", directory / "CURRENT")
+        for old in directory.glob("gen-*"):
+            if old.name not in (generation, previous):
+                shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, embeddings, watch=False, **params):
+        """Load a saved index; with `watch`, reload whenever a newer save appears."""
+        stamp, state = _read_state(directory)
+        manager = cls(embeddings, state["spec"], index=state["index"], rows=state["rows"], dead=state["dead"],
+                      vectors=state["vectors"], **params)
+        if watch:
+            manager.watch(directory, stamp)
+        return manager
+
+    def watch(self, directory, stamp=None):
+        """Reload from `directory` when its CURRENT generation changes from `stamp` (e.g. by the apply CLI)."""
+        self._watched = Path(directory)
+        self._stamp = stamp
+
+    def maybe_reload(self):
+        """Swap in a newer save of the watched directory; checked at most once per reload_interval_s."""
+        if self._watched is None or time.monotonic() < self._next_check:
+            return False
+        if not self._reloading.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = time.monotonic() + self.reload_interval_s
+            current = current_generation(self._watched)
+            if current is None or current == self._stamp:
+                return False
+            stamp, state = _read_state(self._watched)
+            with self._lock.write():
+                self.spec = state["spec"]
+                self.quantized = ann_index.parse_index_spec(self.spec)[0] in ann_index.QUANTIZED_KINDS
+                self._set_state(state["index"], state["rows"], state["dead"], state["vectors"])
+                self.version += 1
+                self.reloads += 1
+            self._stamp = stamp
+            return True
+        finally:
+            self._reloading.release()
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, spec="flat", **params):
+        """Seed a manager from a LangChain FAISS store, reusing its vectors.
+
+        Stable ids come from metadata["id"] when present, else the docstore id.
+        """
+        mapping = vectorstore.index_to_docstore_id
+        manager = cls(vectorstore.embeddings, spec, **params)
+        items = []
+        for row in range(len(mapping)):
+            document = vectorstore.docstore.search(mapping[row])
+            doc_id = str(document.metadata.get("id", mapping[row]))
+            items.append((doc_id, document.page_content, document.metadata))
+        if items:
+            vectors = ann_index.reconstruct_all(vectorstore.index)
+            with manager._lock.write():
+                manager._append(items, vectors)
+        return manager
+
+    def as_retriever(self, k=4):
+        return ManagedRetriever(manager=self, k=k)
+
+
+def current_generation(directory):
+    """Name of the generation CURRENT points to, or None if nothing was saved in `directory`."""
+    try:
+        return (Path(directory) / "CURRENT").read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _read_state(directory):
+    """(generation, saved state with the index and original vectors) for a saved directory."""
+    directory = Path(directory)
+    while True:
+        generation = current_generation(directory)
+        if generation is None:
+            raise FileNotFoundError(f"No saved index in {directory}")
+        try:
+            return generation, _read_generation(directory / generation)
+        except FileNotFoundError:
+            if current_generation(directory) == generation:
+                raise
+            # Removed by two newer saves while we were reading it; read the current one
+
+
+def _read_generation(path):
+    with open(path / "rows.pkl", "rb") as f:
+        state = pickle.load(f)
+    index_file = path / "index.faiss"
+    state["index"] = faiss.read_index(str(index_file)) if index_file.exists() else None
+    if isinstance(state["index"], faiss.IndexIVF):
+        state["index"].make_direct_map()
+    vectors_file = path / "vectors.npy"
+    state["vectors"] = np.load(vectors_file) if vectors_file.exists() else None
+    return state
+
+
+class ManagedRetriever(BaseRetriever):
+    """LangChain retriever over an IndexManager."""
+
+    manager: object
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.manager.search(self.manager.embeddings.embed_query(query), self.k)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        vector = await self.manager.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self.manager.search, vector, self.k)
+
+    def search_by_vector(self, query, vector):
+        """Retrieve with `vector`, the query embedding computed elsewhere."""
+        return self.manager.search(vector, self.k)
+
+
+def iter_changes(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def apply_changes(manager, changes, batch_size=64):
+    """Apply upsert/delete records in order, batching consecutive upserts."""
+    batch = []
+    for change in changes:
+        doc_id = str(change["id"])
+        if change.get("delete"):
+            manager.upsert(batch)
+            batch = []
+            manager.delete([doc_id])
+        else:
+            batch.append((doc_id, change["text"], change.get("metadata")))
+            if len(batch) >= batch_size:
+                manager.upsert(batch)
+                batch = []
+    manager.upsert(batch)
+
+
+if __name__ == "__main__":
+    import rag_query
+
+    parser = argparse.ArgumentParser(description="Incremental updates for the RAG index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("import", help="seed a managed index from a saved vector store")
+    seed.add_argument("--from", dest="source", default=str(rag_query.INDEX_DIR))
+    seed.add_argument("--to", dest="target", default=str(rag_query.INDEX_DIR / "managed"))
+    seed.add_argument("--spec", default="flat", help="index type (see ann_index.py)")
+
+    apply = commands.add_parser("apply", help="apply a JSONL file of upserts and deletes")
+    apply.add_argument("changes")
+    apply.add_argument("--index-dir", default=str(rag_query.INDEX_DIR / "managed"))
+    apply.add_argument("--spec", default="flat", help="index type when creating a new index")
+    apply.add_argument("--compact-threshold", type=float, default=0.2)
+
+    args = parser.parse_args()
+    if args.command == "import":
+        manager = IndexManager.from_vectorstore(rag_query.load_vectorstore(args.source), args.spec)
+        manager.save(args.target)
+    else:
+        index_dir = Path(args.index_dir)
+        if current_generation(index_dir):
+            manager = IndexManager.load(index_dir, rag_query.get_embeddings(),
+                                        compact_threshold=args.compact_threshold)
+        else:
+            manager = IndexManager(rag_query.get_embeddings(), args.spec,
+                                   compact_threshold=args.compact_threshold)
+        apply_changes(manager, iter_changes(args.changes))
+        manager.wait_for_compaction()
+        manager.save(index_dir)
+    print(f"Index manager: {manager.stats()}")
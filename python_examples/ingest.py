@@ -0,0 +1,210 @@
+"""
+Streaming Corpus Ingestion for the RAG Example
+Author: Optimum AI Lab
+Description: Builds the rag_query.py vector store from a directory of text
+files without loading the corpus into memory. Files are read lazily, split
+into overlapping chunks, grouped into size-limited batches and embedded by a
+fixed number of concurrent workers. A bounded queue between the reader and
+the workers provides backpressure, so only a handful of batches are ever held
+in memory; vectors are added to the FAISS store as each batch completes.
+
+Usage:
+    python ingest.py docs/ --glob "**/*.md" --concurrency 8
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from langchain_community.vectorstores import FAISS
+
+import compact_store
+from hybrid_retriever import BM25Index
+
+READ_BLOCK_CHARS = 1 << 16
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+# 1. Read files lazily, one block at a time
+def iter_files(paths, glob="**/*.txt"):
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            yield from sorted(p for p in path.glob(glob) if p.is_file())
+        else:
+            yield path
+
+
+def iter_blocks(path, block_chars=READ_BLOCK_CHARS):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                return
+            yield block
+
+
+# 2. Split each file into overlapping chunks, breaking on whitespace
+def iter_chunks(path, chunk_chars=1000, overlap_chars=100):
+    """Yield (chunk_index, text) for one file, holding at most one block plus a chunk."""
+    buffer = ""
+    index = 0
+    for block in iter_blocks(path):
+        buffer += block
+        while len(buffer) >= chunk_chars:
+            cut = buffer.rfind(" ", chunk_chars // 2, chunk_chars)
+            cut = chunk_chars if cut == -1 else cut
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield index, chunk
+                index += 1
+            start = max(cut - overlap_chars, 1)
+            # Start the overlap on a word boundary as well
+            space = buffer.find(" ", start, cut)
+            buffer = buffer[start if space == -1 else space:]
+    tail = buffer.strip()
+    if tail:
+        yield index, tail
+
+
+def iter_corpus_chunks(paths, glob="**/*.txt", chunk_chars=1000, overlap_chars=100):
+    for path in iter_files(paths, glob):
+        for index, text in iter_chunks(path, chunk_chars, overlap_chars):
+            yield text, {"source": str(path), "chunk": index}
+
+
+# 3. Group chunks into batches bounded by estimated tokens and item count
+def iter_batches(chunks, max_tokens=20000, max_items=256):
+    batch, tokens = [], 0
+    for text, metadata in chunks:
+        cost = estimate_tokens(text)
+        if batch and (tokens + cost > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, tokens = [], 0
+        batch.append((text, metadata))
+        tokens += cost
+    if batch:
+        yield batch
+
+
+class IngestStats:
+    """Progress counters shared by the reader, the workers and the reporter."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.chunks = 0
+        self.batches = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @property
+    def chunks_per_sec(self):
+        elapsed = time.perf_counter() - self.started
+        return self.chunks / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "chunks_per_sec": round(self.chunks_per_sec, 1),
+            "elapsed_s": round(time.perf_counter() - self.started, 2),
+        }
+
+
+# 4. Embed batches concurrently and add them to the vector store incrementally
+async def ingest(chunks, embeddings, vectorstore=None, concurrency=4, max_tokens=20000,
+                 max_items=256, report_every=5.0):
+    """Embed `chunks` ((text, metadata) pairs) into `vectorstore`.
+
+    A new FAISS store is created from the first batch when `vectorstore` is
+    None. Returns (vectorstore, stats).
+    """
+    stats = IngestStats()
+    queue = asyncio.Queue(maxsize=concurrency)
+    batches = iter_batches(chunks, max_tokens, max_items)
+    store = {"vectorstore": vectorstore}
+
+    async def reader():
+        while True:
+            # File reads and chunking happen off the event loop
+            batch = await asyncio.to_thread(next, batches, None)
+            await queue.put(batch)  # blocks while the workers are saturated
+            if batch is None:
+                return
+
+    async def worker():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                await queue.put(None)  # let the other workers see the end too
+                return
+            texts = [text for text, _ in batch]
+            metadatas = [metadata for _, metadata in batch]
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+            try:
+                vectors = await embeddings.aembed_documents(texts)
+            finally:
+                stats.in_flight -= 1
+            pairs = list(zip(texts, vectors))
+            # No await between check and assignment, so workers cannot race here
+            if store["vectorstore"] is None:
+                store["vectorstore"] = FAISS.from_embeddings(pairs, embeddings, metadatas=metadatas)
+            else:
+                store["vectorstore"].add_embeddings(pairs, metadatas=metadatas)
+            stats.chunks += len(batch)
+            stats.batches += 1
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(report_every)
+            print(f"Progress: {stats.as_dict()}")
+
+    progress = asyncio.create_task(reporter()) if report_every else None
+    try:
+        await asyncio.gather(reader(), *(worker() for _ in range(concurrency)))
+    finally:
+        if progress:
+            progress.cancel()
+    return store["vectorstore"], stats
+
+
+if __name__ == "__main__":
+    import rag_query
+
+    parser = argparse.ArgumentParser(description="Stream a corpus into the RAG vector store")
+    parser.add_argument("paths", nargs="+", help="files or directories to ingest")
+    parser.add_argument("--glob", default="**/*.txt", help="file pattern inside directories")
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--overlap-chars", type=int, default=100)
+    parser.add_argument("--batch-tokens", type=int, default=20000, help="estimated tokens per batch")
+    parser.add_argument("--batch-items", type=int, default=256, help="chunks per batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="embedding batches in flight")
+    parser.add_argument("--index-dir", type=Path, default=rag_query.INDEX_DIR)
+    parser.add_argument("--compact", choices=("keep", "fp16", "int8", "none"), default="keep",
+                        help="saved layout, as for rag_query.py --build (see compact_store.py)")
+    args = parser.parse_args()
+
+    chunks = iter_corpus_chunks(args.paths, args.glob, args.chunk_chars, args.overlap_chars)
+    embeddings = rag_query.get_embeddings()
+    vectorstore, stats = asyncio.run(ingest(
+        chunks, embeddings, concurrency=args.concurrency,
+        max_tokens=args.batch_tokens, max_items=args.batch_items,
+    ))
+    if vectorstore is None:
+        print("No chunks found; nothing written.")
+    else:
+        vectorstore.save_local(str(args.index_dir))
+        BM25Index.from_vectorstore(vectorstore).save(args.index_dir / "bm25")
+        if args.compact != "none":
+            compact_store.convert(args.index_dir, args.compact)
+        print(f"Ingested: {stats.as_dict()}")
+        print(f"Embedding cache: {embeddings.stats()}")
+        print(f"Index saved to {args.index_dir}")
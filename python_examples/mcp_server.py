@@ -0,0 +1,461 @@
+"""
+Local MCP Server and Pooled Client Sessions for the Example Tools
+Author: Optimum AI Lab
+Description: Serves the tools from example_tools.py over the Model Context
+Protocol. Messages are newline-delimited JSON-RPC 2.0 with the initialize,
+ping, tools/list and tools/call methods. The transport is stdio (the standard
+MCP local transport, so any MCP client can launch it) or a local socket (a
+Unix socket path or host:port) that many clients share. Requests on one
+connection are handled concurrently, and the tools run through
+agent_loop.ToolExecutor, so CPU-bound tools still go to a process pool.
+
+The client side keeps a pool of persistent, initialized sessions. Calls are
+multiplexed over them by JSON-RPC id and go to the least busy session.
+Closed sessions are reopened on the next call, so no call pays for a process
+spawn or a handshake. load_mcp_tools() turns the server's tools into LangChain
+tools for bind_tools and the agent loop.
+
+Usage:
+    python mcp_server.py serve                      # stdio
+    python mcp_server.py serve --listen /tmp/mcp-tools.sock
+    python mcp_server.py bench                      # in-process vs stdio vs socket round trips
+"""
+
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.tools import StructuredTool, ToolException
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agent_loop import ToolExecutor
+from tool_cache import tool_cache
+
+# Newest first; the server answers with the client's version if it knows it
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+SERVER_INFO = {"name": "optimum-ai-lab-example-tools", "version": "1.0.0"}
+DEFAULT_TOOLS = "example_tools:tools"
+# Largest JSON-RPC line either side accepts
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+class MCPError(Exception):
+    """A JSON-RPC error response."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def load_tools(spec=DEFAULT_TOOLS):
+    """The list of LangChain tools named by "module:attribute"."""
+    module, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module), attribute)
+
+
+def parse_address(address):
+    """A "host:port" string -> (host, port); anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port)) if port.isdigit() else address
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+class ToolServer:
+    """MCP request handling for a list of LangChain tools, independent of transport."""
+
+    def __init__(self, tools, cache=tool_cache):
+        self.tools = {tool.name: tool for tool in tools}
+        self.executor = ToolExecutor(tools, cache=cache)
+        # Serialized once; tools/list returns the same list every time
+        self.schemas = []
+        for tool in tools:
+            function = convert_to_openai_tool(tool)["function"]
+            self.schemas.append({"name": function["name"], "description": function.get("description", ""),
+                                 "inputSchema": function["parameters"]})
+        self.calls = 0
+
+    async def dispatch(self, method, params):
+        if method == "initialize":
+            requested = params.get("protocolVersion")
+            return {
+                "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": SERVER_INFO,
+            }
+        if method == "ping":
+            return {}
+        if method == "tools/list":
+            return {"tools": self.schemas}
+        if method == "tools/call":
+            name = params.get("name")
+            if name not in self.tools:
+                raise MCPError(-32602, f"Unknown tool: {name}")
+            self.calls += 1
+            message, _ = await self.executor.run_one(
+                {"name": name, "args": params.get("arguments") or {}, "id": ""})
+            # Tool failures are results the model should see, not protocol errors
+            return {"content": [{"type": "text", "text": message.content}],
+                    "isError": message.status == "error"}
+        raise MCPError(-32601, f"Method not found: {method}")
+
+    async def _respond(self, message, writer):
+        if "id" not in message:
+            return  # a notification, e.g. notifications/initialized
+        response = {"jsonrpc": "2.0", "id": message["id"]}
+        try:
+            response["result"] = await self.dispatch(message.get("method"), message.get("params") or {})
+        except MCPError as exc:
+            response["error"] = {"code": exc.code, "message": str(exc)}
+        except Exception as exc:
+            response["error"] = {"code": -32603, "message": repr(exc)}
+        writer.write(json.dumps(response).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def serve_connection(self, reader, writer):
+        """Answer one connection's requests concurrently until it closes."""
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    error = {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+                    writer.write(json.dumps(error).encode("utf-8") + b"\n")
+                    continue
+                task = asyncio.create_task(self._respond(message, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.close()
+
+
+async def serve_stdio(server):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_MESSAGE_BYTES)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+    await server.serve_connection(reader, asyncio.StreamWriter(transport, protocol, reader, loop))
+
+
+async def serve_socket(server, address):
+    parsed = parse_address(address)
+    if isinstance(parsed, tuple):
+        listener = await asyncio.start_server(server.serve_connection, *parsed, limit=MAX_MESSAGE_BYTES)
+    else:
+        Path(parsed).unlink(missing_ok=True)
+        listener = await asyncio.start_unix_server(server.serve_connection, parsed, limit=MAX_MESSAGE_BYTES)
+    # stdout is free when serving a socket; the line tells launchers it is ready
+    print(f"MCP server listening on {address}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+async def run_server(server, address=None):
+    """Serve on `address` (stdio if None) until stdin closes or SIGTERM arrives.
+
+    The caller closes `server` afterwards (in a finally), shutting its tool
+    process pool down instead of orphaning it.
+    """
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    native = True
+    try:
+        loop.add_signal_handler(signal.SIGTERM, task.cancel)
+    except (NotImplementedError, AttributeError):
+        # Windows event loops have no signal handlers; a plain one still stops the loop cleanly
+        native = False
+        previous = signal.signal(signal.SIGTERM, lambda *_: loop.call_soon_threadsafe(task.cancel))
+    try:
+        await (serve_socket(server, address) if address else serve_stdio(server))
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if native:
+            loop.remove_signal_handler(signal.SIGTERM)
+        else:
+            signal.signal(signal.SIGTERM, previous)
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class MCPSession:
+    """One initialized MCP connection; concurrent requests share it by JSON-RPC id."""
+
+    def __init__(self, reader, writer, process=None):
+        self.reader = reader
+        self.writer = writer
+        self.process = process
+        self.in_flight = 0
+        self.server_info = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._read_task = asyncio.create_task(self._read_responses())
+
+    @classmethod
+    async def stdio(cls, command=None):
+        """Launch a server subprocess (this module's `serve` by default) and talk over its pipes."""
+        command = command or [sys.executable, str(Path(__file__).resolve()), "serve"]
+        process = await asyncio.create_subprocess_exec(
+            *command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=MAX_MESSAGE_BYTES)
+        return await cls(process.stdout, process.stdin, process).initialize()
+
+    @classmethod
+    async def socket(cls, address):
+        address = parse_address(address)
+        if isinstance(address, tuple):
+            reader, writer = await asyncio.open_connection(*address, limit=MAX_MESSAGE_BYTES)
+        else:
+            reader, writer = await asyncio.open_unix_connection(address, limit=MAX_MESSAGE_BYTES)
+        return await cls(reader, writer).initialize()
+
+    @property
+    def closed(self):
+        return self._read_task.done()
+
+    async def _read_responses(self):
+        try:
+            while line := await self.reader.readline():
+                message = json.loads(line)
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("MCP connection closed"))
+            self._pending.clear()
+
+    def _send(self, message):
+        if self.closed:
+            raise ConnectionError("MCP connection closed")
+        self.writer.write(json.dumps(message).encode("utf-8") + b"\n")
+
+    async def request(self, method, params=None):
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        self.in_flight += 1
+        try:
+            self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+            await self.writer.drain()
+            response = await future
+        finally:
+            self.in_flight -= 1
+            self._pending.pop(request_id, None)
+        if "error" in response:
+            raise MCPError(response["error"].get("code"), response["error"].get("message"))
+        return response["result"]
+
+    async def initialize(self):
+        result = await self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSIONS[0],
+            "capabilities": {},
+            "clientInfo": {"name": "optimum-ai-lab-examples", "version": "1.0.0"},
+        })
+        self.server_info = result.get("serverInfo")
+        self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        return self
+
+    async def list_tools(self):
+        return (await self.request("tools/list"))["tools"]
+
+    async def call_tool(self, name, arguments):
+        """(text content, is_error) of one tool call."""
+        result = await self.request("tools/call", {"name": name, "arguments": arguments})
+        text = "".join(part.get("text", "") for part in result.get("content", []) if part.get("type") == "text")
+        return text, bool(result.get("isError"))
+
+    async def close(self):
+        self.writer.close()
+        if self.process is not None:
+            await self.process.wait()
+        await asyncio.gather(self._read_task, return_exceptions=True)
+
+
+class SessionPool:
+    """`size` persistent sessions from `connect` (an async factory), reused for every call."""
+
+    def __init__(self, connect, size=4):
+        self.connect = connect
+        self.size = size
+        self._sessions = [None] * size
+        self._opening = [None] * size
+        self.calls = 0
+        self.connects = 0
+
+    async def _open(self, slot):
+        # Concurrent callers picking the same dead slot share one reconnect
+        if self._opening[slot] is None:
+            self._opening[slot] = asyncio.ensure_future(self.connect())
+        try:
+            session = await self._opening[slot]
+        finally:
+            self._opening[slot] = None
+        if self._sessions[slot] is not session:
+            self._sessions[slot] = session
+            self.connects += 1
+        return session
+
+    async def start(self):
+        await asyncio.gather(*(self._open(slot) for slot in range(self.size)))
+        return self
+
+    async def session(self):
+        """The session with the fewest requests in flight; unopened or closed slots are (re)opened first."""
+        for slot, session in enumerate(self._sessions):
+            if session is None or session.closed:
+                return await self._open(slot)
+        return min(self._sessions, key=lambda session: session.in_flight)
+
+    async def call_tool(self, name, arguments):
+        self.calls += 1
+        return await (await self.session()).call_tool(name, arguments)
+
+    async def list_tools(self):
+        return await (await self.session()).list_tools()
+
+    def stats(self):
+        return {"sessions": self.size, "connects": self.connects, "calls": self.calls,
+                "in_flight": sum(s.in_flight for s in self._sessions if s is not None)}
+
+    async def close(self):
+        await asyncio.gather(*(s.close() for s in self._sessions if s is not None))
+
+
+async def load_mcp_tools(pool):
+    """LangChain tools that run on the MCP server through `pool`, with the server's schemas."""
+
+    def proxy(name):
+        async def call(**arguments):
+            text, is_error = await pool.call_tool(name, arguments)
+            if is_error:
+                raise ToolException(text)
+            return text
+        return call
+
+    return [
+        StructuredTool.from_function(coroutine=proxy(spec["name"]), name=spec["name"],
+                                     description=spec.get("description", ""), args_schema=spec["inputSchema"])
+        for spec in await pool.list_tools()
+    ]
+
+
+# ============================================================================
+# BENCHMARK: ROUND-TRIP OVERHEAD OF A TOOL CALL
+# ============================================================================
+
+async def _measure(call, calls, concurrency):
+    """Sequential per-call latencies, then calls/s with `concurrency` calls in flight."""
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    remaining = iter(range(calls))
+
+    async def worker():
+        for _ in remaining:
+            await call()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, calls / (time.perf_counter() - started)
+
+
+async def run_bench(args):
+    from stats import summarize_latencies
+
+    arguments = {"a": 15, "b": 8}
+    print(f"{args.calls} sequential {args.tool}({arguments}) calls, then {args.calls} with "
+          f"{args.concurrency} in flight over {args.pool} pooled sessions\n")
+    print(f"{'transport':<11} {'connect ms':>11} {'p50 us':>9} {'p99 us':>9} {'calls/s':>9}")
+    print("-" * 53)
+    rows = {}
+
+    # No tool cache on either side: multiply is @cacheable, and every call after the first would be a hit
+    executor = ToolExecutor(load_tools(args.tools), cache=None)
+    call = {"name": args.tool, "args": arguments, "id": ""}
+    rows["in-process"] = (None, *await _measure(lambda: executor.run_one(call), args.calls, args.concurrency))
+    executor.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        address = args.listen or os.path.join(tmp, "mcp-tools.sock")
+        server = await asyncio.create_subprocess_exec(
+            sys.executable, str(Path(__file__).resolve()), "serve", "--tools", args.tools, "--listen", address,
+            "--no-cache", stdout=asyncio.subprocess.PIPE)
+        await server.stdout.readline()  # "listening"
+        try:
+            for label, connect in (("stdio", lambda: MCPSession.stdio([
+                    sys.executable, str(Path(__file__).resolve()), "serve", "--tools", args.tools, "--no-cache"])),
+                                   ("socket", lambda: MCPSession.socket(address))):
+                # What a call would pay without a persistent session: connect + handshake
+                started = time.perf_counter()
+                await (await connect()).close()
+                connect_s = time.perf_counter() - started
+                pool = await SessionPool(connect, args.pool).start()
+                try:
+                    rows[label] = (connect_s, *await _measure(
+                        lambda: pool.call_tool(args.tool, arguments), args.calls, args.concurrency))
+                finally:
+                    await pool.close()
+        finally:
+            server.terminate()
+            await server.wait()
+
+    baseline = summarize_latencies(rows["in-process"][1])["p50_ms"]
+    for label, (connect_s, latencies, throughput) in rows.items():
+        summary = summarize_latencies(latencies)
+        connect = f"{connect_s * 1000.0:>11.1f}" if connect_s is not None else f"{'-':>11}"
+        print(f"{label:<11} {connect} {summary['p50_ms'] * 1000.0:>9.0f} {summary['p99_ms'] * 1000.0:>9.0f} "
+              f"{throughput:>9.0f}")
+    print()
+    for label in ("stdio", "socket"):
+        overhead = summarize_latencies(rows[label][1])["p50_ms"] - baseline
+        print(f"MCP over {label}: +{overhead * 1000.0:.0f} us per call (p50) versus in-process")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local MCP server for the example tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="serve the tools over stdio or a socket")
+    serve.add_argument("--tools", default=DEFAULT_TOOLS, help="module:attribute holding the tool list")
+    serve.add_argument("--listen", help="Unix socket path or host:port (default: stdio)")
+    serve.add_argument("--no-cache", action="store_true", help="run every call, even of @cacheable tools")
+    bench = commands.add_parser("bench", help="tool-call round trip in-process vs stdio vs socket")
+    bench.add_argument("--tools", default=DEFAULT_TOOLS)
+    bench.add_argument("--tool", default="multiply")
+    bench.add_argument("--listen", help="socket address for the benchmark server (default: a temp Unix socket)")
+    bench.add_argument("--calls", type=int, default=2000)
+    bench.add_argument("--concurrency", type=int, default=16)
+    bench.add_argument("--pool", type=int, default=4, help="persistent sessions per transport")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        asyncio.run(run_bench(args))
+    else:
+        server = ToolServer(load_tools(args.tools), cache=None if args.no_cache else tool_cache)
+        server.executor.warm_up()
+        try:
+            asyncio.run(run_server(server, args.listen))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            if not args.no_cache:
+                print(f"Tool cache: {tool_cache.stats()}", file=sys.stderr)
@@ -2,52 +2,154 @@
 Tool Calling with MCP Server using LangChain
 Author: Optimum AI Lab
 Description: This example demonstrates how to define tools that an LLM can call
-to perform specific operations (like calculations).
+to perform specific operations (like calculations), run the calls the model
+asks for and send the results back until it gives a final answer.
+
+Tool calls in one model turn run concurrently: I/O-bound tools on the event
+loop, CPU-bound ones in a process pool (see agent_loop.py). Every query
+prints a per-step latency breakdown. Pass --stream to stream each model call
+and report its time to first token.
+
+With --mcp stdio (or --mcp socket --mcp-address /tmp/mcp-tools.sock) the
+tools are listed from and called on a local MCP server (mcp_server.py)
+through a pool of persistent sessions instead of running in-process.
+
+Queries that fully match a known pattern ("What is 15 * 8?") skip the model
+and call the tools directly (see fast_path.py); --no-fast-path disables it.
+
+With --tool-top-k K only the K tools whose descriptions are most similar to
+the query are bound, instead of sending every tool's schema with every model
+call (see tool_registry.py).
 """
 
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
-
-# 1. Define a tool that the LLM can call
-@tool
-def multiply(a: int, b: int) -> int:
-    """Multiplies two integers together."""
-    return a * b
-
-@tool
-def add(a: int, b: int) -> int:
-    """Adds two integers together."""
-    return a + b
-
-@tool
-def divide(a: float, b: float) -> float:
-    """Divides the first number by the second number."""
-    if b == 0:
-        return "Cannot divide by zero"
-    return a / b
-
-# 2. Initialize the LLM and bind tools to it
-llm = ChatOpenAI(model="gpt-4-turbo-preview")
-tools = [multiply, add, divide]
-llm_with_tools = llm.bind_tools(tools)
-
-# 3. Create the tool-calling chain
+import argparse
+import asyncio
+from pathlib import Path
+
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from agent_loop import ToolExecutor, print_steps, run_agent
+from embedding_cache import CachedEmbeddings
+from example_tools import tools
+from fast_path import PreRouter
+from mcp_server import MCPSession, SessionPool, load_mcp_tools
+from model_router import ModelRouter
+from rate_limiter import http_async_client, http_client
+from response_cache import response_cache
+from streaming import print_token
+from tool_cache import tool_cache
+from tool_registry import ToolRegistry
+
+EMBEDDING_CACHE_PATH = Path(__file__).resolve().parent / "embedding_cache.sqlite3"
+
+# 1. Initialize the LLM and bind the tools from example_tools.py to it
+#    (with LLM_ROUTER set, the model is picked per query)
+llm = ChatOpenAI(
+    model="gpt-4-turbo-preview",
+    http_client=http_client,
+    http_async_client=http_async_client,
+    cache=response_cache,
+)
+router = ModelRouter.from_env(
+    http_client=http_client, http_async_client=http_async_client, cache=response_cache)
+
+
+def bind(tool_list):
+    return router.as_runnable(tool_list) if router is not None else llm.bind_tools(tool_list)
+
+
+llm_with_tools = bind(tools)
+
+_embeddings = None
+
+
+def get_embeddings():
+    """Embeddings for tool descriptions and queries, behind the persistent cache."""
+    global _embeddings
+    if _embeddings is None:
+        underlying = OpenAIEmbeddings(http_client=http_client, http_async_client=http_async_client)
+        _embeddings = CachedEmbeddings(underlying, EMBEDDING_CACHE_PATH)
+    return _embeddings
+
+
+# 2. Run the agent loop: model -> tools (in parallel) -> model -> final answer
+#    unless the fast path can answer the query without the model
+async def main(queries, max_steps, stream, mcp=None, mcp_address=None, mcp_sessions=2, fast_path=True,
+               tool_top_k=None):
+    pool = None
+    if mcp is None:
+        executor, bound = ToolExecutor(tools), llm_with_tools
+        executor.warm_up()
+    else:
+        connect = MCPSession.stdio if mcp == "stdio" else lambda: MCPSession.socket(mcp_address)
+        pool = await SessionPool(connect, mcp_sessions).start()
+        remote_tools = await load_mcp_tools(pool)
+        executor, bound = ToolExecutor(remote_tools), bind(remote_tools)
+    pre_router = PreRouter(executor.tools.values()) if fast_path else None
+    registry = ToolRegistry(executor.tools.values(), get_embeddings, bind, tool_top_k) if tool_top_k else None
+    try:
+        for query in queries:
+            print(f"\nQuery: {query}")
+            print("-" * 50)
+            result = await pre_router.run(query, executor) if pre_router else None
+            if result is None:
+                if stream:
+                    print("Model: ", end="")
+                query_bound = (await registry.abind(query))[0] if registry else bound
+                result = await run_agent(query_bound, executor, query, max_steps,
+                                         on_token=print_token if stream else None)
+                if stream:
+                    print()
+                if pre_router:
+                    pre_router.observe(result)
+            print(f"Response: {result['answer']}")
+            print_steps(result)
+        if pre_router is not None:
+            print(f"\nFast path: {pre_router.stats()}")
+        if registry is not None:
+            print(f"\nTool registry: {registry.stats()}")
+    finally:
+        executor.close()
+        if pool is not None:
+            print(f"\nMCP sessions: {pool.stats()}")
+            await pool.close()
+
+
 if __name__ == "__main__":
-    # Test queries that should trigger tool calls
-    queries = [
+    parser = argparse.ArgumentParser(description="Tool calling example")
+    parser.add_argument("--stream", action="store_true", help="stream model calls and report TTFT")
+    parser.add_argument("--max-steps", type=int, default=5, help="model calls per query before giving up")
+    parser.add_argument("--mcp", choices=("stdio", "socket"),
+                        help="call the tools on a local MCP server instead of in-process")
+    parser.add_argument("--mcp-address", help="Unix socket path or host:port of a running server for --mcp socket")
+    parser.add_argument("--mcp-sessions", type=int, default=2, help="persistent MCP sessions in the pool")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="send every query to the model, even ones the fast path can answer")
+    parser.add_argument("--tool-top-k", type=int,
+                        help="bind only the K tools most similar to each query (default: all)")
+    parser.add_argument("queries", nargs="*", help="queries to run (default: the built-in examples)")
+    args = parser.parse_args()
+    if args.mcp == "socket" and not args.mcp_address:
+        parser.error("--mcp socket needs --mcp-address (start one with: python mcp_server.py serve --listen ...)")
+
+    # Test queries that should trigger tool calls, several per turn in the last
+    # two; the last one is phrased too loosely for the fast path
+    queries = args.queries or [
         "What is 15 * 8?",
         "Calculate 100 + 50",
-        "What is 144 divided by 12?"
+        "What is 144 divided by 12?",
+        "What is 15 * 8 and 100 + 50 and 144 divided by 12?",
+        "How many primes are below 2000000 and what is the USD to EUR exchange rate?",
+        "Roughly how much is 144 divided by 12, in words?",
     ]
-    
-    for query in queries:
-        print(f"\nQuery: {query}")
-        print("-" * 50)
-        
-        result = llm_with_tools.invoke(query)
-        
-        # Check if tool calls were made
-        if hasattr(result, 'tool_calls') and result.tool_calls:
-            print(f"Tool calls: {result.tool_calls}")
-        else:
-            print(f"Response: {result.content}")
+    asyncio.run(main(queries, args.max_steps, args.stream, args.mcp, args.mcp_address, args.mcp_sessions,
+                     fast_path=not args.no_fast_path, tool_top_k=args.tool_top_k))
+
+    if args.mcp is None:
+        # With --mcp the tools, and their cache, live in the server process
+        print(f"\nTool cache: {tool_cache.stats()}")
+
+    if response_cache is not None:
+        print(f"\nResponse cache: {response_cache.stats()}")
+    if router is not None:
+        print(f"\nRouter: {router.stats()}")
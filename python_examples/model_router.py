@@ -0,0 +1,310 @@
+"""
+Cost- and Latency-Aware Model Router
+Author: Optimum AI Lab
+Description: Picks a model per request instead of sending everything to
+gpt-4-turbo-preview. The dashboard's Token Costs page puts the cost spread
+between models at about 7x. Each request's prompt tokens are counted, and a
+difficulty score between 0 and 1 is computed from weighted rules (regexes,
+prompt length, bound tools) through a logistic function. The score sets the
+quality the answer needs. Among the models that meet it (and the latency
+cap), the router picks the cheapest estimated call or the fastest model.
+
+Prices come from `token_cost_data` in ../dashboard.py, read without importing
+the Streamlit app. The table lists dollars per 1K tokens: GPT-4 Turbo's
+$0.01 + $0.03 matches the $40/1M on the same page. Quality and latency
+figures per model are assumptions to tune. They, the rule weights (e.g.
+weights fitted offline on the decision log) and extra models can be
+overridden with a JSON file. GPT-4o mini is not on the dashboard, so its
+OpenAI list prices are given here; without a cheaper, weaker model the OpenAI
+candidates would all clear the quality bar of any prompt and the choice would
+never depend on difficulty. Only models reachable at the configured endpoint
+are candidates: by default the OpenAI ones. A non-OpenAI model joins
+when its profile sets a base_url, or for every model when the config sets
+"gateway": true (an OpenAI-compatible gateway such as LiteLLM or OpenRouter at
+OPENAI_BASE_URL; LLM_ROUTER_GATEWAY=1 does the same). With $LLM_ROUTER_LOG
+set, every decision is written to it as one JSON line ("-" for stderr).
+
+Enable it for the examples with an environment variable:
+    LLM_ROUTER=cost LLM_ROUTER_MAX_LATENCY_MS=2000 python api_call.py
+
+Usage:
+    python model_router.py route --objective cost "Summarize this sentence." "Prove that ..."
+"""
+
+import argparse
+import ast
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.messages import get_buffer_string
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableLambda
+
+from context_packing import count_tokens
+from rate_limiter import DEFAULT_COMPLETION_TOKENS
+
+PRICE_TABLE = Path(__file__).resolve().parent.parent / "dashboard.py"
+BASELINE_MODEL = "gpt-4-turbo-preview"
+
+# API model id, provider, relative answer quality (0-1) and typical latency for
+# the dashboard's models; tune these to your own evaluations. Models missing from
+# the dashboard's price table carry their own $/1K prices.
+MODEL_PROFILES = {
+    "GPT-4o mini": {"model": "gpt-4o-mini", "provider": "openai", "quality": 0.78, "latency_ms": 600,
+                    "input_cost": 0.00015, "output_cost": 0.0006},
+    "GPT-4 Turbo": {"model": "gpt-4-turbo-preview", "provider": "openai", "quality": 0.90, "latency_ms": 1800},
+    "GPT-4o": {"model": "gpt-4o", "provider": "openai", "quality": 0.92, "latency_ms": 900},
+    "Claude 3.5 Sonnet": {"model": "claude-3-5-sonnet-latest", "provider": "anthropic", "quality": 0.93,
+                          "latency_ms": 1100},
+    "Gemini 2.0 Flash": {"model": "gemini-2.0-flash", "provider": "google", "quality": 0.80, "latency_ms": 450},
+    "DeepSeek R1": {"model": "deepseek-reasoner", "provider": "deepseek", "quality": 0.88, "latency_ms": 4000},
+}
+
+# (pattern, weight): positive weights make a prompt harder, negative easier
+DIFFICULTY_RULES = [
+    (r"\b(prove|derive|step[- ]by[- ]step|reason|trade-?offs?|architect\w*|debug|refactor|optimi[sz]e)\b", 1.6),
+    (r"\b(analy[sz]e|compare|contrast|explain why|evaluate|design|plan)\b", 0.9),
+    (r"```|\bdef \w+\(|\bclass \w+|\bSELECT\b|\bTraceback\b", 1.2),
+    (r"\b(summari[sz]e|classify|extract|translate|list|rewrite|one sentence|yes or no)\b", -1.0),
+]
+
+
+def load_price_table(path=PRICE_TABLE):
+    """{model name: (input $/1K, output $/1K)} from the dashboard's token_cost_data."""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == "token_cost_data" for target in node.targets):
+            table = ast.literal_eval(node.value)
+            return {name: (inp, out) for name, inp, out in
+                    zip(table["Model"], table["Input Cost ($)"], table["Output Cost ($)"])}
+    raise ValueError(f"no token_cost_data in {path}")
+
+
+def prompt_text(value):
+    """Flatten a str, PromptValue or message list into the text the model will see."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, PromptValue):
+        return get_buffer_string(value.to_messages())
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return get_buffer_string(list(value))
+
+
+class DifficultyScorer:
+    """Logistic score over rule matches, log prompt length and tool use."""
+
+    def __init__(self, rules=DIFFICULTY_RULES, bias=-1.2, token_weight=0.5, tool_weight=0.4):
+        self.rules = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in rules]
+        self.bias = bias
+        self.token_weight = token_weight
+        self.tool_weight = tool_weight
+
+    def score(self, text, prompt_tokens, tools=0):
+        z = self.bias + self.token_weight * math.log2(1 + prompt_tokens / 256) + self.tool_weight * bool(tools)
+        z += sum(weight for pattern, weight in self.rules if pattern.search(text))
+        return 1.0 / (1.0 + math.exp(-z))
+
+
+class ModelRouter:
+    """Routes each request to the cheapest (or fastest) model good enough for it."""
+
+    def __init__(self, models, objective="cost", min_quality=0.7, max_quality=None, max_latency_ms=None,
+                 completion_tokens=DEFAULT_COMPLETION_TOKENS, scorer=None, baseline=BASELINE_MODEL,
+                 log=None, **chat_kwargs):
+        if objective not in ("cost", "latency"):
+            raise ValueError(f"objective must be 'cost' or 'latency', not {objective!r}")
+        self.models = models
+        self.objective = objective
+        self.min_quality = min_quality
+        # The hardest prompts need the best candidate, not a fixed figure some candidate may not reach
+        self.max_quality = max(m["quality"] for m in models.values()) if max_quality is None else max_quality
+        self.max_latency_ms = max_latency_ms
+        self.completion_tokens = completion_tokens
+        self.scorer = scorer or DifficultyScorer()
+        self.baseline = next((m for m in models.values() if m["model"] == baseline), None)
+        if self.baseline is None:
+            raise ValueError(f"baseline model {baseline!r} is not among the router's models "
+                             f"({', '.join(m['model'] for m in models.values())})")
+        self.log = log
+        self._log_file = None
+        self.chat_kwargs = chat_kwargs
+        self._lock = threading.Lock()
+        self._chat_models = {}
+        self.decisions = 0
+        self.by_model = {}
+        self.cost_usd = 0.0
+        self.baseline_cost_usd = 0.0
+
+    @classmethod
+    def build(cls, config=None, price_table=PRICE_TABLE, **kwargs):
+        """Router over the dashboard's reachable models, with `config` (a parsed JSON dict) overrides."""
+        config = dict(config or {})
+        gateway = config.pop("gateway", False)
+        models = {name: dict(profile) for name, profile in MODEL_PROFILES.items() if "input_cost" in profile}
+        for name, (input_cost, output_cost) in load_price_table(price_table).items():
+            models[name] = dict(MODEL_PROFILES.get(name, {}), input_cost=input_cost, output_cost=output_cost)
+        for name, profile in config.pop("models", {}).items():
+            models[name] = dict(models.get(name, {}), **profile)
+        models = {name: dict(profile, name=name) for name, profile in models.items() if "model" in profile and (
+            gateway or profile.get("provider", "openai") == "openai" or profile.get("base_url"))}
+        scorer = config.pop("scorer", None)
+        if scorer is not None:
+            kwargs["scorer"] = DifficultyScorer(**scorer)
+        return cls(models, **config, **kwargs)
+
+    @classmethod
+    def from_env(cls, **chat_kwargs):
+        """Router for $LLM_ROUTER (cost or latency), or None if unset.
+
+        $LLM_ROUTER_MAX_LATENCY_MS caps model latency, $LLM_ROUTER_CONFIG names
+        a JSON overrides file, $LLM_ROUTER_GATEWAY=1 makes every model a
+        candidate and $LLM_ROUTER_LOG names the decision log ("-" for stderr).
+        """
+        objective = os.environ.get("LLM_ROUTER")
+        if not objective:
+            return None
+        config = {}
+        if os.environ.get("LLM_ROUTER_CONFIG"):
+            config = json.loads(Path(os.environ["LLM_ROUTER_CONFIG"]).read_text(encoding="utf-8"))
+        config["objective"] = objective
+        if os.environ.get("LLM_ROUTER_GATEWAY") == "1":
+            config["gateway"] = True
+        if os.environ.get("LLM_ROUTER_MAX_LATENCY_MS"):
+            config["max_latency_ms"] = float(os.environ["LLM_ROUTER_MAX_LATENCY_MS"])
+        log = os.environ.get("LLM_ROUTER_LOG")
+        return cls.build(config, log=log, **chat_kwargs)
+
+    def estimate_cost(self, profile, prompt_tokens):
+        return (prompt_tokens * profile["input_cost"] + self.completion_tokens * profile["output_cost"]) / 1000.0
+
+    def decide(self, value, tools=0):
+        """Pick a model for `value` (prompt text, PromptValue or messages); returns the decision record."""
+        text = prompt_text(value)
+        prompt_tokens = count_tokens(text)
+        difficulty = self.scorer.score(text, prompt_tokens, tools)
+        required = self.min_quality + difficulty * (self.max_quality - self.min_quality)
+        eligible = [m for m in self.models.values() if m["quality"] >= required and (
+            self.max_latency_ms is None or m["latency_ms"] <= self.max_latency_ms)]
+        if eligible:
+            rank = "latency_ms" if self.objective == "latency" else None
+            choice = min(eligible, key=lambda m: (
+                m[rank] if rank else self.estimate_cost(m, prompt_tokens), -m["quality"]))
+            reason = f"{self.objective} among {len(eligible)} eligible"
+        else:
+            # Nothing meets the policy: favour quality over the latency cap
+            choice = max(self.models.values(), key=lambda m: m["quality"])
+            reason = "no model meets the policy; highest quality"
+        cost = self.estimate_cost(choice, prompt_tokens)
+        baseline_cost = self.estimate_cost(self.baseline, prompt_tokens)
+        decision = {
+            "ts": round(time.time(), 3),
+            "model": choice["model"],
+            "name": choice["name"],
+            "reason": reason,
+            "prompt_tokens": prompt_tokens,
+            "difficulty": round(difficulty, 3),
+            "required_quality": round(required, 3),
+            "est_cost_usd": round(cost, 6),
+            "baseline_cost_usd": round(baseline_cost, 6),
+            "est_latency_ms": choice["latency_ms"],
+        }
+        with self._lock:
+            self.decisions += 1
+            self.by_model[choice["model"]] = self.by_model.get(choice["model"], 0) + 1
+            self.cost_usd += cost
+            self.baseline_cost_usd += baseline_cost
+            self._write(decision)
+        return decision
+
+    def _write(self, decision):
+        # Called with the lock held; the log file stays open, line-buffered
+        if self.log is None:
+            return
+        if self.log == "-":
+            out = sys.stderr
+        else:
+            if self._log_file is None:
+                self._log_file = open(self.log, "a", encoding="utf-8", buffering=1)
+            out = self._log_file
+        out.write(json.dumps(decision) + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+    def chat_model(self, model_id, tools=None):
+        """Shared ChatOpenAI for `model_id` (tools bound if given), built on first use."""
+        key = (model_id, tuple(tool.name for tool in tools) if tools else None)
+        with self._lock:
+            if key not in self._chat_models:
+                from langchain_openai import ChatOpenAI
+
+                profile = next(m for m in self.models.values() if m["model"] == model_id)
+                kwargs = dict(self.chat_kwargs)
+                if profile.get("base_url"):
+                    kwargs["base_url"] = profile["base_url"]
+                llm = ChatOpenAI(model=model_id, **kwargs)
+                self._chat_models[key] = llm.bind_tools(tools) if tools else llm
+            return self._chat_models[key]
+
+    def select(self, value, tools=None):
+        return self.chat_model(self.decide(value, len(tools or ()))["model"], tools)
+
+    def as_runnable(self, tools=None):
+        """Runnable that routes, then invokes (or streams) the chosen model on the same input."""
+        return RunnableLambda(lambda value: self.select(value, tools), name="ModelRouter")
+
+    def stats(self):
+        return {
+            "decisions": self.decisions,
+            "by_model": dict(self.by_model),
+            "est_cost_usd": round(self.cost_usd, 6),
+            "baseline_cost_usd": round(self.baseline_cost_usd, 6),
+            "savings": round(1 - self.cost_usd / self.baseline_cost_usd, 4) if self.baseline_cost_usd else 0.0,
+        }
+
+
+SAMPLE_PROMPTS = [
+    "Explain why the sky is blue in one sentence.",
+    "Classify the sentiment of: the service was quick and friendly.",
+    "Summarize the following paragraph in two sentences: LangChain and LangChain4j both wrap LLM APIs.",
+    "Compare LangChain and Spring AI for a bank's customer-support agent and evaluate the trade-offs.",
+    "Design a retry and rate-limiting architecture for 5,000 LLM calls per minute and explain why.",
+    "Debug this code step by step:\n```python\ndef mean(xs):\n    return sum(xs) / len(xs) - 1\n```",
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost- and latency-aware model routing")
+    commands = parser.add_subparsers(dest="command", required=True)
+    route = commands.add_parser("route", help="show the routing decision for prompts (no API calls)")
+    route.add_argument("prompts", nargs="*", help="prompts to route (default: a built-in sample)")
+    route.add_argument("--objective", choices=("cost", "latency"), default="cost")
+    route.add_argument("--max-latency-ms", type=float, default=None)
+    route.add_argument("--config", help="JSON overrides for models, scorer and policy")
+    route.add_argument("--gateway", action="store_true",
+                       help="route among every dashboard model, as behind an OpenAI-compatible gateway")
+    args = parser.parse_args()
+
+    config = json.loads(Path(args.config).read_text(encoding="utf-8")) if args.config else {}
+    config.update(objective=args.objective, max_latency_ms=args.max_latency_ms)
+    if args.gateway:
+        config["gateway"] = True
+    router = ModelRouter.build(config)
+    print(f"{'difficulty':>10} {'model':<26} {'est $':>9} {'GPT-4T $':>9}  prompt")
+    print("-" * 90)
+    for text in args.prompts or SAMPLE_PROMPTS:
+        decision = router.decide(text)
+        print(f"{decision['difficulty']:>10.2f} {decision['model']:<26} {decision['est_cost_usd']:>9.5f} "
+              f"{decision['baseline_cost_usd']:>9.5f}  {text.splitlines()[0][:40]}")
+    print(f"\nRouter: {router.stats()}")
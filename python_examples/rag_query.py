@@ -3,25 +3,212 @@ RAG Query Implementation using LangChain
 Author: Optimum AI Lab
 Description: This example demonstrates how to implement a basic RAG pipeline
 that loads a document, creates a vector store, and answers questions based on it.
+
+The vector store is embedded once and saved to disk with:
+    python rag_query.py --build [--corpus docs.txt]
+Queries then load the saved index read-only and memory-mapped on first use,
+so process start-up does not re-embed the corpus. The docstore is saved as a
+memory-mapped text buffer too; with --compact none it is pickled, and that
+pickle is loaded in full, so start-up time and memory grow with the corpus. Pass --stream to print the
+answer token by token and report time to first token.
 """
 
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from pathlib import Path
+
+import faiss
 from langchain_community.vectorstores import FAISS
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
-# 1. Create a vector store with sample documents
-print("Creating vector store...")
-vectorstore = FAISS.from_texts(
-    [
-        "Optimum AI Lab builds autonomous AI agents for enterprise applications.",
-        "We specialize in LLM frameworks comparison and optimization.",
-        "Our dashboard provides comprehensive analysis of Python and Java frameworks."
-    ],
-    embedding=OpenAIEmbeddings()
-)
-retriever = vectorstore.as_retriever()
+import ann_index
+import compact_store
+from context_packing import ContextPacker
+from embedding_cache import CachedEmbeddings
+from hybrid_retriever import BM25Index, HybridRetriever
+from index_manager import IndexManager, current_generation
+from model_router import ModelRouter
+# One keep-alive connection pool per process for all OpenAI calls (rate limited
+# when LLM_RPM / LLM_TPM / LLM_MAX_CONCURRENCY are set, see rate_limiter.py)
+from rate_limiter import http_async_client, http_client, single_flight
+# Exact-match response cache for the LLM call, enabled by LLM_CACHE (see response_cache.py)
+from response_cache import response_cache
+from semantic_cache import SemanticCache, query_vector
+from sharded_retriever import ShardedIndex, ShardedRetriever
+from streaming import print_timing, print_token, stream_with_timing
+
+INDEX_DIR = Path(os.environ.get("RAG_INDEX_DIR", Path(__file__).resolve().parent / "faiss_index"))
+EMBEDDING_CACHE_PATH = Path(os.environ.get(
+    "RAG_EMBEDDING_CACHE", Path(__file__).resolve().parent / "embedding_cache.sqlite3"
+))
+# Index type used by --build (see ann_index.py), e.g. "hnsw:M=32,efSearch=64", and
+# optional search-time overrides applied when loading, e.g. "nprobe=32"
+INDEX_SPEC = os.environ.get("RAG_INDEX_SPEC", "flat")
+SEARCH_PARAMS = os.environ.get("RAG_SEARCH_PARAMS", "")
+# "dense" (vector search only), "hybrid" (BM25 + vectors, see hybrid_retriever.py),
+# "managed" (incrementally updated index in INDEX_DIR/managed, see index_manager.py)
+# or "sharded" (one worker process per shard in INDEX_DIR/shards, see sharded_retriever.py)
+RETRIEVER = os.environ.get("RAG_RETRIEVER", "dense")
+# Token budget for the {context} slot after deduplication and packing
+CONTEXT_TOKENS = int(os.environ.get("RAG_CONTEXT_TOKENS", "2000"))
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.environ.get("RAG_ANSWER_CACHE_TTL", "3600"))
+
+SAMPLE_TEXTS = [
+    "Optimum AI Lab builds autonomous AI agents for enterprise applications.",
+    "We specialize in LLM frameworks comparison and optimization.",
+    "Our dashboard provides comprehensive analysis of Python and Java frameworks."
+]
+
+# Memory-map the index file instead of reading it onto the heap
+MMAP_FLAGS = compact_store.MMAP_FLAGS
+
+
+_embeddings = None
+
+
+def get_embeddings():
+    """OpenAI embeddings behind the persistent (model, text hash) cache."""
+    global _embeddings
+    if _embeddings is None:
+        underlying = OpenAIEmbeddings(http_client=http_client, http_async_client=http_async_client)
+        _embeddings = CachedEmbeddings(underlying, EMBEDDING_CACHE_PATH)
+    return _embeddings
+
+
+# 1. Build the vector store once and persist the index plus docstore
+def build_vectorstore(texts=SAMPLE_TEXTS, index_dir=None, index_spec="flat", compact=None):
+    """Embed `texts` into a FAISS store, saving it to `index_dir` if given.
+
+    Only texts missing from the embedding cache are sent to the API. With
+    `compact` the saved copy uses compact_store.py's layout: "fp16" or "int8"
+    re-encode a flat index, "keep" compacts only the docstore (for ANN specs).
+    """
+    if index_spec == "flat":
+        vectorstore = FAISS.from_texts(texts, embedding=get_embeddings())
+    else:
+        vectors = get_embeddings().embed_documents(texts)
+        vectorstore = ann_index.vectorstore_from_vectors(texts, vectors, get_embeddings(), index_spec)
+    if index_dir is not None:
+        vectorstore.save_local(str(index_dir))
+        BM25Index.from_vectorstore(vectorstore).save(Path(index_dir) / "bm25")
+        if compact:
+            compact_store.convert(index_dir, compact)
+    return vectorstore
+
+
+def load_vectorstore(index_dir=INDEX_DIR):
+    """Load a saved vector store read-only, with the FAISS index memory-mapped."""
+    index_dir = Path(index_dir)
+    if compact_store.is_compact(index_dir):
+        index, docstore, index_to_docstore_id = compact_store.load_compact(index_dir, MMAP_FLAGS)
+    else:
+        index = faiss.read_index(str(index_dir / "index.faiss"), MMAP_FLAGS)
+        # Same layout FAISS.save_local writes: (docstore, index_to_docstore_id)
+        with open(index_dir / "index.pkl", "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    if SEARCH_PARAMS:
+        ignored = ann_index.set_search_params(index, **ann_index.parse_index_spec("flat:" + SEARCH_PARAMS)[1])
+        if ignored:
+            print(f"RAG_SEARCH_PARAMS: {', '.join(ignored)} not supported by the loaded "
+                  f"{type(index).__name__}; ignored", file=sys.stderr)
+    return FAISS(get_embeddings(), index, docstore, index_to_docstore_id)
+
+
+_vectorstore = None
+_vectorstore_lock = threading.Lock()
+
+
+def get_vectorstore():
+    """Return the process-wide vector store, loading it on first use."""
+    global _vectorstore
+    if _vectorstore is None:
+        with _vectorstore_lock:
+            if _vectorstore is None:
+                if (INDEX_DIR / "index.faiss").exists():
+                    _vectorstore = load_vectorstore(INDEX_DIR)
+                else:
+                    print(f"No saved index in {INDEX_DIR}; creating vector store in memory "
+                          "(run `python rag_query.py --build` to persist it)...", file=sys.stderr)
+                    _vectorstore = build_vectorstore(SAMPLE_TEXTS)
+    return _vectorstore
+
+
+_retriever = None
+_manager = None
+
+
+def get_retriever():
+    """Dense, hybrid, managed or sharded retriever over the vector store, created on first use."""
+    global _retriever, _manager
+    if _retriever is None:
+        if RETRIEVER == "managed":
+            managed_dir = INDEX_DIR / "managed"
+            # Watched, so updates saved by `index_manager.py apply` are picked up while running
+            if current_generation(managed_dir):
+                _manager = IndexManager.load(managed_dir, get_embeddings(), watch=True)
+            else:
+                _manager = IndexManager.from_vectorstore(get_vectorstore(), INDEX_SPEC)
+                _manager.watch(managed_dir)
+            _retriever = _manager.as_retriever()
+        elif RETRIEVER == "sharded":
+            _retriever = ShardedRetriever(index=ShardedIndex(INDEX_DIR / "shards"), embeddings=get_embeddings())
+        elif RETRIEVER == "hybrid":
+            vectorstore = get_vectorstore()
+            bm25_dir = INDEX_DIR / "bm25"
+            if (bm25_dir / "terms.json").exists():
+                bm25 = BM25Index.load(bm25_dir)
+            else:
+                bm25 = BM25Index.from_vectorstore(vectorstore)
+            _retriever = HybridRetriever(vectorstore=vectorstore, bm25=bm25)
+        else:
+            _retriever = get_vectorstore().as_retriever()
+    return _retriever
+
+
+def retrieve_by_vector(question, vector):
+    """Retrieve with a question vector already computed (by the answer cache)."""
+    retriever = get_retriever()
+    if hasattr(retriever, "search_by_vector"):
+        return retriever.search_by_vector(question, vector)
+    return retriever.vectorstore.similarity_search_by_vector(vector, **retriever.search_kwargs)
+
+
+def retrieve(question):
+    vector = query_vector(question)
+    if vector is not None:
+        return retrieve_by_vector(question, vector)
+    return get_retriever().invoke(question)
+
+
+def vectorstore_version():
+    """Changes whenever the served index does; the answer cache keys on it."""
+    index_file = INDEX_DIR / "index.faiss"
+    mtime = index_file.stat().st_mtime_ns if index_file.exists() else 0
+    vectorstore = _vectorstore
+    manager_version = _manager.version if _manager is not None else 0
+    return (mtime, id(vectorstore), vectorstore.index.ntotal if vectorstore is not None else 0,
+            manager_version)
+
+
+async def aretrieve(question):
+    vector = query_vector(question)
+    if vector is not None:
+        return await asyncio.to_thread(retrieve_by_vector, question, vector)
+    retriever = await asyncio.to_thread(get_retriever)
+    return await retriever.ainvoke(question)
+
+
+retriever = RunnableLambda(retrieve, afunc=aretrieve)
 
 # 2. Define the prompt template
 template = """Answer the question based only on the following context:
@@ -32,22 +219,177 @@ Question: {question}
 Answer:"""
 prompt = ChatPromptTemplate.from_template(template)
 
-# 3. Initialize the LLM model
-model = ChatOpenAI(model="gpt-4-turbo-preview")
+# 3. Initialize the LLM model (or, with LLM_ROUTER set, pick one per filled-in prompt)
+MODEL_NAME = "gpt-4-turbo-preview"
+router = ModelRouter.from_env(
+    http_client=http_client, http_async_client=http_async_client, cache=response_cache)
+model = router.as_runnable() if router is not None else ChatOpenAI(
+    model=MODEL_NAME,
+    http_client=http_client,
+    http_async_client=http_async_client,
+    cache=response_cache,
+)
 
-# 4. Create the RAG chain
+# 4. Create the RAG chain, packing retrieved chunks into a token budget
+packer = ContextPacker(CONTEXT_TOKENS, model=MODEL_NAME)
 chain = (
-    {"context": retriever, "question": RunnablePassthrough()}
+    {"context": retriever | RunnableLambda(packer.pack), "question": RunnablePassthrough()}
     | prompt
     | model
     | StrOutputParser()
 )
 
-# 5. Test the RAG pipeline
+# 5. Serve repeated (or reworded) questions from the semantic answer cache
+answer_cache = SemanticCache(
+    get_embeddings,
+    version=vectorstore_version,
+    threshold=ANSWER_CACHE_THRESHOLD,
+    ttl_seconds=ANSWER_CACHE_TTL,
+)
+
+
+def lexical_only(question):
+    """True when the hybrid retriever answers `question` from BM25 alone.
+
+    Such questions skip the answer cache, whose lookup would embed them first.
+    """
+    retriever = get_retriever()
+    return isinstance(retriever, HybridRetriever) and retriever.lexical_confident(question)
+
+
+cached_chain = answer_cache.wrap(chain, bypass=lexical_only if RETRIEVER == "hybrid" else None)
+
+
+def read_corpus(path):
+    """One document per non-empty line."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def iter_questions(lines):
+    """Yield {"id", "question"} records from JSONL lines (or bare text lines)."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = line
+        if not isinstance(record, dict):
+            record = {"question": str(record)}
+        record.setdefault("id", number)
+        yield record
+
+
+async def answer_questions(records, concurrency=8, runnable=cached_chain):
+    """Run records through the chain concurrently, yielding results as they complete.
+
+    At most `concurrency` queries are in flight, and the input is only read as
+    fast as slots free up, so arbitrarily long question streams are fine.
+    """
+    async def answer(record):
+        start = time.perf_counter()
+        result = {"id": record.get("id"), "question": record.get("question")}
+        try:
+            if "question" not in record:
+                raise ValueError("record has no 'question'")
+            result["answer"] = await runnable.ainvoke(record["question"])
+        except Exception as exc:
+            result["error"] = repr(exc)
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+        return result
+
+    # The input (e.g. stdin) is read on a worker thread, so a slow producer
+    # never blocks the event loop while queries are in flight
+    records = iter(records)
+    pending = set()
+    reading = None
+    exhausted = False
+    while True:
+        if reading is None and not exhausted and len(pending) < concurrency:
+            reading = asyncio.ensure_future(asyncio.to_thread(next, records, None))
+        if not pending and reading is None:
+            break
+        done, _ = await asyncio.wait(pending | ({reading} if reading else set()),
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if reading in done:
+            done.discard(reading)
+            record, reading = reading.result(), None
+            if record is None:
+                exhausted = True
+            else:
+                pending.add(asyncio.create_task(answer(record)))
+        pending -= done
+        for task in done:
+            yield task.result()
+
+
+async def run_batch(lines, concurrency, out=sys.stdout):
+    started = time.perf_counter()
+    count = 0
+    async for result in answer_questions(iter_questions(lines), concurrency):
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        count += 1
+    elapsed = time.perf_counter() - started
+    print(f"Answered {count} questions in {elapsed:.2f}s "
+          f"({count / elapsed if elapsed else 0:.1f}/s, concurrency={concurrency})", file=sys.stderr)
+    print(f"Answer cache: {answer_cache.stats()}", file=sys.stderr)
+    print(f"Context packing: {packer.stats()}", file=sys.stderr)
+    if response_cache is not None:
+        print(f"Response cache: {response_cache.stats()}", file=sys.stderr)
+    if single_flight is not None:
+        print(f"Single-flight: {single_flight.stats()}", file=sys.stderr)
+    if router is not None:
+        print(f"Router: {router.stats()}", file=sys.stderr)
+
+
+# 6. Test the RAG pipeline
 if __name__ == "__main__":
-    question = "What does Optimum AI Lab do?"
-    print(f"\nQuestion: {question}")
-    print("-" * 50)
-    
-    result = chain.invoke(question)
-    print(f"Answer: {result}")
+    parser = argparse.ArgumentParser(description="RAG query example")
+    parser.add_argument("--build", action="store_true", help="embed the corpus and save the index")
+    parser.add_argument("--corpus", help="text file with one document per line (default: sample texts)")
+    parser.add_argument("--index-spec", default=INDEX_SPEC,
+                        help="index type for --build: flat, ivf:..., hnsw:..., pq:... (see ann_index.py)")
+    parser.add_argument("--compact", choices=("keep", "fp16", "int8", "none"), default="keep",
+                        help="save the docstore as a contiguous text buffer, and with fp16/int8 also compact "
+                             "vectors (flat index only); 'none' keeps FAISS's pickled docstore, which is "
+                             "unpickled in full on every load (see compact_store.py)")
+    parser.add_argument("--question", default="What does Optimum AI Lab do?")
+    parser.add_argument("--stream", action="store_true", help="stream the answer and report TTFT")
+    parser.add_argument("--batch", metavar="JSONL",
+                        help="answer questions from a JSONL file ('-' for stdin), one result per line")
+    parser.add_argument("--concurrency", type=int, default=8, help="queries in flight in --batch mode")
+    args = parser.parse_args()
+    if args.build and args.compact in ("fp16", "int8") and args.index_spec != "flat":
+        parser.error(f"--compact {args.compact} re-encodes a flat index; use --compact keep "
+                     f"with --index-spec {args.index_spec}")
+
+    if args.batch:
+        source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+        with source:
+            asyncio.run(run_batch(source, args.concurrency))
+    elif args.build:
+        texts = read_corpus(args.corpus) if args.corpus else SAMPLE_TEXTS
+        print(f"Embedding {len(texts)} documents into {INDEX_DIR}...")
+        build_vectorstore(texts, INDEX_DIR, args.index_spec, None if args.compact == "none" else args.compact)
+        print("Index saved.")
+        print(f"Embedding cache: {get_embeddings().stats()}")
+    else:
+        question = args.question
+        print(f"\nQuestion: {question}")
+        print("-" * 50)
+
+        if args.stream:
+            print("Answer: ", end="")
+            _, timing = stream_with_timing(chain, question, on_token=print_token)
+            print_timing(timing)
+        else:
+            result = cached_chain.invoke(question)
+            print(f"Answer: {result}")
+        print(f"Context: {packer.last}")
+        if response_cache is not None:
+            print(f"Response cache: {response_cache.stats()}")
+        if router is not None:
+            print(f"Router: {router.stats()}")
@@ -0,0 +1,327 @@
+"""
+Long-Running RAG Query Service
+Author: Optimum AI Lab
+Description: Serves rag_query.py over HTTP from one long-lived asyncio
+process, so imports, index loading and client setup are paid once at start-up
+instead of on every query. The index is loaded before the port opens, and all
+LLM and embedding calls share rag_query's pooled keep-alive HTTP client.
+
+Endpoints:
+    POST /query     {"question": "..."} -> {"answer": "...", "latency_ms": ...}
+    GET  /metrics   Prometheus text format: request latency histograms per
+                    endpoint, request counts by status, in-flight requests,
+                    answer cache, context packing and (with LLM_SINGLE_FLIGHT=1)
+                    request coalescing counters
+    GET  /healthz   liveness
+
+Usage:
+    python rag_service.py serve --port 8080
+    curl -s localhost:8080/query -d '{"question": "What does Optimum AI Lab do?"}'
+    python rag_service.py bench --requests 500 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import http.client
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from stats import run_load, summarize_latencies
+
+HERE = Path(__file__).resolve().parent
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram in seconds, Prometheus style."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.count += 1
+
+    def render(self, name, labels):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.BUCKETS + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.latency = {}  # endpoint -> LatencyHistogram
+        self.requests = {}  # (endpoint, status) -> count
+        self.in_flight = 0
+
+    def observe(self, endpoint, status, seconds):
+        self.latency.setdefault(endpoint, LatencyHistogram()).observe(seconds)
+        self.requests[endpoint, status] = self.requests.get((endpoint, status), 0) + 1
+
+    def render(self, gauges=None):
+        lines = ["# TYPE rag_request_latency_seconds histogram"]
+        for endpoint, histogram in sorted(self.latency.items()):
+            lines += histogram.render("rag_request_latency_seconds", f'endpoint="{endpoint}"')
+        lines.append("# TYPE rag_requests_total counter")
+        for (endpoint, status), count in sorted(self.requests.items()):
+            lines.append(f'rag_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append("# TYPE rag_requests_in_flight gauge")
+        lines.append(f"rag_requests_in_flight {self.in_flight}")
+        for name, value in (gauges or {}).items():
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# HTTP SERVICE
+# ============================================================================
+
+class RagService:
+    """Minimal HTTP/1.1 keep-alive server around a RAG runnable."""
+
+    def __init__(self, runnable, stats=None, max_concurrency=64):
+        self.runnable = runnable
+        self.stats = stats or (lambda: {})
+        self.metrics = Metrics()
+        self.slots = asyncio.Semaphore(max_concurrency)
+
+    async def query(self, body):
+        try:
+            question = json.loads(body or b"{}")["question"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": 'expected a JSON body {"question": "..."}'}
+        start = time.perf_counter()
+        async with self.slots:
+            answer = await self.runnable.ainvoke(question)
+        return 200, {"answer": answer, "latency_ms": round((time.perf_counter() - start) * 1000.0, 2)}
+
+    def gauges(self):
+        """Flatten component stats() dicts into rag_<component>_<counter> gauges."""
+        gauges = {}
+        for component, values in self.stats().items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[f"rag_{component}_{key}"] = value
+        return gauges
+
+    async def dispatch(self, method, path, body):
+        """Return (status, content type, payload bytes)."""
+        if path == "/query":
+            if method != "POST":
+                return 405, "application/json", b'{"error": "use POST"}'
+            status, payload = await self.query(body)
+            return status, "application/json", json.dumps(payload).encode("utf-8")
+        if path == "/metrics":
+            return 200, "text/plain; version=0.0.4", self.metrics.render(self.gauges()).encode("utf-8")
+        if path == "/healthz":
+            return 200, "application/json", b'{"status": "ok"}'
+        return 404, "application/json", b'{"error": "not found"}'
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                path = urlsplit(target).path
+                endpoint = path if path in ("/query", "/metrics", "/healthz") else "other"
+                start = time.perf_counter()
+                self.metrics.in_flight += 1
+                try:
+                    status, content_type, payload = await self.dispatch(method, path, body)
+                except Exception as exc:  # report it to the caller, keep serving
+                    status, content_type = 500, "application/json"
+                    payload = json.dumps({"error": repr(exc)}).encode("utf-8")
+                finally:
+                    self.metrics.in_flight -= 1
+                self.metrics.observe(endpoint, status, time.perf_counter() - start)
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Listening on http://{address[0]}:{address[1]}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+async def serve(host, port, max_concurrency, use_answer_cache=True):
+    import rag_query
+
+    # Load the index (and open its memory map) before accepting traffic
+    started = time.perf_counter()
+    await asyncio.to_thread(rag_query.get_retriever)
+    print(f"Index loaded in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+    runnable = rag_query.cached_chain if use_answer_cache else rag_query.chain
+    def stats():
+        components = {
+            "answer_cache": rag_query.answer_cache.stats(),
+            "context": rag_query.packer.stats(),
+            "embedding_cache": rag_query.get_embeddings().stats(),
+        }
+        if rag_query.single_flight is not None:
+            components["single_flight"] = rag_query.single_flight.stats()
+        return components
+
+    service = RagService(runnable, stats=stats, max_concurrency=max_concurrency)
+    await service.serve(host, port)
+
+
+# ============================================================================
+# BENCHMARK: per-request process vs long-running service
+# ============================================================================
+
+QUESTIONS = [
+    "What does Optimum AI Lab do?",
+    "Which frameworks does the dashboard compare?",
+    "What kind of agents are built?",
+    "What is optimized?",
+]
+
+
+def start_service(env, *extra):
+    """Start `rag_service.py serve` on a free port; return (process, host, port)."""
+    process = subprocess.Popen(
+        [sys.executable, str(HERE / "rag_service.py"), "serve", "--port", "0", *extra],
+        cwd=HERE, env=env, stdout=subprocess.PIPE, text=True,
+    )
+    line = process.stdout.readline()
+    if not line.startswith("Listening on "):
+        process.kill()
+        raise RuntimeError(f"service did not start: {line!r}")
+    address = urlsplit(line.split()[-1])
+    return process, address.hostname, address.port
+
+
+def run_bench(args):
+    from stub_server import StubConfig, serve_in_background
+
+    stub = serve_in_background(config=StubConfig(latency_ms=args.latency_ms, seed=0))
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, OPENAI_BASE_URL=stub.base_url, OPENAI_API_KEY="stub",
+                   RAG_INDEX_DIR=str(Path(tmp) / "index"),
+                   RAG_EMBEDDING_CACHE=str(Path(tmp) / "embeddings.sqlite3"))
+        subprocess.run([sys.executable, str(HERE / "rag_query.py"), "--build"],
+                       cwd=HERE, env=env, check=True, capture_output=True)
+        print(f"Stand-in latency {args.latency_ms} ms; answer cache disabled\n")
+        print(f"{'mode':<22} {'requests':>8} {'QPS':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        print("-" * 70)
+
+        def report(label, latencies, wall):
+            summary = summarize_latencies(latencies)
+            print(f"{label:<22} {len(latencies):>8} {len(latencies) / wall:>8.1f} "
+                  f"{summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} {summary['p99_ms']:>9.1f}")
+
+        # 1. One process per query, the way the script is used today
+        script = [sys.executable, str(HERE / "rag_query.py"), "--question"]
+        latencies, _, wall, _ = run_load(
+            lambda: subprocess.run(script + [QUESTIONS[0]], cwd=HERE, env=env, check=True,
+                                   capture_output=True),
+            1, args.script_requests)
+        report("process per query", latencies, wall)
+
+        # 2. The long-running service, one keep-alive connection per client thread
+        process, host, port = start_service(env, "--no-answer-cache")
+        local = threading.local()
+        counter = itertools.count()
+
+        def call():
+            if not hasattr(local, "connection"):
+                local.connection = http.client.HTTPConnection(host, port)
+            body = json.dumps({"question": QUESTIONS[next(counter) % len(QUESTIONS)]})
+            local.connection.request("POST", "/query", body, {"Content-Type": "application/json"})
+            response = local.connection.getresponse()
+            payload = response.read()
+            if response.status != 200:
+                raise RuntimeError(f"{response.status}: {payload[:200]!r}")
+
+        try:
+            for concurrency in (1, args.concurrency):
+                latencies, errors, wall, _ = run_load(call, concurrency, args.requests, args.warmup)
+                if errors:
+                    print(f"errors: {len(errors)} (first: {errors[0]})")
+                report(f"service (c={concurrency})", latencies, wall)
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-running RAG query service")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_cmd = commands.add_parser("serve", help="serve /query and /metrics")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8080)
+    serve_cmd.add_argument("--max-concurrency", type=int, default=64, help="queries in flight")
+    serve_cmd.add_argument("--no-answer-cache", action="store_true", help="bypass the semantic answer cache")
+
+    bench = commands.add_parser("bench", help="process-per-query vs service against the stand-in")
+    bench.add_argument("--requests", type=int, default=500, help="service requests per run")
+    bench.add_argument("--script-requests", type=int, default=10, help="process-per-query runs")
+    bench.add_argument("--concurrency", type=int, default=16)
+    bench.add_argument("--warmup", type=int, default=10)
+    bench.add_argument("--latency-ms", type=float, default=50.0, help="stand-in response latency")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, args.max_concurrency, not args.no_answer_cache))
+        except KeyboardInterrupt:
+            pass
+    else:
+        run_bench(args)
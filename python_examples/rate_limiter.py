@@ -0,0 +1,447 @@
+"""
+Adaptive Client-Side Rate Limiting for LLM Calls
+Author: Optimum AI Lab
+Description: One limiter shared by every OpenAI call the examples make
+(api_call.py, rag_query.py, mcp_tool_call.py). It sits in the HTTP transport
+of the clients handed to ChatOpenAI / OpenAIEmbeddings, so it sees every
+request, including the SDK's own retries. It combines:
+
+  * a requests-per-minute and a tokens-per-minute token bucket, charged
+    with an estimate of each request's prompt plus completion budget;
+  * AIMD adaptive concurrency: the in-flight limit grows by about one per
+    round trip while responses are healthy, and halves on a 429 or when
+    latency rises well above the recent baseline for the same endpoint and
+    model. A 429's retry-after
+    also pauses every caller, not just the one that was throttled.
+
+Enable it with environment variables (unset = no limiter, plain pooled clients;
+LLM_SINGLE_FLIGHT=1 additionally coalesces identical in-flight requests, and
+LLM_HEDGE=95 hedges calls slower than the recent p95, see hedging.py):
+    LLM_RPM=500 LLM_TPM=90000 LLM_MAX_CONCURRENCY=32 python api_call.py --batch prompts.jsonl
+
+Usage:
+    python rate_limiter.py bench --rpm-limit 600 --tpm-limit 60000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+
+from hedging import AsyncHedgingTransport, Hedger, HedgingTransport, request_key
+from single_flight import AsyncSingleFlightTransport, SingleFlight, SingleFlightTransport
+
+# Completion tokens reserved for a chat request that sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+
+
+def estimate_request_tokens(request, completion_tokens=DEFAULT_COMPLETION_TOKENS):
+    """Prompt tokens (about four characters per token) plus the completion budget."""
+    try:
+        payload = json.loads(request.content or b"{}")
+    except ValueError:
+        return 1
+    if "messages" in payload:
+        prompt = sum(len(json.dumps(m.get("content") or "")) // 4 for m in payload["messages"])
+        budget = payload.get("max_completion_tokens") or payload.get("max_tokens") or completion_tokens
+        return prompt + budget
+    inputs = payload.get("input", [])
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    return max(1, sum(len(item) if isinstance(item, list) else len(item) // 4 for item in inputs))
+
+
+class TokenBucket:
+    """Refills at `per_minute` / 60 per second up to `burst_s` seconds of quota.
+
+    A request larger than the whole bucket is admitted once the bucket is
+    full and charged in full, leaving it in debt: later requests wait until
+    the debt is repaid, so the long-run rate never exceeds `per_minute`.
+    """
+
+    def __init__(self, per_minute, burst_s=1.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_s)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def shortfall(self, amount, now):
+        """Seconds until `amount` can be taken (0.0 if it can now)."""
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, min(amount, self.capacity) - self.available) / self.rate
+
+    def take(self, amount):
+        self.available -= amount
+
+
+class _ThreadWaiter:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+class AdaptiveLimiter:
+    """RPM/TPM token buckets plus AIMD concurrency, safe for threads and asyncio.
+
+    Callers are admitted in arrival order: only the head of the queue may take
+    a slot, and it is woken when a slot is released or the quota refills.
+    Latency is tracked per endpoint and model (see request_key), each against
+    its own baseline, which drifts up by `baseline_decay` of the gap per
+    response so that one unusually fast call does not pin it forever.
+    """
+
+    def __init__(self, rpm=None, tpm=None, initial_concurrency=4, min_concurrency=1,
+                 max_concurrency=64, latency_tolerance=2.0, burst_s=1.0, baseline_decay=0.02):
+        self.rpm = TokenBucket(rpm, burst_s) if rpm else None
+        self.tpm = TokenBucket(tpm, burst_s) if tpm else None
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.baseline_decay = baseline_decay
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency = {}  # request key -> [latency EWMA, baseline]
+        self.last_decrease = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.decreases = 0
+        self.wait_s = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """Limiter configured by LLM_RPM / LLM_TPM / LLM_MAX_CONCURRENCY, or None if none is set."""
+        rpm, tpm, cap = (os.environ.get(k) for k in ("LLM_RPM", "LLM_TPM", "LLM_MAX_CONCURRENCY"))
+        if not (rpm or tpm or cap):
+            return None
+        return cls(rpm=float(rpm) if rpm else None, tpm=float(tpm) if tpm else None,
+                   max_concurrency=int(cap) if cap else 64)
+
+    def _wake_head(self):
+        if self._queue:
+            self._queue[0].wake()
+
+    def _try_acquire(self, tokens, waiter):
+        """Under the lock: take a slot and the bucket quota (0.0), or how long to wait (None = until woken)."""
+        if self._queue[0] is not waiter or self.in_flight >= int(self.limit):
+            return None
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        wait = max(self.rpm.shortfall(1, now) if self.rpm else 0.0,
+                   self.tpm.shortfall(tokens, now) if self.tpm else 0.0)
+        if wait:
+            return wait
+        if self.rpm:
+            self.rpm.take(1)
+        if self.tpm:
+            self.tpm.take(tokens)
+        self.in_flight += 1
+        self.requests += 1
+        self._queue.popleft()
+        self._wake_head()
+        return 0.0
+
+    def _join(self, waiter):
+        with self._lock:
+            self._queue.append(waiter)
+
+    def _attempt(self, tokens, waiter):
+        with self._lock:
+            waiter.event.clear()
+            return self._try_acquire(tokens, waiter)
+
+    def _leave(self, waiter):
+        """Drop a waiter that gave up (e.g. was cancelled) without a slot."""
+        with self._lock:
+            if waiter in self._queue:
+                head = self._queue[0] is waiter
+                self._queue.remove(waiter)
+                if head:
+                    self._wake_head()
+
+    def acquire(self, tokens=1):
+        started = time.perf_counter()
+        waiter = _ThreadWaiter()
+        self._join(waiter)
+        try:
+            while (wait := self._attempt(tokens, waiter)) != 0.0:
+                waiter.event.wait(wait)
+        finally:
+            self._leave(waiter)
+        self._waited(started)
+
+    async def aacquire(self, tokens=1):
+        started = time.perf_counter()
+        waiter = _AsyncWaiter()
+        self._join(waiter)
+        try:
+            while (wait := self._attempt(tokens, waiter)) != 0.0:
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._leave(waiter)
+        self._waited(started)
+
+    def _waited(self, started):
+        with self._lock:
+            self.wait_s += time.perf_counter() - started
+
+    def observe(self, status, latency_s, retry_after_s=None, key=""):
+        """Feed back a response for request class `key`: adjust the concurrency limit (AIMD)."""
+        now = time.monotonic()
+        with self._lock:
+            stats = self.latency.get(key)
+            if status == 429:
+                self.throttled += 1
+                if retry_after_s:
+                    self.paused_until = max(self.paused_until, now + retry_after_s)
+                self._decrease(now, stats[0] if stats else None)
+                return
+            if status >= 500:
+                return
+            if stats is None:
+                stats = self.latency[key] = [latency_s, latency_s]
+            else:
+                stats[0] = 0.8 * stats[0] + 0.2 * latency_s
+                stats[1] = min(stats[0], stats[1] + (stats[0] - stats[1]) * self.baseline_decay)
+            if stats[0] > stats[1] * self.latency_tolerance:
+                self._decrease(now, stats[0])
+            else:
+                # Additive increase: about +1 per limit's worth of healthy responses
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+                self._wake_head()
+
+    def _decrease(self, now, round_trip_s):
+        # At most once per round trip, so one burst of 429s counts as one signal
+        if now - self.last_decrease < (round_trip_s or 0.1):
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit / 2.0)
+        self.decreases += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_head()
+
+    def stats(self):
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "decreases": self.decreases,
+            "latency_ewma_ms": {key: round(ewma * 1000.0, 2) for key, (ewma, _) in self.latency.items()},
+            "wait_s": round(self.wait_s, 3),
+        }
+
+
+# ============================================================================
+# HTTPX TRANSPORTS
+# ============================================================================
+# The slot is held until the response body has been read or closed, so a
+# streamed completion counts as in flight for its whole duration.
+
+def _retry_after(response):
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000.0
+        return float(response.headers.get("retry-after", 0))
+    except ValueError:
+        return None
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.release()
+
+
+def _once(release):
+    lock = threading.Lock()
+    done = []
+
+    def run():
+        with lock:
+            if done:
+                return
+            done.append(True)
+        release()
+    return run
+
+
+class LimitedTransport(httpx.BaseTransport):
+    def __init__(self, limiter, transport):
+        self.limiter = limiter
+        self.transport = transport
+
+    def handle_request(self, request):
+        self.limiter.acquire(estimate_request_tokens(request))
+        release = _once(self.limiter.release)
+        started = time.perf_counter()
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        self.limiter.observe(response.status_code, time.perf_counter() - started, _retry_after(response),
+                             request_key(request))
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, limiter, transport):
+        self.limiter = limiter
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        await self.limiter.aacquire(estimate_request_tokens(request))
+        release = _once(self.limiter.release)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        self.limiter.observe(response.status_code, time.perf_counter() - started, _retry_after(response),
+                             request_key(request))
+        response.stream = _AsyncReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def http_clients(limiter=None, max_connections=64, single_flight=None, hedger=None):
+    """(httpx.Client, httpx.AsyncClient) sharing one connection limit.
+
+    Optionally rate limited by `limiter`, with slow requests hedged by a
+    hedging.Hedger `hedger` (hedges are rate limited too), and identical
+    in-flight requests coalesced in front of both by a
+    single_flight.SingleFlight `single_flight`.
+    """
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+    def limited(transport, limited_class):
+        return transport if limiter is None else limited_class(limiter, transport)
+
+    transport = limited(httpx.HTTPTransport(limits=limits), LimitedTransport)
+    async_transport = limited(httpx.AsyncHTTPTransport(limits=limits), AsyncLimitedTransport)
+    if hedger is not None:
+        # Sync hedged calls run on the hedger's own loop, with their own async pool
+        loop_transport = limited(httpx.AsyncHTTPTransport(limits=limits), AsyncLimitedTransport)
+        transport = HedgingTransport(hedger, loop_transport, transport)
+        async_transport = AsyncHedgingTransport(hedger, async_transport)
+    if single_flight is not None:
+        transport = SingleFlightTransport(single_flight, transport)
+        async_transport = AsyncSingleFlightTransport(single_flight, async_transport)
+    return httpx.Client(transport=transport), httpx.AsyncClient(transport=async_transport)
+
+
+# The process-wide limiter, coalescing group, hedger and clients every example shares
+shared_limiter = AdaptiveLimiter.from_env()
+single_flight = SingleFlight() if os.environ.get("LLM_SINGLE_FLIGHT") == "1" else None
+hedger = Hedger.from_env()
+http_client, http_async_client = http_clients(
+    shared_limiter, int(os.environ.get("LLM_HTTP_CONNECTIONS", "64")), single_flight, hedger)
+
+
+# ============================================================================
+# BENCHMARK AGAINST A RATE-LIMITED STAND-IN
+# ============================================================================
+
+def run_bench(args):
+    from langchain_openai import ChatOpenAI
+
+    from stats import run_load, summarize_latencies
+    from stub_server import StubConfig, serve_in_background
+
+    print(f"Stand-in limits: {args.rpm_limit} RPM, {args.tpm_limit} TPM, capacity {args.capacity}; "
+          f"{args.requests} requests from {args.concurrency} threads\n")
+    print(f"{'client':<14} {'ok':>5} {'failed':>7} {'429s':>6} {'QPS':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    print("-" * 60)
+    prompt = "Classify the sentiment of: the service was quick and friendly."
+    for label, limiter in (
+        ("unlimited", None),
+        # Configured just under the server's limits, the way it would be in production
+        ("limited", AdaptiveLimiter(rpm=args.rpm_limit * 0.95, tpm=args.tpm_limit * 0.95,
+                                    max_concurrency=args.concurrency)),
+    ):
+        server = serve_in_background(config=StubConfig(
+            latency_ms=args.latency_ms, seed=0, rpm_limit=args.rpm_limit, tpm_limit=args.tpm_limit,
+            capacity=args.capacity))
+        client, async_client = http_clients(limiter)
+        llm = ChatOpenAI(model="gpt-4-turbo-preview", base_url=server.base_url, api_key="stub",
+                         http_client=client, http_async_client=async_client, max_tokens=64)
+        latencies, errors, wall, _ = run_load(lambda: llm.invoke(prompt), args.concurrency, args.requests)
+        summary = summarize_latencies(latencies)
+        print(f"{label:<14} {len(latencies):>5} {len(errors):>7} {server.config.throttled:>6} "
+              f"{len(latencies) / wall:>7.1f} {summary['p50_ms']:>8.1f} {summary['p99_ms']:>8.1f}")
+        if limiter:
+            print(f"\nLimiter: {limiter.stats()}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adaptive rate limiting for LLM calls")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("bench", help="unlimited vs limited client against a throttling stand-in")
+    bench.add_argument("--rpm-limit", type=float, default=600)
+    bench.add_argument("--tpm-limit", type=float, default=60000)
+    bench.add_argument("--capacity", type=int, default=8, help="stand-in requests in flight before it slows")
+    bench.add_argument("--latency-ms", type=float, default=50.0)
+    bench.add_argument("--concurrency", type=int, default=32)
+    bench.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    run_bench(args)
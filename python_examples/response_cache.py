@@ -0,0 +1,91 @@
+"""
+Persistent Exact-Match LLM Response Cache
+Author: Optimum AI Lab
+Description: A LangChain cache (BaseCache) for ChatOpenAI stored in a local
+SQLite file in WAL mode. LangChain calls it with the serialized messages and
+an "llm string" that holds the model name, every model parameter and the
+call's keyword arguments, which include the tools bound with bind_tools. The
+cache key is the SHA-256 of both, so a hit means the model, parameters,
+messages and tool schemas were all identical. Entries expire after a TTL, the
+least recently used ones are evicted once the stored generations exceed a
+size bound (sqlite_lru), and hit/miss counters are kept per process.
+
+Enable it for the examples with an environment variable:
+    LLM_CACHE=llm_cache.sqlite3 LLM_CACHE_TTL=86400 LLM_CACHE_MAX_MB=512 python mcp_tool_call.py
+
+Usage:
+    llm = ChatOpenAI(model="gpt-4-turbo-preview", cache=ResponseCache("llm_cache.sqlite3"))
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+
+from sqlite_lru import SQLiteLRU
+
+
+def cache_key(prompt, llm_string):
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache(SQLiteLRU, BaseCache):
+    """SQLite-backed (llm string, messages) -> chat generations cache with TTL and LRU eviction by size."""
+
+    def __init__(self, path, ttl_seconds=None, max_bytes=256 * 2**20, max_entries=None):
+        super().__init__(path, "responses", ["key TEXT", "generations TEXT NOT NULL", "created REAL NOT NULL"],
+                         ["key"], max_entries=max_entries, max_bytes=max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls):
+        """Cache at $LLM_CACHE (TTL from $LLM_CACHE_TTL seconds, size from $LLM_CACHE_MAX_MB), or None if unset."""
+        path = os.environ.get("LLM_CACHE")
+        if not path:
+            return None
+        ttl = os.environ.get("LLM_CACHE_TTL")
+        max_mb = os.environ.get("LLM_CACHE_MAX_MB")
+        return cls(path, ttl_seconds=float(ttl) if ttl else None,
+                   max_bytes=int(float(max_mb) * 2**20) if max_mb else 256 * 2**20)
+
+    def lookup(self, prompt, llm_string):
+        key = cache_key(prompt, llm_string)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT generations, created, size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+                self._discard((key,), row[2])
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._touch([(key,)])
+            self.hits += 1
+        return [
+            ChatGeneration(message=messages_from_dict([g["message"]])[0], generation_info=g["info"])
+            for g in json.loads(row[0])
+        ]
+
+    def update(self, prompt, llm_string, return_val):
+        generations = json.dumps([
+            {"message": message_to_dict(g.message), "info": g.generation_info} for g in return_val
+        ])
+        with self._lock, self._conn:
+            self._store([((cache_key(prompt, llm_string), generations, time.time()),
+                          len(generations.encode("utf-8")))])
+
+    def clear(self, **kwargs):
+        super().clear()
+
+    def stats(self):
+        return dict(super().stats(), expirations=self.expirations)
+
+
+# The process-wide response cache every example shares (None unless LLM_CACHE is set)
+response_cache = ResponseCache.from_env()
@@ -0,0 +1,202 @@
+"""
+Semantic Answer Cache for the RAG Chain
+Author: Optimum AI Lab
+Description: Returns a previously generated answer when a new question is
+close enough (cosine similarity above a threshold) to one already answered,
+skipping retrieval and generation entirely. Questions are embedded and kept
+in a small in-memory matrix that is searched with one matrix-vector product.
+Entries expire after a TTL, the least recently used entry is replaced when the
+cache is full, and everything is dropped when the underlying vector store
+changes. An answer is only stored if the source data is still at the version
+it was looked up against, so an answer computed from the old data cannot
+survive the invalidation. Hit-rate metrics are available from stats(). On a miss, the question
+vector stays available to the wrapped runnable through query_vector(), so the
+retriever can search with it instead of embedding the question again.
+Questions a `bypass` predicate selects (e.g. ones the hybrid retriever answers
+from BM25 alone) skip the cache, so they are never embedded.
+
+Usage:
+    cache = SemanticCache(get_embeddings, version=vectorstore_version, threshold=0.95)
+    cached_chain = cache.wrap(chain)
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+
+import numpy as np
+from langchain_core.runnables import RunnableLambda
+
+# (question, vector) of the cache miss being answered in this context
+_query_vector = contextvars.ContextVar("semantic_cache_query_vector", default=None)
+
+
+def query_vector(question):
+    """The vector the enclosing cache lookup computed for `question`, or None."""
+    current = _query_vector.get()
+    return current[1] if current is not None and current[0] == question else None
+
+
+class SemanticCache:
+    """Similarity-keyed question -> answer cache with TTL, LRU and invalidation.
+
+    `get_embeddings` is a zero-argument callable returning the Embeddings used
+    for questions; it is only called on first use. `version` is an optional
+    zero-argument callable whose return value changes whenever the source
+    data changes; a change clears the cache.
+    """
+
+    def __init__(self, get_embeddings, version=None, threshold=0.95, ttl_seconds=3600.0,
+                 max_entries=1024):
+        self.get_embeddings = get_embeddings
+        self.version = version
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors = None  # (max_entries, dim) float32, allocated on first store
+        self._questions = [None] * max_entries
+        self._answers = [None] * max_entries
+        self._created = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._seen_version = None
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_stores = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        """Clear the cache if the source data changed; return the current version."""
+        if self.version is None:
+            return None
+        current = self.version()
+        if current != self._seen_version:
+            if self._live.any():
+                self.invalidations += 1
+            self._live[:] = False
+            self._seen_version = current
+        return current
+
+    def clear(self):
+        with self._lock:
+            self._live[:] = False
+
+    def lookup(self, vector):
+        """Return (answer, similarity, version) for the closest live entry, or (None, best, version).
+
+        `version` is the source data version the lookup saw; pass it to store().
+        """
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            version = self._check_version()
+            if self._vectors is None or not self._live.any():
+                self.misses += 1
+                return None, 0.0, version
+            expired = self._live & (now - self._created > self.ttl_seconds)
+            if expired.any():
+                self.expirations += int(expired.sum())
+                self._live &= ~expired
+            scores = self._vectors @ query
+            scores[~self._live] = -np.inf
+            slot = int(np.argmax(scores))
+            best = float(scores[slot])
+            if best < self.threshold:
+                self.misses += 1
+                return None, max(best, 0.0), version
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._answers[slot], best, version
+
+    def store(self, vector, question, answer, version=None):
+        """Cache `answer`, unless the source data changed since the lookup that returned `version`."""
+        vector = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            current = self._check_version()
+            if version is not None and current != version:
+                self.stale_stores += 1
+                return
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            free = np.flatnonzero(~self._live)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._questions[slot] = question
+            self._answers[slot] = answer
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._live[slot] = True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": int(self._live.sum()),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_stores": self.stale_stores,
+            "bypassed": self.bypassed,
+        }
+
+    def _bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def wrap(self, runnable, bypass=None):
+        """Wrap a question -> answer runnable with this cache.
+
+        Questions for which `bypass(question)` is true go straight to
+        `runnable`, without being embedded, looked up or stored.
+        """
+        def invoke(question):
+            if bypass is not None and bypass(question):
+                self._bypass()
+                return runnable.invoke(question)
+            vector = self.get_embeddings().embed_query(question)
+            answer, _, version = self.lookup(vector)
+            if answer is None:
+                token = _query_vector.set((question, vector))
+                try:
+                    answer = runnable.invoke(question)
+                finally:
+                    _query_vector.reset(token)
+                self.store(vector, question, answer, version)
+            return answer
+
+        async def ainvoke(question):
+            if bypass is not None and await asyncio.to_thread(bypass, question):
+                self._bypass()
+                return await runnable.ainvoke(question)
+            vector = await self.get_embeddings().aembed_query(question)
+            answer, _, version = self.lookup(vector)
+            if answer is None:
+                token = _query_vector.set((question, vector))
+                try:
+                    answer = await runnable.ainvoke(question)
+                finally:
+                    _query_vector.reset(token)
+                self.store(vector, question, answer, version)
+            return answer
+
+        return RunnableLambda(invoke, afunc=ainvoke)
@@ -0,0 +1,242 @@
+"""
+Sharded Multi-Process Retrieval
+Author: Optimum AI Lab
+Description: A single FAISS search in rag_query.py runs on one core of one
+Python process. Here the vector store is split into N shards, each written in
+the compact layout (see compact_store.py) and served by its own worker
+process that memory-maps it. A query is scattered to every shard, each shard
+returns its local top-k, and the partial lists are merged into the global
+top-k. With exact (flat) shards the merged result is identical to searching
+the whole index. The bench subcommand measures throughput and latency as the
+shard count grows.
+
+Layout of a shard directory:
+    shards.json        shard count, row offsets, document count
+    shard0/ ... shardN-1/   compact index directories
+
+Usage:
+    python sharded_retriever.py split --index-dir faiss_index --shards 4
+    RAG_RETRIEVER=sharded python rag_query.py --question "..."
+    python sharded_retriever.py bench --docs 200000 --dim 768 --shards 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import ann_index
+import compact_store
+from stats import run_load, summarize_latencies
+
+
+def write_shards(vectors, documents, directory, shards, vector_format="fp32"):
+    """Split vectors (in row order) and their documents into `shards` contiguous ranges."""
+    if not 0 < shards <= len(vectors):
+        raise ValueError(f"cannot split {len(vectors)} vectors into {shards} shards")
+    directory = Path(directory)
+    documents = list(documents)
+    bounds = np.linspace(0, len(vectors), shards + 1).astype(int)
+    for i, (start, stop) in enumerate(zip(bounds, bounds[1:])):
+        compact_store.save_compact(directory / f"shard{i}", vectors[start:stop],
+                                   documents[start:stop], vector_format)
+    manifest = {"shards": shards, "offsets": bounds[:-1].tolist(), "documents": len(vectors),
+                "vectors": vector_format}
+    (directory / "shards.json").write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return manifest
+
+
+def split_vectorstore(vectorstore, directory, shards, vector_format="fp32"):
+    index = vectorstore.index
+    mapping = vectorstore.index_to_docstore_id
+    documents = (vectorstore.docstore.search(mapping[i]) for i in range(index.ntotal))
+    return write_shards(ann_index.reconstruct_all(index), documents, directory, shards, vector_format)
+
+
+# ============================================================================
+# SHARD WORKERS
+# ============================================================================
+# These run inside the worker processes. Each worker holds exactly one shard.
+
+_shard = None  # (index, docstore, row offset) of this worker's shard
+
+
+def _load_shard(directory, offset):
+    global _shard
+    # One core per shard: the parallelism comes from the processes
+    faiss.omp_set_num_threads(1)
+    index, docstore, _ = compact_store.load_compact(directory, compact_store.MMAP_FLAGS)
+    _shard = (index, docstore, offset)
+
+
+def _search_shard(queries, k):
+    """Local top-k per query as sorted (distance, global row, text, metadata) tuples."""
+    index, docstore, offset = _shard
+    distances, positions = index.search(queries, k)
+    results = []
+    for row_distances, row_positions in zip(distances, positions):
+        hits = []
+        for distance, position in zip(row_distances, row_positions):
+            if position >= 0:
+                document = docstore.search(int(position))
+                hits.append((float(distance), offset + int(position), document.page_content, document.metadata))
+        results.append(hits)
+    return results
+
+
+def merge_top_k(partials, k):
+    """Merge per-shard result lists (each sorted by L2 distance) into global top-k lists."""
+    merged = []
+    for per_query in zip(*partials):
+        merged.append(list(itertools.islice(heapq.merge(*per_query), k)))
+    return merged
+
+
+def to_documents(hits):
+    return [Document(id=str(row), page_content=text, metadata=metadata) for _, row, text, metadata in hits]
+
+
+class ShardedIndex:
+    """Scatter/gather search over one worker process per shard."""
+
+    def __init__(self, directory):
+        directory = Path(directory)
+        self.manifest = json.loads((directory / "shards.json").read_text(encoding="utf-8"))
+        # spawn, not fork: forking after FAISS has used OpenMP can deadlock the child
+        context = multiprocessing.get_context("spawn")
+        self.pools = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_load_shard,
+                                initargs=(str(directory / f"shard{i}"), offset))
+            for i, offset in enumerate(self.manifest["offsets"])
+        ]
+        self.queries = 0
+
+    def _scatter(self, queries, k):
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        self.queries += len(queries)
+        return [pool.submit(_search_shard, queries, k) for pool in self.pools]
+
+    def search_batch(self, vectors, k=4):
+        partials = [future.result() for future in self._scatter(vectors, k)]
+        return [to_documents(hits) for hits in merge_top_k(partials, k)]
+
+    def search(self, vector, k=4):
+        return self.search_batch([vector], k)[0]
+
+    async def asearch(self, vector, k=4):
+        futures = self._scatter([vector], k)
+        partials = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+        return to_documents(merge_top_k(partials, k)[0])
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown()
+
+    def stats(self):
+        return {"shards": len(self.pools), "documents": self.manifest["documents"], "queries": self.queries}
+
+
+class ShardedRetriever(BaseRetriever):
+    """LangChain retriever over a ShardedIndex."""
+
+    index: object
+    embeddings: object
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.index.search(self.embeddings.embed_query(query), self.k)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        return await self.index.asearch(await self.embeddings.aembed_query(query), self.k)
+
+    def search_by_vector(self, query, vector):
+        """Retrieve with `vector`, the query embedding computed elsewhere."""
+        return self.index.search(vector, self.k)
+
+
+# ============================================================================
+# THROUGHPUT / LATENCY vs SHARD COUNT
+# ============================================================================
+
+def run_bench(args):
+    vectors = ann_index.synthetic_vectors(args.docs, args.dim)
+    documents = list(compact_store.synthetic_documents(args.docs, words_per_doc=20))
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), 256, replace=False)]
+    counter = itertools.count()
+
+    def next_query():
+        return queries[next(counter) % len(queries)]
+
+    print(f"{args.docs} documents, {args.dim}-dim vectors, k={args.k}, "
+          f"concurrency={args.concurrency}, {os.cpu_count()} CPUs\n")
+    print(f"{'shards':<14} {'QPS':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    print("-" * 50)
+
+    def report(label, latencies, wall):
+        summary = summarize_latencies(latencies)
+        print(f"{label:<14} {len(latencies) / wall:>8.1f} {summary['p50_ms']:>8.2f} "
+              f"{summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Baseline: the whole index searched in this process on one core
+        write_shards(vectors, documents, Path(tmp) / "single", 1)
+        _load_shard(str(Path(tmp) / "single" / "shard0"), 0)
+        latencies, _, wall, _ = run_load(lambda: _search_shard(next_query()[None, :], args.k),
+                                         args.concurrency, args.requests, args.warmup)
+        report("in-process", latencies, wall)
+
+        for shards in args.shards:
+            directory = Path(tmp) / f"s{shards}"
+            write_shards(vectors, documents, directory, shards)
+            index = ShardedIndex(directory)
+            try:
+                latencies, errors, wall, _ = run_load(lambda: index.search(next_query(), args.k),
+                                                      args.concurrency, args.requests, args.warmup)
+            finally:
+                index.close()
+            if errors:
+                print(f"{shards:<14} failed: {errors[0]}")
+                continue
+            report(str(shards), latencies, wall)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded multi-process retrieval")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    split = commands.add_parser("split", help="split a saved index into per-process shards")
+    split.add_argument("--index-dir", default=None, help="saved vector store (default: rag_query's)")
+    split.add_argument("--out", default=None, help="shard directory (default: <index-dir>/shards)")
+    split.add_argument("--shards", type=int, default=os.cpu_count())
+    split.add_argument("--vectors", choices=compact_store.VECTOR_FORMATS, default="fp32")
+
+    bench = commands.add_parser("bench", help="throughput and latency vs shard count")
+    bench.add_argument("--docs", type=int, default=200000)
+    bench.add_argument("--dim", type=int, default=768)
+    bench.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    bench.add_argument("--concurrency", type=int, default=8)
+    bench.add_argument("--requests", type=int, default=2000)
+    bench.add_argument("--warmup", type=int, default=20)
+    bench.add_argument("-k", type=int, default=4)
+
+    args = parser.parse_args()
+    if args.command == "split":
+        import rag_query
+        index_dir = Path(args.index_dir) if args.index_dir else rag_query.INDEX_DIR
+        out = Path(args.out) if args.out else index_dir / "shards"
+        manifest = split_vectorstore(rag_query.load_vectorstore(index_dir), out, args.shards, args.vectors)
+        print(f"Split {manifest['documents']} documents into {manifest['shards']} shards in {out}")
+    else:
+        run_bench(args)
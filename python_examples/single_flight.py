@@ -0,0 +1,146 @@
+"""
+In-Flight Request Coalescing (Single-Flight) for LLM and Embedding Calls
+Author: Optimum AI Lab
+Description: When identical requests are already in flight, such as many
+users embedding the same query during a traffic spike, only the first one
+(the leader) goes upstream; the others wait for it and receive a copy of the
+same response. Requests are identical when they are POSTs to the same URL
+with byte-identical JSON bodies, which covers the model, parameters,
+messages, tools and input texts. Streaming requests are never coalesced.
+
+This is a transport layer inside the shared HTTP clients (see
+rate_limiter.py), so it sits in front of both ChatOpenAI and
+OpenAIEmbeddings, and coalesced requests do not use rate-limit quota.
+Enable it with LLM_SINGLE_FLIGHT=1.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+
+import httpx
+
+
+class SingleFlight:
+    """Coalescing key and counters shared by the sync and async transports."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.upstream = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(request):
+        """(url, body hash) for coalescable requests, else None."""
+        if request.method != "POST":
+            return None
+        body = request.content
+        try:
+            if json.loads(body or b"{}").get("stream"):
+                return None
+        except (ValueError, AttributeError):
+            return None
+        return str(request.url), hashlib.sha256(body).hexdigest()
+
+    def count(self, leader):
+        with self._lock:
+            self.requests += 1
+            if leader:
+                self.upstream += 1
+            else:
+                self.coalesced += 1
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "upstream": self.upstream,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+def _copy(request, result):
+    status, headers, raw, extensions = result
+    return httpx.Response(status, headers=headers, stream=httpx.ByteStream(raw),
+                          extensions=extensions, request=request)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightTransport(httpx.BaseTransport):
+    def __init__(self, group, transport):
+        self.group = group
+        self.transport = transport
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def handle_request(self, request):
+        key = self.group.key(request)
+        if key is None:
+            return self.transport.handle_request(request)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self.group.count(leader)
+        if leader:
+            try:
+                response = self.transport.handle_request(request)
+                try:
+                    raw = b"".join(response.iter_raw())
+                finally:
+                    response.close()
+                call.result = (response.status_code, response.headers, raw, response.extensions)
+            except Exception as exc:
+                call.error = exc
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return _copy(request, call.result)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncSingleFlightTransport(httpx.AsyncBaseTransport):
+    def __init__(self, group, transport):
+        self.group = group
+        self.transport = transport
+        self._calls = {}
+
+    async def _fetch(self, request):
+        response = await self.transport.handle_async_request(request)
+        try:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+        return response.status_code, response.headers, raw, response.extensions
+
+    async def handle_async_request(self, request):
+        key = self.group.key(request)
+        if key is None:
+            return await self.transport.handle_async_request(request)
+        task = self._calls.get(key)
+        leader = task is None
+        if leader:
+            # A task of its own, so a cancelled leader does not fail the followers
+            task = self._calls[key] = asyncio.ensure_future(self._fetch(request))
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        self.group.count(leader)
+        return _copy(request, await asyncio.shield(task))
+
+    async def aclose(self):
+        await self.transport.aclose()
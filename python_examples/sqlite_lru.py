@@ -0,0 +1,145 @@
+"""
+SQLite LRU Store
+Author: Optimum AI Lab
+Description: The storage under the persistent caches (embedding_cache and
+response_cache). It is one SQLite table in WAL mode whose rows carry their
+payload size and a use counter. The entry count and byte total are read once
+when the file is opened and kept up to date on every write, so bounding the
+cache needs no COUNT(*) scan. Beyond `max_entries` or `max_bytes` the least
+recently used rows are deleted. Writes by another process to the same file
+are counted when the file is next opened.
+"""
+
+import sqlite3
+import threading
+
+# Rows fetched per round while evicting
+_EVICT_BATCH = 256
+
+
+class SQLiteLRU:
+    """A SQLite table bounded by entry count and/or payload bytes, evicting least recently used rows.
+
+    `columns` are the "name TYPE" definitions of the key and payload columns
+    and `key` names the key columns among them. Subclasses read with
+    self._conn, then call _touch, _store and _discard while holding
+    `with self._lock, self._conn:`.
+    """
+
+    def __init__(self, path, table, columns, key, max_entries=None, max_bytes=None):
+        self.path = str(path)
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._names = [column.split()[0] for column in columns]
+        self._key_index = [self._names.index(name) for name in key]
+        self._key_where = " AND ".join(f"{name} = ?" for name in key)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        existing = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+        missing = [name for name in (*self._names, "size", "last_used") if name not in existing]
+        if existing and missing:
+            self._conn.close()
+            raise ValueError(
+                f"table {table!r} in {self.path} is not a cache table of this version "
+                f"(missing columns: {', '.join(missing)}); delete the file or use another path"
+            )
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            f" {', '.join(columns)},"
+            " size INTEGER NOT NULL,"
+            " last_used INTEGER NOT NULL,"
+            f" PRIMARY KEY ({', '.join(key)}))"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table} (last_used)")
+        self._conn.commit()
+        self._count, self._bytes, self._clock = self._conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM {table}").fetchone()
+
+    def _tick(self):
+        # Monotonic use counter rather than wall-clock time, so ties cannot occur
+        self._clock += 1
+        return self._clock
+
+    def _touch(self, keys):
+        """Mark the rows with these key tuples as just used."""
+        tick = self._tick()
+        self._conn.executemany(
+            f"UPDATE {self.table} SET last_used = ? WHERE {self._key_where}",
+            [(tick, *key) for key in keys],
+        )
+
+    def _store(self, rows):
+        """Insert or replace (column values, payload size) rows, then evict down to the bounds."""
+        tick = self._tick()
+        insert = (f"INSERT OR REPLACE INTO {self.table} ({', '.join(self._names)}, size, last_used) "
+                  f"VALUES ({', '.join('?' * (len(self._names) + 2))})")
+        for values, size in rows:
+            old = self._conn.execute(
+                f"SELECT size FROM {self.table} WHERE {self._key_where}",
+                [values[i] for i in self._key_index],
+            ).fetchone()
+            if old is None:
+                self._count += 1
+            else:
+                self._bytes -= old[0]
+            self._bytes += size
+            self._conn.execute(insert, (*values, size, tick))
+        self._evict()
+
+    def _discard(self, key, size):
+        """Delete one row whose size the caller has just read."""
+        self._conn.execute(f"DELETE FROM {self.table} WHERE {self._key_where}", key)
+        self._count -= 1
+        self._bytes -= size
+
+    def _over(self):
+        return ((self.max_entries is not None and self._count > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes))
+
+    def _evict(self):
+        while self._over():
+            victims = self._conn.execute(
+                f"SELECT rowid, size FROM {self.table} ORDER BY last_used LIMIT ?", (_EVICT_BATCH,)).fetchall()
+            if not victims:
+                self._count = self._bytes = 0
+                return
+            doomed = []
+            for rowid, size in victims:
+                if not self._over():
+                    break
+                doomed.append((rowid,))
+                self._count -= 1
+                self._bytes -= size
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE rowid = ?", doomed)
+            self.evictions += len(doomed)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._count = self._bytes = 0
+
+    def __len__(self):
+        return self._count
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
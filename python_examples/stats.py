@@ -0,0 +1,68 @@
+"""
+Latency Statistics and Load Generation
+Author: Optimum AI Lab
+Description: The percentile and closed-loop load helpers shared by
+benchmark.py and the examples' own bench subcommands, kept apart from the
+benchmark CLI so library modules can import them without it.
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize_latencies(latencies_s):
+    """p50/p95/p99 (and mean) in milliseconds for a list of latencies in seconds."""
+    ordered = sorted(latencies_s)
+    summary = {f"p{p}_ms": round(percentile(ordered, p) * 1000.0, 2) for p in (50, 95, 99)}
+    summary["mean_ms"] = round(sum(ordered) / len(ordered) * 1000.0, 2) if ordered else 0.0
+    return summary
+
+
+def run_load(call, concurrency, total_requests, warmup=0):
+    """Closed-loop load: `concurrency` workers issue `total_requests` calls.
+
+    Returns (latencies in seconds, errors, wall-clock seconds, timings), where
+    timings collects any dicts the call returned (e.g. streaming TTFT).
+    """
+    for _ in range(warmup):
+        call()
+
+    remaining = itertools.count()
+    latencies = []
+    errors = []
+    timings = []
+    lock = threading.Lock()
+
+    def worker():
+        while next(remaining) < total_requests:
+            start = time.perf_counter()
+            try:
+                value = call()
+            except Exception as exc:  # keep going, but count it
+                with lock:
+                    errors.append(repr(exc))
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if isinstance(value, dict):
+                    timings.append(value)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    return latencies, errors, wall, timings
@@ -0,0 +1,92 @@
+"""
+Token Streaming with Latency Measurement
+Author: Optimum AI Lab
+Description: Helpers the examples use to stream a runnable's output token by
+token while timing it. For chat UX the number that matters is time to first
+token (TTFT), followed by the gap between tokens (inter-token latency, ITL);
+total time is what a blocking invoke() would have cost.
+"""
+
+import time
+
+from stats import percentile
+
+
+def _ms(seconds):
+    return round(seconds * 1000.0, 2)
+
+
+def chunk_text(chunk):
+    """Visible text of a streamed chunk (plain string or message chunk)."""
+    if isinstance(chunk, str):
+        return chunk
+    text = chunk.content if isinstance(getattr(chunk, "content", None), str) else ""
+    # Tool-calling turns stream their arguments instead of content
+    for tool_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+        text += (tool_chunk.get("name") or "") + (tool_chunk.get("args") or "")
+    return text
+
+
+class StreamTimer:
+    """Records the arrival time of every non-empty token."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.arrivals = []
+
+    def token(self):
+        self.arrivals.append(time.perf_counter())
+
+    def summary(self):
+        finished = time.perf_counter()
+        gaps = sorted(b - a for a, b in zip(self.arrivals, self.arrivals[1:]))
+        return {
+            "ttft_ms": _ms(self.arrivals[0] - self.started) if self.arrivals else None,
+            "itl_mean_ms": _ms(sum(gaps) / len(gaps)) if gaps else 0.0,
+            "itl_p50_ms": _ms(percentile(gaps, 50)),
+            "itl_p95_ms": _ms(percentile(gaps, 95)),
+            "itl_gaps_ms": [_ms(gap) for gap in gaps],
+            "total_ms": _ms(finished - self.started),
+            "tokens": len(self.arrivals),
+        }
+
+
+def _accumulate(final, chunk):
+    return chunk if final is None else final + chunk
+
+
+def stream_with_timing(runnable, value, on_token=None):
+    """Stream `runnable` on `value`; return (accumulated output, timing summary)."""
+    timer = StreamTimer()
+    final = None
+    for chunk in runnable.stream(value):
+        text = chunk_text(chunk)
+        if text:
+            timer.token()
+            if on_token:
+                on_token(text)
+        final = _accumulate(final, chunk)
+    return final, timer.summary()
+
+
+async def astream_with_timing(runnable, value, on_token=None):
+    """Async counterpart of stream_with_timing."""
+    timer = StreamTimer()
+    final = None
+    async for chunk in runnable.astream(value):
+        text = chunk_text(chunk)
+        if text:
+            timer.token()
+            if on_token:
+                on_token(text)
+        final = _accumulate(final, chunk)
+    return final, timer.summary()
+
+
+def print_token(text):
+    print(text, end="", flush=True)
+
+
+def print_timing(timing):
+    print(f"\nTTFT: {timing['ttft_ms']} ms  ITL mean: {timing['itl_mean_ms']} ms  "
+          f"(p95 {timing['itl_p95_ms']} ms)  total: {timing['total_ms']} ms  tokens: {timing['tokens']}")
@@ -0,0 +1,427 @@
+"""
+Local OpenAI-Compatible Stand-In Server
+Author: Optimum AI Lab
+Description: A small, dependency-free HTTP server that speaks enough of the
+OpenAI REST API (chat completions, embeddings) for the Python examples to run
+against it. Responses are deterministic and latency is configurable, so load
+tests and benchmarks are reproducible without network access or API spend.
+
+Point the examples at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 OPENAI_API_KEY=stub python api_call.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_EMBEDDING_DIM = 256
+
+CANNED_ANSWER = (
+    "Optimum AI Lab builds autonomous AI agents for enterprise applications "
+    "and compares LLM frameworks for Python and Java."
+)
+
+# Keyword -> tool name used to fake a tool-choosing model
+TOOL_KEYWORDS = [
+    (("*", "times", "multiply", "product"), "multiply"),
+    (("+", "plus", "add", "sum"), "add"),
+    (("/", "divided", "divide", "quotient"), "divide"),
+    (("prime",), "count_primes"),
+    (("exchange", "currency"), "get_exchange_rate"),
+]
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def embed_text(text, dim=DEFAULT_EMBEDDING_DIM):
+    """Deterministic unit-length pseudo-embedding built from word hashes.
+
+    Texts that share words end up close together, which is enough for
+    retrieval to behave sensibly in tests and benchmarks.
+    """
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", str(text).lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] += sign
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _message_text(message):
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _choose_tool_call(question, tools):
+    """Pick a tool and its arguments from the question, like a model would.
+
+    Numeric parameters are filled from the numbers in the question and string
+    parameters from upper-case three-letter codes (e.g. currencies), in order.
+    """
+    schemas = {t.get("function", {}).get("name"): t.get("function", {}) for t in tools}
+    lowered = question.lower()
+    chosen = None
+    for keywords, name in TOOL_KEYWORDS:
+        if name in schemas and any(k in lowered for k in keywords):
+            chosen = name
+            break
+    if chosen is None:
+        return None
+    numbers = iter(re.findall(r"-?\d+(?:\.\d+)?", question))
+    codes = iter(re.findall(r"\b[A-Z]{3}\b", question))
+    arguments = {}
+    for param, spec in schemas[chosen].get("parameters", {}).get("properties", {}).items():
+        value = next(codes if spec.get("type") == "string" else numbers, None)
+        if value is None:
+            return None
+        if spec.get("type") != "string":
+            value = float(value) if "." in value else int(value)
+        arguments[param] = value
+    return {
+        "id": f"call_{uuid.uuid4().hex[:24]}",
+        "type": "function",
+        "function": {"name": chosen, "arguments": json.dumps(arguments)},
+    }
+
+
+def _choose_tool_calls(question, tools):
+    """One tool call per clause ("What is 15 * 8 and 100 + 50?" asks for two)."""
+    clauses = [c for c in re.split(r"\band\b|;|\?", question) if c.strip()]
+    calls = [call for call in (_choose_tool_call(c, tools) for c in clauses) if call is not None]
+    if not calls:
+        call = _choose_tool_call(question, tools)
+        calls = [call] if call is not None else []
+    return calls
+
+
+def request_tokens(payload):
+    """Tokens a request is charged against the tokens-per-minute limit.
+
+    Like the real API: prompt tokens plus the requested completion budget.
+    """
+    if "messages" in payload:
+        prompt = sum(estimate_tokens(_message_text(m)) for m in payload["messages"])
+        return prompt + (payload.get("max_completion_tokens") or payload.get("max_tokens") or 0)
+    inputs = payload.get("input", [])
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    return sum(len(item) if isinstance(item, list) else estimate_tokens(item) for item in inputs)
+
+
+class RateLimit:
+    """Per-minute limit enforced as a token bucket holding `burst_s` seconds of quota.
+
+    A request larger than the bucket is admitted when the bucket is full and
+    charged in full, so the bucket goes into debt rather than undercharging.
+    """
+
+    def __init__(self, per_minute, burst_s=1.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_s)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def shortfall(self, amount):
+        """Seconds until `amount` is available (0.0 means it is)."""
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, min(amount, self.capacity) - self.available) / self.rate
+
+
+class StubConfig:
+    """Knobs that shape how the stand-in responds.
+
+    rpm_limit / tpm_limit make it answer 429 (with retry-after) once a
+    client exceeds them. With `capacity`, requests beyond that many in flight
+    are slowed down proportionally, like an overloaded backend. A fraction
+    `spike_rate` of requests take an extra `spike_ms`, like a stalled
+    upstream replica.
+    """
+
+    def __init__(self, latency_ms=50.0, jitter_ms=10.0, token_delay_ms=5.0,
+                 embedding_dim=DEFAULT_EMBEDDING_DIM, seed=None, rpm_limit=None, tpm_limit=None,
+                 capacity=None, spike_rate=0.0, spike_ms=1000.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_delay_ms = token_delay_ms
+        self.embedding_dim = embedding_dim
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.rpm = RateLimit(rpm_limit) if rpm_limit else None
+        self.tpm = RateLimit(tpm_limit) if tpm_limit else None
+        self.capacity = capacity
+        self.spike_rate = spike_rate
+        self.spike_ms = spike_ms
+        self.active = 0
+        self.throttled = 0
+
+    def next_latency(self):
+        """Seconds to wait before answering a request."""
+        with self.lock:
+            self.request_count += 1
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+            spike = self.spike_ms if self.spike_rate and self.random.random() < self.spike_rate else 0.0
+            overload = max(0, self.active - self.capacity) / self.capacity if self.capacity else 0.0
+        return (max(0.0, self.latency_ms + jitter) * (1.0 + overload) + spike) / 1000.0
+
+    def admit(self, tokens):
+        """Charge a request against the limits; return 0.0, or seconds to retry after."""
+        with self.lock:
+            wait = max(self.rpm.shortfall(1) if self.rpm else 0.0,
+                       self.tpm.shortfall(tokens) if self.tpm else 0.0)
+            if wait:
+                self.throttled += 1
+                return wait
+            if self.rpm:
+                self.rpm.available -= 1
+            if self.tpm:
+                self.tpm.available -= tokens
+            self.active += 1
+            return 0.0
+
+    def finished(self):
+        with self.lock:
+            self.active -= 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle's algorithm on, a
+    # keep-alive client's delayed ACK would add ~40 ms to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        payload = self._read_json()
+        retry_after = self.config.admit(request_tokens(payload))
+        if retry_after:
+            self._send_json(429, {"error": {
+                "message": "Rate limit reached; please try again later.",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }}, headers={"retry-after-ms": str(math.ceil(retry_after * 1000)),
+                         "Retry-After": str(math.ceil(retry_after))})
+            return
+        try:
+            if self.path.endswith("/chat/completions"):
+                self._chat_completions(payload)
+            elif self.path.endswith("/embeddings"):
+                self._embeddings(payload)
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+        finally:
+            self.config.finished()
+
+    # -- embeddings --------------------------------------------------------
+
+    def _embeddings(self, payload):
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        time.sleep(self.config.next_latency())
+        dim = payload.get("dimensions") or self.config.embedding_dim
+        data = []
+        for i, item in enumerate(inputs):
+            # The OpenAI client may send pre-tokenized input as lists of ints
+            text = " ".join(str(t) for t in item) if isinstance(item, list) else item
+            data.append({"object": "embedding", "index": i, "embedding": embed_text(text, dim)})
+        tokens = sum(estimate_tokens(str(item)) for item in inputs)
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "stub-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    # -- chat completions --------------------------------------------------
+
+    def _build_reply(self, payload):
+        messages = payload.get("messages", [])
+        last = messages[-1] if messages else {}
+        question = _message_text(last)
+        tools = payload.get("tools") or []
+        if last.get("role") == "tool":
+            results = []
+            for message in reversed(messages):
+                if message.get("role") != "tool":
+                    break
+                results.insert(0, _message_text(message))
+            if len(results) == 1:
+                return {"role": "assistant", "content": f"The answer is {results[0]}."}
+            return {"role": "assistant", "content": f"The answers are {', '.join(results)}."}
+        if tools:
+            calls = _choose_tool_calls(question, tools)
+            if calls:
+                return {"role": "assistant", "content": None, "tool_calls": calls}
+        return {"role": "assistant", "content": CANNED_ANSWER}
+
+    def _chat_completions(self, payload):
+        time.sleep(self.config.next_latency())
+        reply = self._build_reply(payload)
+        prompt_tokens = sum(estimate_tokens(_message_text(m)) for m in payload.get("messages", []))
+        completion_tokens = estimate_tokens(reply.get("content") or "")
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = payload.get("model", "stub")
+        if payload.get("stream"):
+            self._stream_reply(completion_id, model, reply, usage)
+            return
+        finish = "tool_calls" if reply.get("tool_calls") else "stop"
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": reply, "finish_reason": finish}],
+            "usage": usage,
+        })
+
+    def _stream_reply(self, completion_id, model, reply, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def emit(delta, finish=None, extra=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            chunk.update(extra or {})
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        emit({"role": "assistant", "content": ""})
+        if reply.get("tool_calls"):
+            calls = [dict(call, index=i) for i, call in enumerate(reply["tool_calls"])]
+            emit({"tool_calls": calls})
+            emit({}, finish="tool_calls", extra={"usage": usage})
+        else:
+            for token in re.findall(r"\S+\s*", reply["content"]):
+                time.sleep(self.config.token_delay_ms / 1000.0)
+                emit({"content": token})
+            emit({}, finish="stop", extra={"usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config=None, handler=StubHandler):
+        super().__init__(address, handler)
+        self.config = config or StubConfig()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def handle_error(self, request, client_address):
+        # A client that gave up on a request (e.g. the losing side of a hedged
+        # call) closes its connection before the reply is written
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve_in_background(host="127.0.0.1", port=0, config=None):
+    """Start a stand-in server on a daemon thread and return it."""
+    server = StubServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="base response latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="uniform latency jitter")
+    parser.add_argument("--token-delay-ms", type=float, default=5.0, help="delay between streamed tokens")
+    parser.add_argument("--embedding-dim", type=int, default=DEFAULT_EMBEDDING_DIM)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rpm-limit", type=float, default=None, help="answer 429 above this requests/minute")
+    parser.add_argument("--tpm-limit", type=float, default=None, help="answer 429 above this tokens/minute")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="requests in flight before responses slow down")
+    parser.add_argument("--spike-rate", type=float, default=0.0,
+                        help="fraction of requests that get an extra --spike-ms of latency")
+    parser.add_argument("--spike-ms", type=float, default=1000.0)
+    return parser
+
+
+def config_from_args(args):
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        token_delay_ms=args.token_delay_ms,
+        embedding_dim=args.embedding_dim,
+        seed=args.seed,
+        rpm_limit=args.rpm_limit,
+        tpm_limit=args.tpm_limit,
+        capacity=args.capacity,
+        spike_rate=args.spike_rate,
+        spike_ms=args.spike_ms,
+    )
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    server = StubServer((args.host, args.port), config_from_args(args))
+    print(f"Stand-in OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from agent_loop import ToolExecutor, cpu_bound, run_agent
+
+
+@tool
+async def lookup(key: str) -> str:
+    """Look up a key (takes 100 ms)."""
+    await asyncio.sleep(0.1)
+    return f"value of {key}"
+
+
+@tool
+def fails(key: str) -> str:
+    """Always fails."""
+    raise RuntimeError(f"no {key}")
+
+
+@cpu_bound
+@tool
+def worker_pid(n: int) -> int:
+    """Process id of the process that ran the tool."""
+    return os.getpid()
+
+
+def call(name, call_id, **args):
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+def test_tool_calls_of_one_turn_run_concurrently_in_call_order():
+    executor = ToolExecutor([lookup], cache=None)
+    started = time.perf_counter()
+    messages, timings = asyncio.run(executor.run([call("lookup", str(i), key=f"k{i}") for i in range(3)]))
+    assert time.perf_counter() - started < 0.25  # not 3 x 100 ms
+    assert [m.content for m in messages] == ["value of k0", "value of k1", "value of k2"]
+    assert [m.tool_call_id for m in messages] == ["0", "1", "2"]
+    assert all(t["status"] == "success" and t["ms"] >= 100 for t in timings)
+
+
+def test_failures_go_back_to_the_model_as_errors():
+    executor = ToolExecutor([fails], cache=None)
+    messages, timings = asyncio.run(executor.run([call("fails", "a", key="x"), call("missing", "b")]))
+    assert [m.status for m in messages] == ["error", "error"]
+    assert "no x" in messages[0].content and "unknown tool 'missing'" in messages[1].content
+    assert [t["status"] for t in timings] == ["error", "error"]
+
+
+def test_cpu_bound_tools_run_in_the_process_pool():
+    executor = ToolExecutor([worker_pid], max_workers=1, cache=None)
+    try:
+        messages, _ = asyncio.run(executor.run([call("worker_pid", "a", n=1)]))
+    finally:
+        executor.close()
+    assert messages[0].status == "success"
+    assert int(messages[0].content) != os.getpid()
+
+
+def test_agent_loops_until_the_model_answers():
+    llm = GenericFakeChatModel(messages=iter([
+        AIMessage(content="", tool_calls=[call("lookup", "1", key="a"), call("lookup", "2", key="b")]),
+        AIMessage(content="a and b looked up"),
+    ]))
+    result = asyncio.run(run_agent(llm, ToolExecutor([lookup], cache=None), "look up a and b"))
+    assert result["answer"] == "a and b looked up" and result["stopped"] is None
+    assert [type(m).__name__ for m in result["messages"]] == [
+        "HumanMessage", "AIMessage", "ToolMessage", "ToolMessage", "AIMessage"]
+    first, second = result["steps"]
+    assert [t["name"] for t in first["tools"]] == ["lookup", "lookup"]
+    assert first["tools_ms"] < sum(t["ms"] for t in first["tools"])  # the two calls overlapped
+    assert "tools" not in second
+
+
+def test_agent_stops_at_the_step_limit():
+    llm = GenericFakeChatModel(messages=iter(
+        AIMessage(content="", tool_calls=[call("lookup", str(i), key="again")]) for i in range(10)))
+    result = asyncio.run(run_agent(llm, ToolExecutor([lookup], cache=None), "loop", max_steps=2))
+    assert result["answer"] is None and result["stopped"] == "max_steps"
+    assert len(result["steps"]) == 2
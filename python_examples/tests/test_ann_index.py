@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+import compact_store
+from ann_index import (build_index, expand_sweeps, fit_to_training_set, parse_index_spec, reconstruct_all,
+                       run_convert, set_search_params, synthetic_vectors)
+
+
+def test_index_specs_parse_to_kind_and_parameters():
+    assert parse_index_spec("flat") == ("flat", {})
+    assert parse_index_spec("IVF: nlist=64, nprobe=4") == ("ivf", {"nlist": 64, "nprobe": 4})
+    assert parse_index_spec("hnsw:efSearch=16|64") == ("hnsw", {"efSearch": "16|64"})
+    with pytest.raises(ValueError, match="Unknown index type"):
+        parse_index_spec("annoy")
+
+
+def test_sweeps_expand_to_every_combination():
+    points = list(expand_sweeps({"nlist": 64, "nprobe": "1|4", "efSearch": "8|16"}))
+    assert len(points) == 4
+    assert {"nlist": 64, "nprobe": 4, "efSearch": 8} in points
+
+
+def test_ivf_cells_are_clamped_to_the_training_set():
+    assert fit_to_training_set("ivf", {"nlist": 1024}, 3)["nlist"] == 1
+    assert fit_to_training_set("pq", {"nlist": 1024}, 390 * 39)["nlist"] == 390
+    assert fit_to_training_set("ivf", {"nlist": 1024}, 100_000)["nlist"] == 1024
+    assert fit_to_training_set("hnsw", {"M": 8}, 3) == {"M": 8}
+
+
+def test_ivf_index_builds_and_searches_on_a_tiny_corpus():
+    vectors = synthetic_vectors(3, 8)
+    index = build_index(vectors, "ivf:nlist=1024,nprobe=16")
+    assert index.nlist == 1
+    _, ids = index.search(vectors, 1)
+    assert list(ids[:, 0]) == [0, 1, 2]
+
+
+def test_pq_on_a_tiny_corpus_names_the_minimum_size():
+    with pytest.raises(ValueError, match="at least 256 vectors"):
+        build_index(synthetic_vectors(3, 16), "pq:m=4")
+
+
+def test_only_supported_search_params_are_applied():
+    index = build_index(synthetic_vectors(400, 8, clusters=4), "ivf:nlist=4")
+    assert set_search_params(index, nprobe=3, efSearch=32) == ["efSearch"]
+    assert index.nprobe == 3
+    assert set_search_params(faiss.IndexFlatL2(8), nprobe=3) == ["nprobe"]
+
+
+def write_compact(index_dir, vectors, vector_format):
+    documents = [Document(page_content=f"doc {i}") for i in range(len(vectors))]
+    compact_store.save_compact(index_dir, vectors, documents, vector_format)
+
+
+def test_convert_keeps_row_order_in_a_compact_flat_directory(tmp_path):
+    vectors = synthetic_vectors(200, 8, clusters=4)
+    write_compact(tmp_path, vectors, "fp32")
+    run_convert(SimpleNamespace(index_dir=str(tmp_path), spec="hnsw:M=8"))
+    index, docstore, ids = compact_store.load_compact(tmp_path)
+    assert isinstance(index, faiss.IndexHNSWFlat)
+    _, found = index.search(vectors[[7, 42]], 1)
+    assert [docstore.search(ids[int(i)]).page_content for i in found[:, 0]] == ["doc 7", "doc 42"]
+
+
+def test_convert_rejects_a_quantized_compact_directory(tmp_path):
+    vectors = synthetic_vectors(50, 8, clusters=4)
+    write_compact(tmp_path, vectors, "int8")
+    before = (tmp_path / "index.faiss").read_bytes()
+    with pytest.raises(ValueError, match="compact layout.*not a flat float32 index"):
+        run_convert(SimpleNamespace(index_dir=str(tmp_path), spec="ivf"))
+    assert (tmp_path / "index.faiss").read_bytes() == before
+    np.testing.assert_allclose(reconstruct_all(faiss.read_index(str(tmp_path / "index.faiss"))), vectors,
+                               atol=0.02)
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import threading
+
+from bulk_runner import iter_records, load_checkpoint, run_bulk, run_file
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+def test_records_get_line_numbers_as_ids():
+    records = list(iter_records(['{"prompt": "a"}', "", "plain text", '{"id": "x", "prompt": "b"}']))
+    assert records == [{"prompt": "a", "id": 1}, {"prompt": "plain text", "id": 3}, {"id": "x", "prompt": "b"}]
+
+
+def test_ordered_results_with_bounded_concurrency():
+    active = peak = 0
+
+    async def call(record):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001 * (10 - record["id"]))  # later records finish first
+        active -= 1
+        return {"answer": record["id"] * 2}
+
+    records = [{"id": i} for i in range(10)]
+    results = asyncio.run(collect(run_bulk(records, call, concurrency=3, ordered=True)))
+    assert [r["answer"] for r in results] == [i * 2 for i in range(10)]
+    assert peak == 3
+
+
+def test_a_slow_source_does_not_stall_calls_in_flight():
+    first_done = threading.Event()
+
+    def records():
+        yield {"id": 1}
+        # Blocks the reader until the first call has finished
+        assert first_done.wait(2), "the first call never ran while the source was blocked"
+        yield {"id": 2}
+
+    async def call(record):
+        await asyncio.sleep(0)
+        if record["id"] == 1:
+            first_done.set()
+        return {}
+
+    results = asyncio.run(collect(run_bulk(records(), call)))
+    assert [r["id"] for r in results] == [1, 2]
+
+
+def test_resume_skips_answers_and_retries_failures(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text(
+        json.dumps({"id": 1, "answer": "one"}) + "\n"
+        + json.dumps({"id": 2, "error": "Timeout()"}) + "\n"
+        + json.dumps({"answer": "no id"}) + "\n"
+        + "[1, 2]\n"
+        + '{"id": 3, "ans',  # cut short by the interruption
+        encoding="utf-8",
+    )
+    calls = []
+
+    async def call(record):
+        calls.append(record["id"])
+        return {"answer": record["prompt"]}
+
+    lines = [json.dumps({"id": i, "prompt": f"p{i}"}) for i in (1, 2, 3)]
+    asyncio.run(run_file(lines, call, output, resume=True))
+    assert sorted(calls) == [2, 3]
+    results = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert sorted(r["id"] for r in results) == [1, 2, 3]
+    assert all("error" not in r for r in results)
+    assert load_checkpoint(output) == {1, 2, 3}
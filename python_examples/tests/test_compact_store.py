@@ -0,0 +1,72 @@
+import pickle
+
+import faiss
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import ann_index
+from compact_store import CompactDocstore, PositionIds, convert, is_compact, load_compact
+
+
+def test_docstore_round_trips_text_and_metadata(tmp_path):
+    documents = [Document(page_content="plain", metadata={"source": "a.txt", "chunk": 0}),
+                 Document(page_content="ünïcödé ✓", metadata={}),
+                 Document(page_content="", metadata={"empty": True})]
+    CompactDocstore.save(tmp_path, documents)
+    docstore = CompactDocstore.load(tmp_path)
+    assert len(docstore) == 3
+    for i, expected in enumerate(documents):
+        found = docstore.search(str(i))
+        assert (found.page_content, found.metadata, found.id) == (expected.page_content, expected.metadata, str(i))
+    assert docstore.search("3") == "ID 3 not found."
+    assert docstore.search("not-a-number") == "ID not-a-number not found."
+
+
+def test_empty_docstore_loads(tmp_path):
+    CompactDocstore.save(tmp_path, [])
+    assert len(CompactDocstore.load(tmp_path)) == 0
+
+
+def test_position_ids_map_rows_to_their_own_number():
+    ids = PositionIds(3)
+    assert [ids[i] for i in ids] == ["0", "1", "2"]
+    assert ids[np.int64(1)] == "1"
+    with pytest.raises(KeyError):
+        ids[3]
+
+
+@pytest.fixture
+def saved(tmp_path):
+    texts = [f"document number {i}" for i in range(20)]
+    vectorstore = FAISS.from_texts(texts, DeterministicFakeEmbedding(size=16),
+                                   metadatas=[{"i": i} for i in range(20)])
+    vectorstore.save_local(str(tmp_path))
+    return tmp_path, vectorstore
+
+
+@pytest.mark.parametrize("vector_format, index_type", [
+    ("fp16", faiss.IndexScalarQuantizer), ("int8", faiss.IndexScalarQuantizer), ("keep", faiss.IndexFlatL2)])
+def test_converted_store_returns_the_same_documents(saved, vector_format, index_type):
+    index_dir, original = saved
+    convert(index_dir, vector_format)
+    assert is_compact(index_dir) and not (index_dir / "index.pkl").exists()
+    index, docstore, ids = load_compact(index_dir)
+    assert isinstance(index, index_type)
+    compact = FAISS(original.embeddings, index, docstore, ids)
+    for i in (0, 7, 19):
+        found = compact.similarity_search(f"document number {i}", k=1)[0]
+        assert (found.page_content, found.metadata) == (f"document number {i}", {"i": i})
+
+
+def test_re_encoding_an_ann_index_is_refused(saved):
+    index_dir, original = saved
+    vectors = ann_index.reconstruct_all(original.index)
+    faiss.write_index(ann_index.build_index(vectors, "hnsw:M=8"), str(index_dir / "index.faiss"))
+    with pytest.raises(ValueError, match="not a flat float32 index"):
+        convert(index_dir, "fp16")
+    assert not is_compact(index_dir)
+    with open(index_dir / "index.pkl", "rb") as f:
+        assert len(pickle.load(f)[1]) == 20
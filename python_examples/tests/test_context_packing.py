@@ -0,0 +1,29 @@
+from context_packing import ContextPacker, count_tokens, strip_overlap
+
+CHUNK = "Optimum AI Lab builds autonomous agents for enterprise customers in many industries."
+
+
+def test_exact_and_near_duplicates_are_dropped():
+    packer = ContextPacker(budget_tokens=10_000)
+    near = CHUNK[:-1] + " worldwide."  # 10 of its 11 word shingles are shared
+    context = packer.pack([CHUNK, "  " + CHUNK.upper() + " ", near, "An unrelated chunk about invoices."])
+    assert context.split(packer.separator) == [CHUNK, "An unrelated chunk about invoices."]
+    assert packer.last["chunks_packed"] == 2
+
+
+def test_chunk_overlap_is_trimmed():
+    previous = "The first chunk ends with a sentence that the next chunk repeats."
+    following = "a sentence that the next chunk repeats. Then it continues."
+    assert strip_overlap(previous, following) == "Then it continues."
+    assert strip_overlap(previous, "No shared text at all.") == "No shared text at all."
+
+
+def test_packing_is_best_first_within_the_budget():
+    long = " ".join(f"word{i}" for i in range(200))
+    short = "A short chunk."
+    budget = count_tokens(CHUNK) + count_tokens("\n\n") + count_tokens(short)
+    packer = ContextPacker(budget_tokens=budget)
+    # The long chunk does not fit, but the shorter one after it still does
+    assert packer.pack([CHUNK, long, short]) == CHUNK + "\n\n" + short
+    assert packer.last["tokens_packed"] <= budget
+    assert packer.last["tokens_saved"] == packer.last["tokens_retrieved"] - packer.last["tokens_packed"]
@@ -0,0 +1,40 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    model = "text-embedding-3-small"
+
+    def __init__(self, dimensions=None):
+        self.dimensions = dimensions
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        return [[float(len(t))] * (self.dimensions or 4) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_only_uncached_texts_are_embedded_and_dimensions_are_kept_apart(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3")
+    full, short = CountingEmbeddings(), CountingEmbeddings(dimensions=2)
+    CachedEmbeddings(full, cache).embed_documents(["a", "bb", "a"])
+    assert full.texts == 2  # the repeated "a" is embedded once
+    assert CachedEmbeddings(full, cache).embed_documents(["bb", "ccc"]) == [[2.0] * 4, [3.0] * 4]
+    assert full.texts == 3
+    assert CachedEmbeddings(short, cache).embed_documents(["bb"]) == [[2.0] * 2]
+    assert short.texts == 1
+
+
+def test_async_embedding_uses_the_same_cache(tmp_path):
+    underlying = CountingEmbeddings()
+    embeddings = CachedEmbeddings(underlying, tmp_path / "cache.sqlite3")
+    assert asyncio.run(embeddings.aembed_documents(["a", "bb"])) == [[1.0] * 4, [2.0] * 4]
+    assert embeddings.embed_documents(["bb", "a"]) == [[2.0] * 4, [1.0] * 4]
+    assert underlying.texts == 2
+    assert embeddings.stats()["model"] == "text-embedding-3-small"
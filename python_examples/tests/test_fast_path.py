@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from agent_loop import ToolExecutor
+from example_tools import tools
+from fast_path import PreRouter
+
+
+@pytest.fixture
+def router():
+    return PreRouter(tools)
+
+
+def calls(matches):
+    return [(name, args) for name, args, _, _, _ in matches]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What is 15 * 8?", [("multiply", {"a": 15, "b": 8})]),
+    ("calculate 100 plus 50", [("add", {"a": 100, "b": 50})]),
+    ("What is 144 divided by 12?", [("divide", {"a": 144, "b": 12})]),
+    ("How many primes are below 100000?", [("count_primes", {"limit": 100000})]),
+    ("What is the USD to JPY exchange rate?", [("get_exchange_rate", {"base": "USD", "quote": "JPY"})]),
+    ("What is 15 * 8 and 100 + 50?", [("multiply", {"a": 15, "b": 8}), ("add", {"a": 100, "b": 50})]),
+])
+def test_fully_matching_queries(router, query, expected):
+    assert calls(router.match(query)) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "Could you multiply 12 by 12 for me?",  # lead-in the patterns do not cover
+    "What is 15 * 8 and why?",  # one clause matches, the other does not
+    "What is 1.5 * 2?",  # multiply takes integers
+    "What is the usd to eur rate?",  # currency codes must be upper case
+    "",
+])
+def test_anything_less_than_a_full_match_falls_back(router, query):
+    assert router.match(query) is None
+
+
+def run(router, query):
+    executor = ToolExecutor(tools, cache=None)
+    try:
+        return asyncio.run(router.run(query, executor))
+    finally:
+        executor.close()
+
+
+def test_hit_answers_from_the_template(router):
+    result = run(router, "What is 6 / 3 and 2 * 21?")
+    assert result["answer"] == "6 / 3 = 2.0; 2 * 21 = 42."
+    assert result["steps"][0]["fast_path"]
+    assert router.hits == 1
+
+
+@pytest.mark.parametrize("query", ["What is 5 / 0?", "What is 6 / 3 and 5 / 0?"])
+def test_non_numeric_tool_result_falls_back(router, query):
+    assert run(router, query) is None
+    assert (router.hits, router.misses) == (0, 1)
+
+
+def test_model_calls_avoided_come_from_observed_llm_runs(router):
+    run(router, "What is 15 * 8?")
+    run(router, "What is 2 + 2?")
+    assert router.stats()["est_model_calls_avoided"] is None  # nothing observed yet
+    router.observe({"steps": [{}, {}, {}], "total_ms": 900.0})
+    router.observe({"steps": [{}], "total_ms": 300.0})  # answered without tools: not a baseline
+    stats = router.stats()
+    assert stats["llm_calls_mean"] == 3.0
+    assert stats["est_model_calls_avoided"] == 6.0
+    assert stats["llm_ms_mean"] == 900.0
@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+import pytest
+
+from hedging import Hedger, hedgeable, request_key
+
+
+class Body(httpx.AsyncByteStream):
+    def __init__(self, content):
+        self.content = content
+
+    async def __aiter__(self):
+        yield self.content
+
+
+def request(**body):
+    return httpx.Request("POST", "http://upstream.test/v1/chat/completions", json={"model": "m", **body})
+
+
+class Upstream:
+    """Answers attempt n after latencies[n] seconds (the last one repeats), or raises errors[n]."""
+
+    def __init__(self, *latencies, errors=None):
+        self.latencies = latencies
+        self.errors = errors or {}
+        self.calls = 0
+
+    async def send(self, req):
+        n = self.calls
+        self.calls += 1
+        await asyncio.sleep(self.latencies[min(n, len(self.latencies) - 1)])
+        if n in self.errors:
+            raise self.errors[n]
+        return httpx.Response(200, stream=Body(f"attempt {n}".encode()))
+
+
+def warmed_hedger(latency_s=0.01, samples=5, **params):
+    hedger = Hedger(min_samples=samples, **params)
+    for _ in range(samples):
+        hedger._finish(request_key(request()), latency_s, False)
+    return hedger
+
+
+def test_streams_and_gets_are_not_hedged():
+    assert hedgeable(request())
+    assert not hedgeable(request(stream=True))
+    assert not hedgeable(httpx.Request("GET", "http://upstream.test/v1/models"))
+    assert request_key(request()) == "/v1/chat/completions:m"
+
+
+def test_no_hedge_until_the_window_has_enough_samples():
+    hedger, upstream = Hedger(min_samples=5, budget=1.0), Upstream(0.001)
+    asyncio.run(hedger.send(request(), upstream.send))
+    assert upstream.calls == 1 and hedger.delay(request_key(request())) is None
+
+
+def test_a_winning_hedge_records_the_time_since_the_first_send():
+    hedger = warmed_hedger(budget=1.0)
+    upstream = Upstream(0.2, 0.001)  # slow primary, fast hedge
+    response = asyncio.run(hedger.send(request(), upstream.send))
+    assert response.read() == b"attempt 1"
+    assert hedger.stats()["hedge_wins"] == 1
+    # Not the hedge's ~1 ms: the new sample is at least the hedge delay
+    assert hedger._latencies[request_key(request())][-1] >= 0.01
+
+
+def test_a_failed_primary_loses_to_a_running_hedge():
+    hedger = warmed_hedger(budget=1.0)
+    upstream = Upstream(0.05, 0.06, errors={0: httpx.ReadTimeout("slow")})
+    assert asyncio.run(hedger.send(request(), upstream.send)).read() == b"attempt 1"
+
+
+def test_credit_is_capped_so_a_slow_spell_cannot_burst():
+    hedger = warmed_hedger(budget=0.5)
+    hedger.credit = 100.0
+    hedger._start()
+    assert hedger.credit == 2.0
+
+    async def slow_spell():
+        upstream = Upstream(0.05)
+        await asyncio.gather(*(hedger.send(request(), upstream.send) for _ in range(6)))
+        return upstream.calls
+
+    hedger.credit = 0.0
+    # Six calls earn 3 credits, capped at 2
+    assert asyncio.run(slow_spell()) == 6 + 2
+    assert hedger.stats()["budget_denied"] == 4
+
+
+@pytest.mark.parametrize("value, percentile", [("95", 95.0), ("p99", 99.0)])
+def test_from_env(monkeypatch, value, percentile):
+    monkeypatch.setenv("LLM_HEDGE", value)
+    monkeypatch.setenv("LLM_HEDGE_BUDGET", "0.2")
+    hedger = Hedger.from_env()
+    assert (hedger.percentile, hedger.budget) == (percentile, 0.2)
+    monkeypatch.delenv("LLM_HEDGE")
+    assert Hedger.from_env() is None
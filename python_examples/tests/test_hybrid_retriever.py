@@ -0,0 +1,105 @@
+import asyncio
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.runnables import RunnableLambda
+
+from hybrid_retriever import BM25Index, HybridRetriever, reciprocal_rank_fusion
+from semantic_cache import SemanticCache
+
+
+def test_documents_ranked_by_both_retrievers_come_first():
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]]) == [1, 3, 2, 4]
+
+
+def test_fusion_scores_are_reciprocal_ranks():
+    # Rank 1 in one list (1/61) beats rank 2 in one list (1/62), but not rank 3 in both (2/63)
+    assert reciprocal_rank_fusion([[7, 8, 9], [5, 6, 9]]) == [9, 7, 5, 8, 6]
+
+
+def test_rrf_k_flattens_the_rank_weighting():
+    rankings = [[1, 2, 3], [4, 5, 2]]
+    # k=0: one first place (1/1) beats second and third place (1/2 + 1/3)
+    assert reciprocal_rank_fusion(rankings, rrf_k=0)[0] == 1
+    # k=60: agreement wins (1/62 + 1/63 > 1/61)
+    assert reciprocal_rank_fusion(rankings, rrf_k=60)[0] == 2
+
+
+def test_numpy_ids_and_empty_rankings():
+    assert reciprocal_rank_fusion([np.array([4, 2], dtype=np.int64), []]) == [4, 2]
+    assert reciprocal_rank_fusion([]) == []
+
+
+def test_bm25_ranks_the_document_with_a_rare_exact_term_first():
+    index = BM25Index.build([
+        "the invoice for order 4711 was sent",
+        "orders are shipped within two days",
+        "product code XJ-9000 is discontinued",
+        "the invoice template was updated",
+    ])
+    doc_ids, scores = index.search("XJ-9000 product", k=3)
+    assert doc_ids[0] == 2
+    assert list(scores) == sorted(scores, reverse=True)
+    assert len(index.search("unknownterm")[0]) == 0
+
+
+CORPUS = [
+    "the invoice for order 4711 was sent",
+    "orders are shipped within two days",
+    "product code XJ-9000 is discontinued",
+    "the invoice template was updated",
+]
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+@pytest.fixture
+def hybrid():
+    embeddings = CountingEmbeddings(size=8)
+    vectorstore = FAISS.from_texts(CORPUS, embeddings)
+    embeddings.calls = 0
+    return HybridRetriever(vectorstore=vectorstore, bm25=BM25Index.from_vectorstore(vectorstore))
+
+
+def test_max_score_bounds_every_document_score():
+    index = BM25Index.build(CORPUS)
+    for query in ["the invoice", "XJ-9000 product", "order 4711 was sent"]:
+        _, scores = index.search(query)
+        assert 0 < scores[0] < index.max_score(query)
+    assert index.max_score("words outside the corpus") == index.max_score("the")
+
+
+def test_confidence_is_relative_to_the_query_not_the_corpus_size(hybrid):
+    # A 4-document corpus never reaches an absolute BM25 score like 8
+    assert hybrid.bm25.search("What is the status of XJ-9000?")[1][0] < 8
+    assert hybrid.lexical_confident("What is the status of XJ-9000?")
+    assert not hybrid.lexical_confident("When was the invoice sent?")  # two close candidates
+    assert not hybrid.lexical_confident("something else entirely")
+
+
+def test_confident_lexical_queries_are_never_embedded(hybrid):
+    docs = hybrid.invoke("What is the status of XJ-9000?")
+    assert docs[0].page_content == CORPUS[2]
+    assert hybrid.vectorstore.embeddings.calls == 0
+    hybrid.invoke("When was the invoice sent?")
+    assert hybrid.vectorstore.embeddings.calls == 1
+    assert hybrid.stats()["lexical_only"] == hybrid.stats()["hybrid"] == 1
+
+
+def test_answer_cache_is_bypassed_before_it_embeds_a_lexical_question(hybrid):
+    embeddings = hybrid.vectorstore.embeddings
+    cache = SemanticCache(lambda: embeddings)
+    chain = RunnableLambda(lambda question: hybrid.invoke(question)[0].page_content)
+    cached = cache.wrap(chain, bypass=hybrid.lexical_confident)
+    assert cached.invoke("What is the status of XJ-9000?") == CORPUS[2]
+    assert embeddings.calls == 0
+    assert asyncio.run(cached.ainvoke("What is the status of XJ-9000?")) == CORPUS[2]
+    assert cache.stats()["bypassed"] == 2 and embeddings.calls == 0
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import index_manager
+from index_manager import IndexManager, current_generation
+
+
+def texts(manager, vector_of, query, k=10):
+    return [doc.page_content for doc in manager.search(vector_of(query), k)]
+
+
+@pytest.fixture
+def embeddings():
+    return DeterministicFakeEmbedding(size=16)
+
+
+def test_upsert_replaces_and_delete_tombstones(embeddings):
+    manager = IndexManager(embeddings)
+    manager.upsert([("a", "alpha", None), ("b", "beta", None)])
+    manager.upsert([("a", "alpha v2", None)])
+    assert manager.delete(["b", "missing"]) == 1
+    assert texts(manager, embeddings.embed_query, "alpha v2") == ["alpha v2"]
+    assert manager.stats()["live"] == 1 and manager.stats()["tombstones"] == 2
+
+
+@pytest.mark.parametrize("spec", ["flat", "fp16"])
+def test_compaction_keeps_live_rows_and_their_vectors(embeddings, spec):
+    manager = IndexManager(embeddings, spec, min_dead=1_000)
+    manager.upsert([(str(i), f"document {i}", {"i": i}) for i in range(20)])
+    manager.delete([str(i) for i in range(0, 20, 2)])
+    manager.compact()
+    assert manager.stats()["tombstones"] == 0 and len(manager.rows) == 10
+    for i in range(1, 20, 2):
+        assert texts(manager, embeddings.embed_query, f"document {i}", k=1) == [f"document {i}"]
+    if spec == "fp16":
+        # Re-encoded from the kept originals, not from fp16 reconstructions
+        kept = np.asarray(embeddings.embed_documents([f"document {i}" for i in range(1, 20, 2)]), dtype=np.float32)
+        assert np.array_equal(np.concatenate(manager._originals), kept)
+
+
+def test_background_compaction_after_the_threshold(embeddings):
+    manager = IndexManager(embeddings, compact_threshold=0.5, min_dead=2)
+    manager.upsert([("a", "alpha", None), ("b", "beta", None)])
+    manager.delete(["a", "b"])
+    manager.wait_for_compaction()
+    assert manager.stats()["compactions"] == 1 and manager.rows == []
+    assert manager.search(embeddings.embed_query("alpha")) == []
+
+
+def test_save_and_load_round_trip(tmp_path, embeddings):
+    manager = IndexManager(embeddings, "fp16")
+    manager.upsert([("a", "alpha", {"n": 1}), ("b", "beta", None)])
+    manager.delete(["b"])
+    manager.save(tmp_path)
+    loaded = IndexManager.load(tmp_path, embeddings)
+    assert loaded.spec == "fp16" and loaded.live == {"a": 0}
+    assert loaded.search(embeddings.embed_query("alpha"))[0].metadata == {"n": 1}
+    assert np.array_equal(np.concatenate(loaded._originals), np.concatenate(manager._originals))
+
+
+def test_only_the_current_and_previous_generations_are_kept(tmp_path, embeddings):
+    manager = IndexManager(embeddings)
+    saved = []
+    for i in range(3):
+        manager.upsert([(str(i), f"doc {i}", None)])
+        manager.save(tmp_path)
+        saved.append(current_generation(tmp_path))
+    assert len(set(saved)) == 3
+    assert sorted(p.name for p in tmp_path.glob("gen-*")) == sorted(saved[1:])
+
+
+def test_watching_process_reloads_a_newer_save(tmp_path, embeddings):
+    writer = IndexManager(embeddings)
+    writer.upsert([("a", "alpha", None)])
+    writer.save(tmp_path)
+    reader = IndexManager.load(tmp_path, embeddings, watch=True)
+    reader.reload_interval_s = 0.0
+    assert not reader.maybe_reload()
+    # Same row count as before, so only the generation tells the saves apart
+    writer.upsert([("a", "alpha v2", None)])
+    writer.compact()
+    writer.save(tmp_path)
+    assert reader.maybe_reload()
+    assert texts(reader, embeddings.embed_query, "alpha v2") == ["alpha v2"]
+    assert reader.stats()["reloads"] == 1
+
+
+def test_a_generation_removed_while_reading_is_skipped_for_the_current_one(tmp_path, embeddings, monkeypatch):
+    manager = IndexManager(embeddings)
+    manager.upsert([("a", "alpha", None)])
+    manager.save(tmp_path)
+    stale = current_generation(tmp_path)
+    read_generation = index_manager._read_generation
+
+    def racing_read(path):
+        if path.name == stale:
+            # Two newer saves land while this one is being read, removing it
+            for text in ("beta", "gamma"):
+                manager.upsert([("a", text, None)])
+                manager.save(tmp_path)
+        return read_generation(path)
+
+    monkeypatch.setattr(index_manager, "_read_generation", racing_read)
+    generation, state = index_manager._read_state(tmp_path)
+    assert generation == current_generation(tmp_path) != stale
+    assert state["rows"][state["index"].ntotal - 1][1].page_content == "gamma"
+
+
+def test_from_vectorstore_uses_the_requested_spec(embeddings):
+    vectorstore = FAISS.from_texts(["alpha", "beta"], embeddings, metadatas=[{"id": "x"}, {}])
+    manager = IndexManager.from_vectorstore(vectorstore, "fp16")
+    assert manager.spec == "fp16" and "x" in manager.live
+    assert texts(manager, embeddings.embed_query, "beta", k=1) == ["beta"]
@@ -0,0 +1,61 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from ingest import ingest, iter_batches, iter_chunks, iter_corpus_chunks
+
+
+class SlowEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return self.embed_documents(texts)
+
+
+def test_chunks_cover_the_file_with_overlap_and_break_on_spaces(tmp_path):
+    words = [f"w{i:04d}" for i in range(2000)]
+    path = tmp_path / "doc.txt"
+    path.write_text(" ".join(words), encoding="utf-8")
+    chunks = [text for _, text in iter_chunks(path, chunk_chars=300, overlap_chars=50)]
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert all(set(chunk.split()) <= set(words) for chunk in chunks)  # no word cut in half
+    seen = [word for chunk in chunks for word in chunk.split()]
+    assert set(seen) == set(words)
+    assert len(seen) > len(words)  # consecutive chunks overlap
+
+
+def test_batches_respect_token_and_item_limits():
+    chunks = [("x" * 400, {"i": i}) for i in range(10)]  # about 100 tokens each
+    batches = list(iter_batches(chunks, max_tokens=250, max_items=3))
+    assert [len(batch) for batch in batches] == [2, 2, 2, 2, 2]
+    assert [len(batch) for batch in iter_batches(chunks, max_tokens=10_000, max_items=3)] == [3, 3, 3, 1]
+    assert [metadata["i"] for batch in batches for _, metadata in batch] == list(range(10))
+
+
+def test_every_chunk_is_embedded_with_its_metadata(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.txt").write_text(f"file {name} " * 200, encoding="utf-8")
+    (tmp_path / "skipped.md").write_text("not matched by the glob", encoding="utf-8")
+    chunks = list(iter_corpus_chunks([tmp_path], chunk_chars=200, overlap_chars=20))
+    embeddings = SlowEmbeddings()
+    vectorstore, stats = asyncio.run(ingest(iter(chunks), embeddings, concurrency=2, max_items=2,
+                                            report_every=0))
+    assert vectorstore.index.ntotal == stats.chunks == len(chunks)
+    assert stats.batches == embeddings.calls == (len(chunks) + 1) // 2
+    assert 1 <= stats.peak_in_flight <= 2
+    sources = {doc.metadata["source"] for doc in vectorstore.docstore._dict.values()}
+    assert sources == {str(tmp_path / "a.txt"), str(tmp_path / "b.txt")}
+
+
+def test_empty_corpus_creates_no_store(tmp_path):
+    vectorstore, stats = asyncio.run(ingest(iter([]), SlowEmbeddings(), report_every=0))
+    assert vectorstore is None and stats.chunks == 0
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import signal
+
+from mcp_server import ToolServer, parse_address, run_server
+
+
+def test_addresses():
+    assert parse_address("127.0.0.1:8765") == ("127.0.0.1", 8765)
+    assert parse_address(":8765") == ("127.0.0.1", 8765)
+    assert parse_address("/tmp/mcp.sock") == "/tmp/mcp.sock"
+
+
+async def serve_until_sigterm():
+    serving = asyncio.ensure_future(run_server(ToolServer([], cache=None), "127.0.0.1:0"))
+    await asyncio.sleep(0.1)
+    os.kill(os.getpid(), signal.SIGTERM)
+    await asyncio.wait_for(serving, 5)
+
+
+def test_sigterm_stops_the_server(capsys):
+    asyncio.run(serve_until_sigterm())
+    assert "listening on 127.0.0.1:0" in capsys.readouterr().out
+    assert signal.getsignal(signal.SIGTERM) == signal.SIG_DFL
+
+
+def test_loops_without_signal_handlers_fall_back_to_signal_signal(monkeypatch):
+    def unsupported(self, *args):
+        raise NotImplementedError  # as on Windows event loops
+
+    loop = asyncio.new_event_loop()
+    loop.close()
+    monkeypatch.setattr(type(loop), "add_signal_handler", unsupported)
+    installed = []
+    real_signal = signal.signal
+
+    def spy(signum, handler):
+        if signum == signal.SIGTERM:
+            installed.append(handler)
+        return real_signal(signum, handler)
+
+    monkeypatch.setattr(signal, "signal", spy)
+    asyncio.run(serve_until_sigterm())
+    assert len(installed) == 2 and installed[-1] == signal.SIG_DFL  # installed, then restored
+    assert signal.getsignal(signal.SIGTERM) == signal.SIG_DFL
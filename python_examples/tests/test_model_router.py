@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from model_router import ModelRouter, load_price_table
+
+EASY = "Classify the sentiment of: the service was quick and friendly."
+HARD = "Compare LangChain and Spring AI for a bank's support agent and evaluate the trade-offs."
+
+
+def test_prices_are_read_from_the_dashboard():
+    prices = load_price_table()
+    assert prices["GPT-4 Turbo"] == (0.01, 0.03)
+    assert "GPT-4o mini" not in prices  # priced in MODEL_PROFILES instead
+
+
+def test_easy_and_hard_prompts_route_to_different_openai_models():
+    router = ModelRouter.build()
+    assert {m["provider"] for m in router.models.values()} == {"openai"}
+    easy, hard = router.decide(EASY), router.decide(HARD)
+    assert easy["difficulty"] < 0.3 < 0.7 < hard["difficulty"]
+    assert easy["model"] == "gpt-4o-mini"
+    assert hard["model"] == "gpt-4o"
+    assert easy["est_cost_usd"] < hard["est_cost_usd"] < hard["baseline_cost_usd"]
+    assert router.stats()["by_model"] == {"gpt-4o-mini": 1, "gpt-4o": 1}
+
+
+def test_max_quality_follows_the_candidates():
+    assert ModelRouter.build().max_quality == 0.92
+    assert ModelRouter.build({"gateway": True}).max_quality == 0.93
+    assert ModelRouter.build({"max_quality": 0.8}).max_quality == 0.8
+
+
+def test_latency_objective_and_cap():
+    router = ModelRouter.build({"objective": "latency", "gateway": True})
+    assert router.decide(EASY)["model"] == "gemini-2.0-flash"
+    capped = ModelRouter.build({"max_latency_ms": 1000})
+    assert capped.decide(HARD)["model"] == "gpt-4o"
+    # Nothing meets the policy: the best model wins over the latency cap
+    strict = ModelRouter.build({"max_latency_ms": 100})
+    assert strict.decide(HARD)["reason"].startswith("no model meets the policy")
+
+
+def test_decisions_are_logged_only_when_asked(tmp_path, capsys):
+    ModelRouter.build().decide(EASY)
+    assert capsys.readouterr().err == ""
+    ModelRouter.build(log="-").decide(EASY)
+    assert json.loads(capsys.readouterr().err)["model"] == "gpt-4o-mini"
+    router = ModelRouter.build(log=str(tmp_path / "routing.jsonl"))
+    router.decide(EASY)
+    router.decide(HARD)
+    router.close()
+    lines = (tmp_path / "routing.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["model"] for line in lines] == ["gpt-4o-mini", "gpt-4o"]
+
+
+def test_bad_policy_is_rejected():
+    with pytest.raises(ValueError, match="objective"):
+        ModelRouter.build({"objective": "quality"})
+    with pytest.raises(ValueError, match="baseline model"):
+        ModelRouter.build(baseline="gpt-5")
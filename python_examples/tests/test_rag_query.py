@@ -0,0 +1,76 @@
+import asyncio
+import os
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+os.environ.setdefault("OPENAI_API_KEY", "test")  # clients are built at import; none is called
+
+import compact_store
+import rag_query
+
+TEXTS = [
+    "Optimum AI Lab builds autonomous AI agents for enterprise applications.",
+    "We specialize in LLM frameworks comparison and optimization.",
+    "Our dashboard provides comprehensive analysis of Python and Java frameworks.",
+]
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(rag_query, "_embeddings", DeterministicFakeEmbedding(size=16))
+
+
+@pytest.mark.parametrize("compact", ["keep", "fp16", None])
+def test_saved_index_loads_back_with_the_same_results(tmp_path, compact):
+    built = rag_query.build_vectorstore(TEXTS, tmp_path, compact=compact)
+    loaded = rag_query.load_vectorstore(tmp_path)
+    assert compact_store.is_compact(tmp_path) == (compact is not None)
+    for text in TEXTS:
+        expected = built.similarity_search(text, k=1)[0].page_content
+        assert loaded.similarity_search(text, k=1)[0].page_content == expected == text
+
+
+def test_rebuilding_without_compaction_ignores_a_stale_compact_docstore(tmp_path):
+    rag_query.build_vectorstore(TEXTS, tmp_path, compact="keep")
+    rag_query.build_vectorstore(TEXTS[:2], tmp_path, compact=None)
+    assert not compact_store.is_compact(tmp_path)
+    assert rag_query.load_vectorstore(tmp_path).index.ntotal == 2
+
+
+def test_questions_are_read_from_jsonl_or_plain_lines():
+    lines = ['{"id": "q1", "question": "What?"}', "", "Plain text?", '"quoted"', '{"question": "No id"}']
+    assert list(rag_query.iter_questions(lines)) == [
+        {"id": "q1", "question": "What?"},
+        {"question": "Plain text?", "id": 3},
+        {"question": "quoted", "id": 4},
+        {"question": "No id", "id": 5},
+    ]
+
+
+def collect(records, concurrency, runnable):
+    async def main():
+        return [result async for result in rag_query.answer_questions(records, concurrency, runnable)]
+    return asyncio.run(main())
+
+
+def test_batch_stays_within_concurrency_and_reports_errors_per_record():
+    active = {"now": 0, "peak": 0}
+
+    async def answer(question):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        if question == "boom":
+            raise RuntimeError("model failed")
+        return question.upper()
+
+    records = [{"id": i, "question": f"q{i}"} for i in range(10)]
+    records += [{"id": "bad"}, {"id": "err", "question": "boom"}]
+    results = {r["id"]: r for r in collect(iter(records), 3, RunnableLambda(answer))}
+    assert active["peak"] == 3
+    assert [results[i]["answer"] for i in range(10)] == [f"Q{i}" for i in range(10)]
+    assert "no 'question'" in results["bad"]["error"]
+    assert "model failed" in results["err"]["error"]
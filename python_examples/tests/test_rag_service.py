@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from langchain_core.runnables import RunnableLambda
+
+from rag_service import LatencyHistogram, RagService
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = LatencyHistogram()
+    for seconds in (0.001, 0.02, 0.02, 30.0):
+        histogram.observe(seconds)
+    lines = histogram.render("latency", 'endpoint="/query"')
+    assert 'latency_bucket{endpoint="/query",le="0.005"} 1' in lines
+    assert 'latency_bucket{endpoint="/query",le="0.025"} 3' in lines
+    assert 'latency_bucket{endpoint="/query",le="10.0"} 3' in lines
+    assert 'latency_bucket{endpoint="/query",le="+Inf"} 4' in lines
+    assert lines[-1] == 'latency_count{endpoint="/query"} 4'
+
+
+def answer(question):
+    if question == "boom":
+        raise RuntimeError("model down")
+    return question.upper()
+
+
+async def exchange(service, requests):
+    """Send raw HTTP requests over one keep-alive connection; return (status, body) pairs."""
+    server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    try:
+        for method, path, body in requests:
+            writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n"
+                         .encode("latin-1") + body)
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.lower()] = value.strip()
+            responses.append((status, await reader.readexactly(int(headers["content-length"]))))
+    finally:
+        writer.close()
+        server.close()
+        await server.wait_closed()
+    return responses
+
+
+def test_queries_errors_and_metrics_over_one_connection():
+    service = RagService(RunnableLambda(answer), stats=lambda: {"cache": {"hits": 3, "model": "x", "on": True}})
+    responses = asyncio.run(exchange(service, [
+        ("POST", "/query", b'{"question": "hi"}'),
+        ("POST", "/query", b"not json"),
+        ("GET", "/query", b""),
+        ("POST", "/query", b'{"question": "boom"}'),
+        ("GET", "/nowhere", b""),
+        ("GET", "/metrics", b""),
+    ]))
+    assert [status for status, _ in responses] == [200, 400, 405, 500, 404, 200]
+    assert json.loads(responses[0][1])["answer"] == "HI"
+    assert "model down" in json.loads(responses[3][1])["error"]
+    metrics = responses[-1][1].decode("utf-8")
+    assert 'rag_requests_total{endpoint="/query",status="200"} 1' in metrics
+    assert 'rag_requests_total{endpoint="/query",status="500"} 1' in metrics
+    assert 'rag_requests_total{endpoint="other",status="404"} 1' in metrics
+    assert "rag_cache_hits 3" in metrics
+    assert "rag_cache_model" not in metrics and "rag_cache_on" not in metrics
+    assert "rag_requests_in_flight 1" in metrics  # the /metrics request itself
@@ -0,0 +1,58 @@
+import pytest
+
+from rate_limiter import AdaptiveLimiter, TokenBucket
+
+
+def test_bucket_starts_full_and_is_charged():
+    bucket = TokenBucket(per_minute=600, burst_s=1.0)  # 10/s, holds 10
+    assert bucket.capacity == 10.0
+    assert bucket.shortfall(4, bucket.updated) == 0.0
+    bucket.take(4)
+    assert bucket.available == 6.0
+    assert bucket.shortfall(8, bucket.updated) == pytest.approx(0.2)
+
+
+def test_bucket_refills_at_the_rate_up_to_capacity():
+    bucket = TokenBucket(per_minute=600, burst_s=1.0)
+    start = bucket.updated
+    bucket.take(10)
+    assert bucket.shortfall(5, start + 0.3) == pytest.approx(0.2)
+    assert bucket.available == pytest.approx(3.0)
+    bucket.shortfall(1, start + 60.0)
+    assert bucket.available == 10.0
+
+
+def test_oversized_request_is_admitted_when_full_and_charged_in_full():
+    bucket = TokenBucket(per_minute=60, burst_s=1.0)  # 1/s, holds 1
+    start = bucket.updated
+    assert bucket.shortfall(5, start) == 0.0
+    bucket.take(5)
+    assert bucket.available == -4.0
+    # The next request waits until the debt is repaid
+    assert bucket.shortfall(1, start) == pytest.approx(5.0)
+    assert bucket.shortfall(1, start + 5.0) == 0.0
+
+
+def test_long_run_rate_does_not_exceed_the_limit():
+    bucket = TokenBucket(per_minute=600, burst_s=1.0)
+    now, taken = bucket.updated, 0
+    end = now + 60.0
+    while now < end:
+        wait = bucket.shortfall(25, now)
+        if wait:
+            now += wait
+            continue
+        bucket.take(25)
+        taken += 25
+    # One full bucket up front plus 60 s of refill
+    assert taken <= 600 + 10 + 25
+
+
+def test_throttling_halves_concurrency_and_latency_is_tracked_per_key():
+    limiter = AdaptiveLimiter(initial_concurrency=8)
+    limiter.observe(200, 0.1, key="/chat/completions:fast")
+    limiter.observe(200, 2.0, key="/chat/completions:slow")
+    assert limiter.limit > 8  # neither key is slow against its own baseline
+    limiter.observe(429, 0.1, key="/chat/completions:fast")
+    assert limiter.limit < 8
+    assert set(limiter.latency) == {"/chat/completions:fast", "/chat/completions:slow"}
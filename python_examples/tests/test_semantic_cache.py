@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableLambda
+
+import semantic_cache as semantic_cache_module
+from semantic_cache import SemanticCache, query_vector
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(semantic_cache_module, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_close_questions_hit_and_distant_ones_miss():
+    cache = SemanticCache(None, threshold=0.95)
+    cache.store([1.0, 0.0], "q", "answer")
+    assert cache.lookup([10.0, 0.1])[:2] == ("answer", pytest.approx(0.99995, abs=1e-4))
+    answer, similarity, _ = cache.lookup([1.0, 1.0])
+    assert answer is None and similarity == pytest.approx(0.7071, abs=1e-4)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SemanticCache(None, ttl_seconds=60.0)
+    cache.store([1.0, 0.0], "q", "answer")
+    clock.value += 59.0
+    assert cache.lookup([1.0, 0.0])[0] == "answer"
+    clock.value += 2.0
+    assert cache.lookup([1.0, 0.0])[0] is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_replaced_when_full(clock):
+    cache = SemanticCache(None, max_entries=2)
+    cache.store([1.0, 0.0, 0.0], "a", "A")
+    clock.value += 1
+    cache.store([0.0, 1.0, 0.0], "b", "B")
+    clock.value += 1
+    cache.lookup([1.0, 0.0, 0.0])  # "b" is now the least recently used
+    clock.value += 1
+    cache.store([0.0, 0.0, 1.0], "c", "C")
+    assert [cache.lookup(v)[0] for v in ([1.0, 0, 0], [0, 1.0, 0], [0, 0, 1.0])] == ["A", None, "C"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_a_version_change_clears_the_cache():
+    source = SimpleNamespace(version=1)
+    cache = SemanticCache(None, version=lambda: source.version)
+    cache.store([1.0, 0.0], "q", "old answer")
+    assert cache.lookup([1.0, 0.0])[0] == "old answer"
+    source.version = 2
+    assert cache.lookup([1.0, 0.0])[0] is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_an_answer_computed_against_an_old_version_is_not_stored():
+    source = SimpleNamespace(version=1)
+    cache = SemanticCache(None, version=lambda: source.version)
+    answer, _, version = cache.lookup([1.0, 0.0])
+    assert answer is None and version == 1
+    source.version = 2  # the index changes while the answer is being generated
+    cache.store([1.0, 0.0], "q", "answer from version 1", version)
+    assert cache.lookup([1.0, 0.0])[0] is None
+    assert cache.stats()["stale_stores"] == 1
+
+
+class AxisEmbeddings(Embeddings):
+    """Questions starting with the same letter embed to the same vector."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        vector = [0.0] * 26
+        vector[ord(text[0].lower()) - ord("a")] = 1.0
+        return vector
+
+
+def test_wrapped_chain_runs_only_on_misses_and_sees_the_question_vector():
+    embeddings = AxisEmbeddings()
+    seen = []
+
+    def chain(question):
+        seen.append(query_vector(question))
+        return f"answer to {question}"
+
+    cached = SemanticCache(lambda: embeddings).wrap(RunnableLambda(chain))
+    assert cached.invoke("alpha") == "answer to alpha"
+    assert cached.invoke("apple") == "answer to alpha"
+    assert cached.invoke("beta") == "answer to beta"
+    assert len(seen) == 2 and seen[0][0] == 1.0  # retrieval can reuse the lookup's vector
+    assert embeddings.calls == 3
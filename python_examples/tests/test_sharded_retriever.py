@@ -0,0 +1,47 @@
+import asyncio
+
+import faiss
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from sharded_retriever import ShardedIndex, merge_top_k, write_shards
+
+
+def test_partial_lists_merge_into_the_global_top_k():
+    shard0 = [[(0.1, 0, "a", {}), (0.5, 1, "b", {})]]
+    shard1 = [[(0.2, 7, "c", {}), (0.3, 8, "d", {})]]
+    assert [row for _, row, _, _ in merge_top_k([shard0, shard1], 3)[0]] == [0, 7, 8]
+
+
+def test_more_shards_than_vectors_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="into 3 shards"):
+        write_shards(np.zeros((2, 4), dtype=np.float32), [], tmp_path, 3)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    vectors = np.random.default_rng(0).standard_normal((120, 8)).astype(np.float32)
+    documents = [Document(page_content=f"doc {i}", metadata={"i": i}) for i in range(120)]
+    return vectors, documents
+
+
+def test_sharded_search_matches_searching_the_whole_index(tmp_path, corpus):
+    vectors, documents = corpus
+    manifest = write_shards(vectors, documents, tmp_path, 3)
+    assert manifest["offsets"] == [0, 40, 80] and manifest["documents"] == 120
+    flat = faiss.IndexFlatL2(8)
+    flat.add(vectors)
+    queries = vectors[[5, 50, 110]] + 0.01
+    _, expected = flat.search(queries, 5)
+
+    index = ShardedIndex(tmp_path)
+    try:
+        results = index.search_batch(queries, k=5)
+        assert [[int(doc.id) for doc in docs] for docs in results] == expected.tolist()
+        assert results[0][0].page_content == "doc 5" and results[0][0].metadata == {"i": 5}
+        docs = asyncio.run(index.asearch(queries[1], k=5))
+        assert [int(doc.id) for doc in docs] == expected[1].tolist()
+        assert index.stats() == {"shards": 3, "documents": 120, "queries": 4}
+    finally:
+        index.close()
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from single_flight import AsyncSingleFlightTransport, SingleFlight, SingleFlightTransport
+
+URL = "http://upstream.test/v1/embeddings"
+
+
+class Body(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """An unread response body, as a network transport returns it."""
+
+    def __init__(self, content):
+        self.content = content
+
+    def __iter__(self):
+        yield self.content
+
+    async def __aiter__(self):
+        yield self.content
+
+
+class CountingTransport(httpx.BaseTransport):
+    """Answers after `release` is set, echoing the request body."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def handle_request(self, request):
+        self.calls += 1
+        self.release.wait(5)
+        return httpx.Response(200, stream=Body(request.content))
+
+
+class AsyncCountingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+
+    async def handle_async_request(self, request):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return httpx.Response(200, stream=Body(request.content))
+
+
+def body(**fields):
+    return json.dumps({"model": "text-embedding-3-small", **fields}).encode("utf-8")
+
+
+def test_identical_async_requests_share_one_upstream_call():
+    group, upstream = SingleFlight(), AsyncCountingTransport()
+
+    async def main():
+        async with httpx.AsyncClient(transport=AsyncSingleFlightTransport(group, upstream)) as client:
+            return await asyncio.gather(*(client.post(URL, content=body(input="hi")) for _ in range(5)))
+
+    responses = asyncio.run(main())
+    assert upstream.calls == 1
+    assert [r.content for r in responses] == [body(input="hi")] * 5
+    assert group.stats()["coalesced"] == 4
+
+
+def test_different_bodies_and_streaming_requests_are_not_coalesced():
+    group, upstream = SingleFlight(), AsyncCountingTransport()
+
+    async def main():
+        async with httpx.AsyncClient(transport=AsyncSingleFlightTransport(group, upstream)) as client:
+            await asyncio.gather(
+                client.post(URL, content=body(input="a")),
+                client.post(URL, content=body(input="b")),
+                client.post(URL, content=body(input="c", stream=True)),
+                client.post(URL, content=body(input="c", stream=True)),
+            )
+
+    asyncio.run(main())
+    assert upstream.calls == 4
+    assert group.stats()["coalesced"] == 0
+
+
+def test_followers_see_the_leaders_error():
+    group, upstream = SingleFlight(), AsyncCountingTransport(error=httpx.ConnectError("refused"))
+
+    async def main():
+        async with httpx.AsyncClient(transport=AsyncSingleFlightTransport(group, upstream)) as client:
+            return await asyncio.gather(*(client.post(URL, content=body(input="x")) for _ in range(3)),
+                                        return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert upstream.calls == 1
+    assert all(isinstance(r, httpx.ConnectError) for r in results)
+
+
+def test_later_requests_go_upstream_again():
+    group, upstream = SingleFlight(), AsyncCountingTransport()
+
+    async def main():
+        async with httpx.AsyncClient(transport=AsyncSingleFlightTransport(group, upstream)) as client:
+            await client.post(URL, content=body(input="hi"))
+            await client.post(URL, content=body(input="hi"))
+
+    asyncio.run(main())
+    assert upstream.calls == 2
+
+
+def test_identical_threaded_requests_share_one_upstream_call():
+    group, upstream = SingleFlight(), CountingTransport()
+    client = httpx.Client(transport=SingleFlightTransport(group, upstream))
+    results = [None] * 4
+
+    def post(i):
+        results[i] = client.post(URL, content=body(input="hi")).content
+
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    # Hold the leader upstream until every thread has joined the flight
+    deadline = time.monotonic() + 5
+    while group.requests < 4 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    upstream.release.set()
+    for thread in threads:
+        thread.join(5)
+    client.close()
+    assert upstream.calls == 1
+    assert results == [body(input="hi")] * 4
+    assert group.stats() == pytest.approx({"requests": 4, "upstream": 1, "coalesced": 3, "coalesced_rate": 0.75})
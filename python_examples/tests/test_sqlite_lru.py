@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=2)
+    cache.put_many("m", [("a", [1.0]), ("b", [2.0])])
+    cache.get_many("m", ["a"])  # "b" is now the least recently used
+    cache.put_many("m", [("c", [3.0])])
+    assert set(cache.get_many("m", ["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_totals_follow_overwrites_and_survive_reopening(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = EmbeddingCache(path, max_entries=None, max_bytes=10_000)
+    cache.put_many("m", [("a", [0.0] * 100), ("b", [0.0] * 100)])
+    cache.put_many("m", [("a", [0.0] * 10)])  # replacing a row releases its old size
+    total = cache._conn.execute("SELECT SUM(size) FROM embeddings").fetchone()[0]
+    assert (len(cache), cache.stats()["bytes"]) == (2, total)
+    cache.close()
+    reopened = EmbeddingCache(path, max_entries=None, max_bytes=10_000)
+    assert (len(reopened), reopened.stats()["bytes"]) == (2, total)
+
+
+def test_byte_bound_evicts_down_to_the_limit(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=None, max_bytes=1000)
+    cache.put_many("m", [(str(i), [0.0] * 100) for i in range(5)])  # 400 bytes each
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] <= 1000
+    assert set(cache.get_many("m", [str(i) for i in range(5)])) == {"3", "4"}
+
+
+
+
+def test_a_table_with_another_schema_is_left_alone(tmp_path):
+    path = tmp_path / "app.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE embeddings (id INTEGER PRIMARY KEY, note TEXT)")
+    conn.execute("INSERT INTO embeddings (note) VALUES ('keep me')")
+    conn.commit()
+    conn.close()
+    with pytest.raises(ValueError, match="delete the file"):
+        EmbeddingCache(path)
+    assert sqlite3.connect(path).execute("SELECT note FROM embeddings").fetchall() == [("keep me",)]
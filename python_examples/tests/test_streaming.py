@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+import streaming as streaming_module
+from stats import percentile, summarize_latencies
+from streaming import StreamTimer, astream_with_timing, chunk_text, stream_with_timing
+
+
+def test_percentiles_interpolate_between_ranks():
+    assert percentile([], 50) == 0.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+    assert summarize_latencies([0.001, 0.003]) == {"p50_ms": 2.0, "p95_ms": 2.9, "p99_ms": 2.98, "mean_ms": 2.0}
+
+
+def test_tool_call_chunks_count_as_visible_text():
+    assert chunk_text("plain") == "plain"
+    assert chunk_text(AIMessageChunk(content="hi")) == "hi"
+    chunk = AIMessageChunk(content="", tool_call_chunks=[{"name": "add", "args": '{"a": 1', "id": "1", "index": 0}])
+    assert chunk_text(chunk) == 'add{"a": 1'
+
+
+def test_timer_reports_ttft_and_inter_token_gaps(monkeypatch):
+    ticks = iter([0.0, 0.2, 0.25, 0.35, 0.4])
+    monkeypatch.setattr(streaming_module, "time", SimpleNamespace(perf_counter=lambda: next(ticks)))
+    timer = StreamTimer()
+    for _ in range(3):
+        timer.token()
+    summary = timer.summary()
+    assert summary["ttft_ms"] == 200.0
+    assert summary["itl_gaps_ms"] == [50.0, 100.0]
+    assert summary["itl_mean_ms"] == 75.0
+    assert (summary["total_ms"], summary["tokens"]) == (400.0, 3)
+
+
+def test_timer_without_tokens_has_no_ttft():
+    assert StreamTimer().summary()["ttft_ms"] is None
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_streamed_output_is_accumulated_and_every_token_is_seen(use_async):
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="the sky is blue")]))
+    tokens = []
+    if use_async:
+        final, timing = asyncio.run(astream_with_timing(model, "why?", on_token=tokens.append))
+    else:
+        final, timing = stream_with_timing(model, "why?", on_token=tokens.append)
+    assert final.content == "the sky is blue" == "".join(tokens)
+    assert timing["tokens"] == len(tokens) > 1
+    assert timing["ttft_ms"] <= timing["total_ms"]
@@ -0,0 +1,126 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.tools import tool
+
+import tool_cache as tool_cache_module
+from tool_cache import ToolCache, cacheable, canonical_key
+
+
+@tool
+def multiply(a: int, b: int) -> int:
+    """Multiply two integers."""
+    return a * b
+
+
+@tool
+def add(a: int, b: int) -> int:
+    """Add two integers."""
+    return a + b
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(tool_cache_module, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_canonical_key_ignores_key_order_and_int_valued_floats():
+    assert canonical_key(multiply, {"a": 15.0, "b": 8}) == canonical_key(multiply, {"b": 8, "a": 15})
+
+
+def test_canonical_key_separates_tools_and_arguments():
+    assert canonical_key(multiply, {"a": 2, "b": 3}) != canonical_key(add, {"a": 2, "b": 3})
+    assert canonical_key(multiply, {"a": 2, "b": 3}) != canonical_key(multiply, {"a": 3, "b": 2})
+
+
+def test_canonical_key_rejects_arguments_the_schema_rejects():
+    with pytest.raises(ValueError):
+        canonical_key(multiply, {"a": 1.5, "b": 2})
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = ToolCache()
+    cache.store("k", 42, ttl=60)
+    clock.value += 59
+    assert cache.lookup("multiply", "k") == (True, 42)
+    clock.value += 1
+    assert cache.lookup("multiply", "k") == (False, None)
+    assert cache.counters["multiply"] == {"hits": 1, "misses": 0, "expired": 1}
+
+
+def test_entry_without_ttl_never_expires(clock):
+    cache = ToolCache()
+    cache.store("k", 42, ttl=None)
+    clock.value += 10 ** 9
+    assert cache.lookup("multiply", "k") == (True, 42)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ToolCache(max_entries=2)
+    cache.store("a", 1, ttl=None)
+    cache.store("b", 2, ttl=None)
+    assert cache.lookup("t", "a") == (True, 1)  # "b" is now the least recently used
+    cache.store("c", 3, ttl=None)
+    assert cache.lookup("t", "b") == (False, None)
+    assert cache.lookup("t", "a") == (True, 1)
+    assert cache.lookup("t", "c") == (True, 3)
+    assert cache.evictions == 1
+
+
+def test_identical_concurrent_calls_run_once():
+    cache = ToolCache()
+    pure = cacheable()(multiply)
+    runs = []
+
+    async def run():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return 120
+
+    async def main():
+        first = await asyncio.gather(*(cache.call(pure, {"a": 15, "b": 8.0}, run) for _ in range(5)))
+        again = await cache.call(pure, {"b": 8, "a": 15}, run)
+        return first, again
+
+    first, again = asyncio.run(main())
+    assert len(runs) == 1
+    assert [value for value, _ in first] == [120] * 5
+    assert sorted(cached for _, cached in first) == [False, True, True, True, True]
+    assert again == (120, True)
+
+
+def test_tools_not_marked_cacheable_always_run():
+    cache = ToolCache()
+    runs = []
+
+    async def run():
+        runs.append(1)
+        return 5
+
+    async def main():
+        return [await cache.call(add, {"a": 2, "b": 3}, run) for _ in range(2)]
+
+    assert asyncio.run(main()) == [(5, False), (5, False)]
+    assert len(runs) == 2
+
+
+def test_failed_calls_are_not_cached():
+    cache = ToolCache()
+    pure = cacheable()(add)
+    outcomes = iter([RuntimeError("upstream down"), 5])
+
+    async def run():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await cache.call(pure, {"a": 2, "b": 3}, run)
+        return await cache.call(pure, {"a": 2, "b": 3}, run)
+
+    assert asyncio.run(main()) == (5, False)
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.tools import tool
+
+from tool_registry import ToolRegistry, tool_text
+
+VOCABULARY = ["invoice", "order", "ticket", "weather", "refund"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Vocabulary word counts; embedding the registry is slow, to widen any race."""
+
+    def __init__(self):
+        self.document_batches = 0
+
+    def _embed(self, text):
+        text = text.lower()
+        return [float(text.count(word)) for word in VOCABULARY]
+
+    def embed_documents(self, texts):
+        self.document_batches += 1
+        time.sleep(0.05)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def make_tool(name, description):
+    def run(value: str) -> str:
+        return value
+
+    return tool(name, description=description)(run)
+
+
+TOOLS = [make_tool(f"{word}_tool", f"Work with a {word}.") for word in VOCABULARY]
+
+
+def registry(embeddings, top_k=2):
+    return ToolRegistry(TOOLS, lambda: embeddings, bind=lambda tools: tuple(t.name for t in tools), top_k=top_k)
+
+
+def test_the_most_similar_tools_are_bound():
+    reg = registry(KeywordEmbeddings(), top_k=1)
+    bound, selected = reg.bound("Where is my refund?")
+    assert bound == ("refund_tool",) and selected == [TOOLS[4]]
+    assert "refund tool" in tool_text(TOOLS[4])
+    stats = reg.stats()
+    assert stats["schema_tokens_saved"] == stats["schema_tokens_all"] - reg.schema_tokens["refund_tool"]
+
+
+def test_small_registries_bind_everything_without_embedding():
+    embeddings = KeywordEmbeddings()
+    assert registry(embeddings, top_k=5).select("anything") == TOOLS
+    assert embeddings.document_batches == 0
+
+
+def test_concurrent_first_async_queries_embed_the_registry_once():
+    embeddings = KeywordEmbeddings()
+    reg = registry(embeddings)
+
+    async def main():
+        return await asyncio.gather(*(reg.abind(f"{word} question") for word in VOCABULARY))
+
+    results = asyncio.run(main())
+    assert embeddings.document_batches == 1
+    assert [selected[0].name for _, selected in results] == [f"{word}_tool" for word in VOCABULARY]
+
+
+def test_concurrent_first_threaded_queries_embed_the_registry_once():
+    embeddings = KeywordEmbeddings()
+    reg = registry(embeddings)
+    threads = [threading.Thread(target=reg.select, args=(f"{word} question",)) for word in VOCABULARY]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert embeddings.document_batches == 1
+    assert reg.stats()["queries"] == len(VOCABULARY)
@@ -0,0 +1,127 @@
+"""
+Memoization for Pure Tools
+Author: Optimum AI Lab
+Description: Agents repeat the same tool calls, within one conversation and
+across many. A tool declared @cacheable (optionally with a TTL) has its
+results memoized by agent_loop.ToolExecutor. The key is the tool name plus
+its arguments in canonical form: arguments are validated by the tool's own
+schema first (so {"a": 15.0} and {"a": 15} for an int parameter, or
+reordered keys, hit the same entry), then serialized as sorted JSON. The
+cache is process-wide and LRU-bounded. It is shared by every executor, so by
+every agent session, and by every client of the MCP server. Identical calls
+already in flight are coalesced into one execution. Failed calls are never
+cached. Hits and misses are counted per tool.
+
+Usage:
+    @cacheable(ttl=60)
+    @tool
+    async def get_exchange_rate(base: str, quote: str) -> float: ...
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def cacheable(ttl=None):
+    """Declare a tool pure enough to memoize, for `ttl` seconds (None = until evicted)."""
+    def mark(tool):
+        tool.metadata = dict(tool.metadata or {}, cacheable=True, cache_ttl=ttl)
+        return tool
+    return mark
+
+
+def canonical_key(tool, args):
+    """Cache key for a call: schema-validated arguments as sorted JSON."""
+    schema = tool.args_schema
+    if hasattr(schema, "model_validate"):
+        args = schema.model_validate(args).model_dump()
+    return json.dumps([tool.name, args], sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ToolCache:
+    """Thread-safe LRU of tool results with per-entry expiry and per-tool counters."""
+
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at or None)
+        self._pending = {}
+        self.counters = {}
+        self.evictions = 0
+
+    def _count(self, name, outcome):
+        counters = self.counters.setdefault(name, {"hits": 0, "misses": 0, "expired": 0})
+        counters[outcome] += 1
+
+    def lookup(self, name, key):
+        """(True, value) on a live hit, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and time.monotonic() >= entry[1]:
+                del self._entries[key]
+                self._count(name, "expired")
+                entry = None
+            if entry is None:
+                return False, None
+            self._entries.move_to_end(key)
+            self._count(name, "hits")
+            return True, entry[0]
+
+    def store(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def call(self, tool, args, run):
+        """(result, cached) for `await run()`, memoized if `tool` is @cacheable."""
+        metadata = tool.metadata or {}
+        if not metadata.get("cacheable"):
+            return await run(), False
+        try:
+            key = canonical_key(tool, args)
+        except Exception:
+            return await run(), False  # invalid arguments: let the tool report them
+        hit, value = self.lookup(tool.name, key)
+        if hit:
+            return value, True
+        # Coalesce with an identical call already running on this event loop
+        pending_key = (asyncio.get_running_loop(), key)
+        task = self._pending.get(pending_key)
+        if task is not None:
+            with self._lock:
+                self._count(tool.name, "hits")
+            return await asyncio.shield(task), True
+        with self._lock:
+            self._count(tool.name, "misses")
+        task = self._pending[pending_key] = asyncio.ensure_future(run())
+
+        def finished(task):
+            self._pending.pop(pending_key, None)
+            if not task.cancelled() and task.exception() is None:
+                self.store(key, task.result(), metadata.get("cache_ttl"))
+
+        task.add_done_callback(finished)
+        return await asyncio.shield(task), False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            tools = {}
+            for name, counters in sorted(self.counters.items()):
+                lookups = counters["hits"] + counters["misses"]
+                tools[name] = dict(counters, hit_rate=round(counters["hits"] / lookups, 4) if lookups else 0.0)
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "evictions": self.evictions, "tools": tools}
+
+
+# The process-wide cache every ToolExecutor uses by default
+tool_cache = ToolCache()
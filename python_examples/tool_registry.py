@@ -0,0 +1,239 @@
+"""
+Tool Registry with Per-Query Tool Selection
+Author: Optimum AI Lab
+Description: bind_tools() sends the JSON schema of every bound tool with
+every model call, so a large registry costs thousands of input tokens per
+call and a longer time to first token. The registry serializes each tool's
+schema once and counts its tokens. It also embeds each tool's name,
+description and parameter names, in one batch on first use (through the
+persistent embedding cache, so only new tools are embedded on later runs).
+Each query is embedded and only the top-k tools by cosine similarity are
+bound. Bound runnables are cached per tool subset. stats() reports the schema
+tokens sent against binding everything, and the query-embedding time this
+costs.
+
+Usage:
+    registry = ToolRegistry(tools, get_embeddings, llm.bind_tools, top_k=8)
+    bound, selected = await registry.abind(query)
+
+    python tool_registry.py bench --tools 200 --top-k 5
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from context_packing import count_tokens
+
+
+def tool_text(tool):
+    """What gets embedded for a tool: its name, description and parameter names."""
+    params = ", ".join(convert_to_openai_tool(tool)["function"]["parameters"].get("properties", {}))
+    return f"{tool.name.replace('_', ' ')}: {tool.description} Parameters: {params}"
+
+
+class ToolRegistry:
+    """Cached tool schemas and description embeddings; binds the top-k tools per query.
+
+    `get_embeddings` is a zero-argument callable returning the Embeddings used
+    for tools and queries; it is only called on first use. `bind` turns a list
+    of tools into a runnable (e.g. llm.bind_tools).
+    """
+
+    def __init__(self, tools, get_embeddings, bind, top_k=8, model="gpt-4-turbo-preview"):
+        self.tools = list(tools)
+        self.get_embeddings = get_embeddings
+        self.bind = bind
+        self.top_k = top_k
+        self.schemas = {
+            tool.name: json.dumps(convert_to_openai_tool(tool), sort_keys=True, separators=(",", ":"))
+            for tool in self.tools
+        }
+        self.schema_tokens = {name: count_tokens(schema, model) for name, schema in self.schemas.items()}
+        self.all_tokens = sum(self.schema_tokens.values())
+        self._lock = threading.Lock()
+        self._embedding = threading.Lock()  # held while the tools are embedded, so that happens once
+        self._vectors = None  # (tools, dim) unit rows, embedded on first use
+        self._bound = {}  # sorted tool names -> bound runnable
+        self.queries = 0
+        self.tokens_bound = 0
+        self.embed_s = 0.0
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def _choose(self, vector):
+        scores = self._vectors @ self._normalize(vector)
+        top = np.argsort(-scores, kind="stable")[:self.top_k]
+        return [self.tools[i] for i in top]
+
+    def _record(self, selected, started):
+        with self._lock:
+            self.queries += 1
+            self.tokens_bound += sum(self.schema_tokens[tool.name] for tool in selected)
+            self.embed_s += time.perf_counter() - started
+        return selected
+
+    def warm_up(self):
+        """Embed the tool descriptions now rather than on the first query."""
+        if self._vectors is not None or len(self.tools) <= self.top_k:
+            return
+        with self._embedding:
+            if self._vectors is None:
+                self._vectors = self._normalize(
+                    self.get_embeddings().embed_documents([tool_text(t) for t in self.tools]))
+
+    def select(self, query):
+        """The top-k tools for `query`, most similar first (all tools if there are no more than k)."""
+        started = time.perf_counter()
+        if len(self.tools) <= self.top_k:
+            return self._record(self.tools, started)
+        self.warm_up()
+        return self._record(self._choose(self.get_embeddings().embed_query(query)), started)
+
+    async def aselect(self, query):
+        started = time.perf_counter()
+        if len(self.tools) <= self.top_k:
+            return self._record(self.tools, started)
+        if self._vectors is None:
+            # Concurrent first queries wait for one embedding of the registry
+            await asyncio.to_thread(self.warm_up)
+        return self._record(self._choose(await self.get_embeddings().aembed_query(query)), started)
+
+    def _bind(self, selected):
+        key = tuple(sorted(tool.name for tool in selected))
+        with self._lock:
+            bound = self._bound.get(key)
+            if bound is None:
+                bound = self._bound[key] = self.bind(selected)
+            return bound
+
+    def bound(self, query):
+        """(runnable with the query's tools bound, the tools)."""
+        selected = self.select(query)
+        return self._bind(selected), selected
+
+    async def abind(self, query):
+        selected = await self.aselect(query)
+        return self._bind(selected), selected
+
+    def stats(self):
+        with self._lock:
+            queries = self.queries
+            full = self.all_tokens * queries
+            return {
+                "tools": len(self.tools),
+                "top_k": self.top_k,
+                "queries": queries,
+                "schema_tokens_all": self.all_tokens,
+                "schema_tokens_bound_mean": round(self.tokens_bound / queries, 1) if queries else 0.0,
+                "schema_tokens_saved": full - self.tokens_bound,
+                "saved_ratio": round(1.0 - self.tokens_bound / full, 4) if full else 0.0,
+                "bound_variants": len(self._bound),
+                "select_ms_mean": round(self.embed_s / queries * 1000.0, 2) if queries else 0.0,
+            }
+
+
+# ============================================================================
+# BENCHMARK WITH A SYNTHETIC 200-TOOL REGISTRY
+# ============================================================================
+
+ACTIONS = ["create", "update", "delete", "get", "list", "search", "archive", "export", "approve", "cancel",
+           "assign", "summarize", "validate"]
+OBJECTS = ["invoice", "customer", "ticket", "shipment", "calendar_event", "user_account", "product", "order",
+           "warehouse", "employee", "report", "subscription", "payment", "contract", "campaign", "lead",
+           "vendor", "refund"]
+
+# (query, the tool it needs)
+BENCH_QUERIES = [
+    ("Multiply 15 by 8", "multiply"),
+    ("Add 100 and 50", "add"),
+    ("Divide 144 by 12", "divide"),
+    ("How many primes are below 2000000?", "count_primes"),
+    ("What is the USD to EUR exchange rate?", "get_exchange_rate"),
+    ("Cancel order 4711", "cancel_order"),
+    ("Search for the invoice sent to ACME last month", "search_invoice"),
+    ("Approve the refund for customer 42", "approve_refund"),
+    ("Export the campaign results", "export_campaign"),
+    ("Assign ticket 981 to the on-call engineer", "assign_ticket"),
+]
+
+
+def synthetic_tools(count):
+    """`count` tools: the example tools plus generated CRUD-style tools with realistic schemas."""
+    from langchain_core.tools import StructuredTool
+    from pydantic import Field, create_model
+
+    from example_tools import tools
+
+    generated = []
+    for action in ACTIONS:
+        for obj in OBJECTS:
+            label = obj.replace("_", " ")
+            schema = create_model(
+                f"{action}_{obj}",
+                id=(str, Field(description=f"identifier of the {label}")),
+                note=(str, Field(default="", description=f"free-text note stored with the {label}")),
+                dry_run=(bool, Field(default=False, description="validate without applying the change")),
+            )
+            generated.append(StructuredTool.from_function(
+                func=lambda **kwargs: "ok", name=f"{action}_{obj}", args_schema=schema,
+                description=f"{action.capitalize()} a {label} in the back-office system and return the "
+                            f"updated {label} record.",
+            ))
+    return (tools + generated)[:count]
+
+
+def run_bench(args):
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+    from rate_limiter import http_clients
+    from stub_server import StubConfig, serve_in_background
+
+    server = serve_in_background(config=StubConfig(latency_ms=args.latency_ms, seed=0))
+    client, async_client = http_clients()
+    embeddings = OpenAIEmbeddings(model="text-embedding-3-small", dimensions=1536, base_url=server.base_url,
+                                  api_key="stub", check_embedding_ctx_length=False,
+                                  http_client=client, http_async_client=async_client)
+    llm = ChatOpenAI(model="gpt-4-turbo-preview", base_url=server.base_url, api_key="stub",
+                     http_client=client, http_async_client=async_client)
+    tools = synthetic_tools(args.tools)
+    registry = ToolRegistry(tools, lambda: embeddings, llm.bind_tools, top_k=args.top_k)
+    started = time.perf_counter()
+    registry.warm_up()
+    print(f"{len(tools)} tools, {registry.all_tokens} schema tokens in all; "
+          f"descriptions embedded in {(time.perf_counter() - started) * 1000.0:.0f} ms\n")
+    print(f"{'query':<50} {'found':>6} {'tokens':>7}  top {args.top_k}")
+    print("-" * 100)
+    found = 0
+    for query, expected in BENCH_QUERIES:
+        bound, selected = registry.bound(query)
+        names = [tool.name for tool in selected]
+        found += expected in names
+        bound.invoke(query)
+        tokens = sum(registry.schema_tokens[name] for name in names)
+        print(f"{query[:50]:<50} {'yes' if expected in names else 'no':>6} {tokens:>7}  {', '.join(names)}")
+    print(f"\nRecall@{args.top_k}: {found}/{len(BENCH_QUERIES)} (the stand-in's embeddings only match "
+          f"shared words; real embeddings also match paraphrases)")
+    print(f"Registry: {registry.stats()}")
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tool registry with per-query tool selection")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("bench", help="schema tokens and recall of top-k selection")
+    bench.add_argument("--tools", type=int, default=200, help="registry size (example tools plus generated ones)")
+    bench.add_argument("--top-k", type=int, default=5)
+    bench.add_argument("--latency-ms", type=float, default=20.0, help="stand-in model latency")
+    args = parser.parse_args()
+    run_bench(args)